@@ -0,0 +1,59 @@
+"""Benchmark how late the alarm scheduler fires alarms.
+
+ALARMS alarms are set at whole seconds spread over the next DURATION
+seconds in an in-memory stand-in of the Realtime Database, and the delay
+between the alarm time and its notification is measured. The 60 second
+polling loop that the scheduler replaced fired alarms up to a minute late,
+30 seconds on average.
+
+Run from the repository root:
+  python -m benchmark.bench_alarm_scheduler
+"""
+import datetime
+import random
+import statistics
+import threading
+import time
+from test import fake_rtdb
+
+from ecco6.tool import alarm_scheduler, alarm_store
+
+ALARMS = 50
+DURATION = 10
+
+
+def main():
+    database = fake_rtdb.Database()
+    alarms = database.reference("/users/bench/alarms")
+    drifts = []
+    done = threading.Event()
+
+    def notify(user, alarm):
+        drifts.append(time.time() - alarm["fire_at"])
+        if len(drifts) == ALARMS:
+            done.set()
+
+    store = alarm_store.AlarmStore(database.reference("/users"))
+    store.start()
+    scheduler = alarm_scheduler.AlarmScheduler(store, notify)
+    scheduler.start()
+    scheduler.add_user("bench")
+
+    start = int(time.time()) + 1
+    for _ in range(ALARMS):
+        fire_at = start + random.randrange(DURATION)
+        when = datetime.datetime.fromtimestamp(fire_at)
+        alarms.push({"day": when.strftime("%A"), "date": when.strftime("%Y-%m-%d"),
+                     "clock": when.strftime("%H:%M:%S"), "title": "bench", "fire_at": fire_at})
+
+    done.wait(DURATION + 5)
+    scheduler.stop()
+    store.stop()
+    drifts.sort()
+    print(f"{len(drifts)} of {ALARMS} alarms fired, {database.reads} database reads")
+    print(f"drift median {statistics.median(drifts) * 1e3:.1f} ms, "
+          f"p95 {drifts[int(len(drifts) * 0.95)] * 1e3:.1f} ms, max {drifts[-1] * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark the latency of calendar lookups.
+
+Compares listing the events of a day with events().list on every lookup,
+as get_events_by_date and get_eventID used to do, with lookups in the
+local event store. The calendar is an in-memory stand-in of the Calendar
+API with EVENTS events over two years and LATENCY seconds per round
+trip, a typical latency of the API.
+
+Run from the repository root:
+  python -m benchmark.bench_calendar_store
+"""
+import datetime
+import random
+import statistics
+import time
+from test import fake_calendar
+
+from ecco6.tool import calendar_store
+
+EVENTS = 2000
+LATENCY = 0.1
+LOOKUPS = 20
+UTC = datetime.timezone.utc
+NOW = datetime.datetime(2024, 5, 1, tzinfo=UTC)
+
+
+def measure(lookup, dates):
+    timings = []
+    for date in dates:
+        start = time.perf_counter()
+        lookup(date)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e3
+
+
+def main():
+    random.seed(0)
+    events = []
+    for i in range(EVENTS):
+        start = NOW + datetime.timedelta(days=random.randrange(-365, 365), minutes=15 * random.randrange(96))
+        end = start + datetime.timedelta(minutes=30 * random.randint(1, 4))
+        events.append(fake_calendar.event(
+            f"Event {i}", start.strftime("%Y-%m-%dT%H:%M"), end.strftime("%Y-%m-%dT%H:%M")))
+    service = fake_calendar.Calendar(events, page_size=calendar_store.PAGE_SIZE, latency=LATENCY)
+    dates = [(NOW + datetime.timedelta(days=random.randrange(-30, 30))).date().isoformat()
+             for _ in range(LOOKUPS)]
+
+    def list_day(date):
+        start, end = calendar_store.day_bounds(date, UTC)
+        return service.events().list(
+            calendarId="primary", timeMin=start.isoformat(), timeMax=end.isoformat()).execute()
+
+    store = calendar_store.CalendarStore(clock=NOW.timestamp, tz=UTC)
+    start = time.perf_counter()
+    store.sync(service)
+    full_sync = (time.perf_counter() - start) * 1e3
+    start = time.perf_counter()
+    store.sync(service)
+    incremental_sync = (time.perf_counter() - start) * 1e3
+
+    print(f"full sync           {full_sync:9.2f} ms (once per user)")
+    print(f"incremental sync    {incremental_sync:9.2f} ms (in the background)")
+    print(f"day, events.list    {measure(list_day, dates):9.2f} ms")
+    print(f"day, local          {measure(store.day, dates):9.3f} ms")
+    print(f"title, local        {measure(lambda date: store.find('Event 7', date), dates):9.3f} ms")
+    print(f"next event, local   {measure(lambda date: store.next_event(), dates):9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark the client overhead of a Google tool call.
+
+Compares building the service client on every call, as the tools used to
+do, with the cached client, for the APIs used by the tools. Requests are
+only prepared, not sent, so the numbers are the local overhead per call.
+
+Run from the repository root:
+  python -m benchmark.bench_google_services
+"""
+import statistics
+import time
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+from ecco6.tool import google_services
+
+APIS = [("calendar", "v3"), ("gmail", "v1"), ("tasks", "v1"), ("docs", "v1"), ("drive", "v3")]
+CALLS = 20
+
+
+def prepare_request(service, api):
+    if api == "calendar":
+        return service.events().list(calendarId="primary")
+    if api == "gmail":
+        return service.users().messages().list(userId="me")
+    if api == "tasks":
+        return service.tasklists().list(maxResults=10)
+    if api == "docs":
+        return service.documents().get(documentId="doc")
+    return service.files().list(q="name='doc'")
+
+
+def measure(get):
+    timings = []
+    for _ in range(CALLS):
+        start = time.perf_counter()
+        get()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e3
+
+
+def main():
+    credentials = Credentials(
+        token="token", refresh_token="refresh", client_id="client",
+        client_secret="secret", token_uri="https://oauth2.googleapis.com/token")
+    for api, version in APIS:
+        uncached = measure(lambda: prepare_request(
+            build(api, version, credentials=credentials, static_discovery=True), api))
+        cached = measure(lambda: prepare_request(
+            google_services.get_service(api, version, credentials), api))
+        print(f"{api:8s} build per call {uncached:7.2f} ms   cached {cached:6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Benchmark the offline GTFS journey planner over a synthetic feed.
+
+The feed is a GRID x GRID city where every row and every column of stops is
+served by a line in both directions, with a departure every HEADWAY seconds
+through the day. Journeys between random corners need one transfer.
+
+Run from the repository root:
+  python -m benchmark.bench_gtfs
+"""
+import os
+import random
+import tempfile
+import time
+
+from ecco6.tool import gtfs
+
+GRID = 20
+HEADWAY = 300
+FIRST_DEPARTURE = 5 * 3600
+LAST_DEPARTURE = 24 * 3600
+SECONDS_BETWEEN_STOPS = 120
+
+
+def _time(seconds):
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def write_feed(directory):
+    with open(os.path.join(directory, "stops.txt"), "w") as f:
+        f.write("stop_id,stop_name,stop_lat,stop_lon\n")
+        for row in range(GRID):
+            for col in range(GRID):
+                f.write(f"s{row}_{col},Stop {row}-{col},{59 + row / 100},{18 + col / 100}\n")
+
+    lines = []
+    for i in range(GRID):
+        lines.append((f"row{i}", [f"s{i}_{j}" for j in range(GRID)]))
+        lines.append((f"col{i}", [f"s{j}_{i}" for j in range(GRID)]))
+
+    n_stop_times = 0
+    with open(os.path.join(directory, "routes.txt"), "w") as routes, \
+            open(os.path.join(directory, "trips.txt"), "w") as trips, \
+            open(os.path.join(directory, "stop_times.txt"), "w") as stop_times:
+        routes.write("route_id,route_short_name\n")
+        trips.write("route_id,service_id,trip_id\n")
+        stop_times.write("trip_id,arrival_time,departure_time,stop_id,stop_sequence\n")
+        for route_id, stops in lines:
+            routes.write(f"{route_id},{route_id}\n")
+            for direction, sequence in enumerate([stops, stops[::-1]]):
+                for start in range(FIRST_DEPARTURE, LAST_DEPARTURE, HEADWAY):
+                    trip_id = f"{route_id}_{direction}_{start}"
+                    trips.write(f"{route_id},all,{trip_id}\n")
+                    for position, stop_id in enumerate(sequence):
+                        at = _time(start + position * SECONDS_BETWEEN_STOPS)
+                        stop_times.write(f"{trip_id},{at},{at},{stop_id},{position + 1}\n")
+                        n_stop_times += 1
+    return n_stop_times
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        n_stop_times = write_feed(directory)
+        start = time.perf_counter()
+        timetable = gtfs.Timetable.load(directory)
+        load_seconds = time.perf_counter() - start
+
+    print(f"feed: {GRID * GRID} stops, {len(timetable.patterns)} patterns, {n_stop_times} stop times")
+    print(f"load (one-off): {load_seconds:.2f} s")
+
+    rng = random.Random(0)
+    latencies = []
+    for _ in range(200):
+        origin = f"Stop {rng.randrange(GRID)}-{rng.randrange(GRID)}"
+        destination = f"Stop {rng.randrange(GRID)}-{rng.randrange(GRID)}"
+        departure = rng.randrange(6 * 3600, 22 * 3600)
+        start = time.perf_counter()
+        timetable.plan(origin, destination, departure)
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    print(f"plan latency over {len(latencies)} queries: "
+          f"median {latencies[len(latencies) // 2] * 1e3:.2f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1e3:.2f} ms, "
+          f"max {latencies[-1] * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark station name lookups in the SL travel planner.
+
+Compares the previous implementation of sl.get_station_coordinates, which
+parsed the whole stop CSV on every call, with the load-once StationIndex,
+and difflib over every stop name with the trigram index for misspelled
+names.
+
+Run from the repository root:
+  python -m benchmark.bench_station_index
+"""
+import csv
+import difflib
+import time
+import timeit
+
+from ecco6.tool import station_index, stop_table
+
+with open(stop_table.STOPS_CSV, encoding="utf-8") as f:
+    STOP_CSV_STR = stop_table.clean_stop_name(f.read())
+
+EXACT_QUERIES = ["Stockholm Central", "Slussen", "Fridhemsplan T-bana", "Medborgarplatsen", "Ropsten"]
+FUZZY_QUERIES = ["stockholm centrl", "odenplan", "T-Centralen", "Tekniska högskolan", "sluss en"]
+
+
+def legacy_get_station_coordinates(station_name):
+    reader = csv.DictReader(STOP_CSV_STR.splitlines())
+    station_names = [row['stop_name'].lower() for row in reader]
+
+    closest_matches = difflib.get_close_matches(station_name.lower(), station_names, n=1, cutoff=0.6)
+    if closest_matches:
+        closest_station_name = closest_matches[0]
+        reader = csv.DictReader(STOP_CSV_STR.splitlines())
+        for row in reader:
+            if row['stop_name'].lower() == closest_station_name:
+                return float(row['stop_lat']), float(row['stop_lon'])
+    return None, None
+
+
+def report(label, func, queries, number):
+    seconds = timeit.timeit(lambda: [func(query) for query in queries], number=number)
+    per_lookup = seconds / (number * len(queries))
+    print(f"{label:<28} {per_lookup * 1e3:10.4f} ms/lookup")
+
+
+def main():
+    start = time.perf_counter()
+    index = station_index.get_station_index()
+    print(f"index build (one-off)        {(time.perf_counter() - start) * 1e3:10.3f} ms, {len(index)} stops")
+
+    print("exact names:")
+    report("  legacy (parse per call)", legacy_get_station_coordinates, EXACT_QUERIES, number=1)
+    report("  StationIndex.find", index.find, EXACT_QUERIES, number=10000)
+    print("misspelled names:")
+    report("  legacy (parse per call)", legacy_get_station_coordinates, FUZZY_QUERIES, number=1)
+    report("  difflib over all names", lambda query: index.get(index.row(
+        difflib.get_close_matches(query.lower(), index.unique_names, n=1, cutoff=0.6)[0])),
+        FUZZY_QUERIES, number=1)
+    start = time.perf_counter()
+    index.trigram_index
+    print(f"  trigram index build (one-off) {(time.perf_counter() - start) * 1e3:7.3f} ms")
+    report("  StationIndex.find", index.find, FUZZY_QUERIES, number=200)
+
+    print("matches (difflib -> trigram index):")
+    for query in FUZZY_QUERIES + ["gullmarsplan", "fridhemsplan", "solna station"]:
+        legacy = difflib.get_close_matches(query.lower(), index.unique_names, n=1, cutoff=0.6)
+        print(f"  {query!r:24} {legacy[0] if legacy else None!r:28} -> {index.close_matches(query)[0]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark startup time and memory of the bundled stop data.
+
+Compares importing the stop data as a multi-megabyte Python string literal
+(the former ecco6.tool.stops module, regenerated from stops.txt) with
+memory-mapping the columnar stops.bin. Every scenario runs in a fresh
+interpreter and reports the wall time and resident memory after importing
+and after the first station lookup.
+
+Run from the repository root:
+  python -m benchmark.bench_stop_table
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+
+from ecco6.tool import stop_table
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRELUDE = """
+import time
+start = time.perf_counter()
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+"""
+
+LEGACY = PRELUDE + """
+import stops
+from ecco6.tool import station_index
+imported = time.perf_counter()
+import_rss = rss_mb()
+index = station_index.StationIndex.from_csv(stops.STOP_CSV_STR)
+index.find("Stockholm Central")
+"""
+
+MMAP = PRELUDE + """
+from ecco6.tool import station_index
+imported = time.perf_counter()
+import_rss = rss_mb()
+station_index.get_station_index().find("Stockholm Central")
+"""
+
+REPORT = """
+print(f"{(imported - start) * 1e3:.1f} {import_rss:.1f} {(time.perf_counter() - start) * 1e3:.1f} {rss_mb():.1f}")
+"""
+
+
+def write_legacy_module(directory):
+    with open(stop_table.STOPS_CSV, encoding="utf-8") as f:
+        csv_str = stop_table.clean_stop_name(f.read())
+    with open(os.path.join(directory, "stops.py"), "w", encoding="utf-8") as f:
+        f.write(f'STOP_CSV_STR = """\\\n{csv_str}"""\n')
+
+
+def run(code, pythonpath, repeat=5):
+    env = dict(os.environ, PYTHONPATH=pythonpath)
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", textwrap.dedent(code)], env=env, cwd=REPO_DIR,
+            check=True, capture_output=True, text=True).stdout
+        samples.append([float(value) for value in output.split()])
+    return [sorted(column)[len(column) // 2] for column in zip(*samples)]
+
+
+def main():
+    # Warm up the page cache and the .pyc files before measuring.
+    with tempfile.TemporaryDirectory() as directory:
+        write_legacy_module(directory)
+        pythonpath = os.pathsep.join([directory, REPO_DIR])
+        run(LEGACY + REPORT, pythonpath, repeat=1)
+        run(MMAP + REPORT, REPO_DIR, repeat=1)
+        results = {
+            "string literal": run(LEGACY + REPORT, pythonpath),
+            "mmap stops.bin": run(MMAP + REPORT, REPO_DIR),
+        }
+
+    print(f"{'':<16} {'import ms':>10} {'import RSS MB':>14} {'+lookup ms':>11} {'+lookup RSS MB':>15}")
+    for label, (import_ms, import_rss, total_ms, total_rss) in results.items():
+        print(f"{label:<16} {import_ms:10.1f} {import_rss:14.1f} {total_ms:11.1f} {total_rss:15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,7 @@ from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_openai import ChatOpenAI
 
-from ecco6.tool import google, location, time, weather, rpi_timer, news, sl, alarm, light
+from ecco6.tool import google, location, time, weather, rpi_timer, news, sl, alarm, light, home_assistant
 
 SYS_PROMPT = """\
 You are a voice assistant named Ecco6. Your task is to handle questions and
@@ -60,6 +60,26 @@ class Ecco6Agent:
       )
       tools.append(get_events_by_date_tool)
 
+      get_events_in_range_tool = StructuredTool.from_function(
+          func=functools.partial(
+            google.get_events_in_range, google_credentials=self.google_credentials),
+          name="get_events_in_range",
+          description=(
+            "Get the events of a range of days from all Google calendars of the user, "
+            "e.g. for a week. Use it instead of get_events_by_date for more than one day."),
+          args_schema=google.GetEventsInRangeInput,
+      )
+      tools.append(get_events_in_range_tool)
+
+      get_next_event_tool = StructuredTool.from_function(
+          func=functools.partial(
+            google.get_next_event, google_credentials=self.google_credentials),
+          name="get_next_event",
+          description="Get the next upcoming event from Google calendar.",
+          args_schema=google.GetNextEventInput,
+      )
+      tools.append(get_next_event_tool)
+
     get_current_time_tool = StructuredTool.from_function(
         func=time.get_current_time,
         name="get_current_time",
@@ -88,10 +108,20 @@ class Ecco6Agent:
     get_unread_messages_tool = StructuredTool.from_function(
           func=functools.partial(google.get_unread_messages, google_credentials=self.google_credentials),
           name="get_unread_messages",
-          description="Retrieve unread messages from Gmail.",
+          description=(
+            "Retrieve the sender, subject and snippet of unread messages from Gmail. "
+            "Only use it when the user asks what the messages are about."),
           args_schema=google.GetUnreadMessagesInput,
     )
     tools.append(get_unread_messages_tool)
+
+    count_unread_messages_tool = StructuredTool.from_function(
+          func=functools.partial(google.count_unread_messages, google_credentials=self.google_credentials),
+          name="count_unread_messages",
+          description="Count the unread messages in Gmail, e.g. when the user asks whether they have new mail.",
+          args_schema=google.CountUnreadMessagesInput,
+    )
+    tools.append(count_unread_messages_tool)
     
     send_email_tool = StructuredTool.from_function(
         func=functools.partial(google.send_email, google_credentials=self.google_credentials),
@@ -169,9 +199,9 @@ class Ecco6Agent:
     tools.append(get_news_tool)
 
     get_weather_tool = StructuredTool.from_function(
-        func=lambda city_name,date=None: weather.get_weather(weather.WeatherInput(city_name=city_name,date=date)),
+        func=lambda city_name=None,date=None: weather.get_weather(weather.WeatherInput(city_name=city_name,date=date)),
         name="get_weather",
-        description="Get the current weather for a specified city.",
+        description="Get the current weather for a specified city, or for the current location if no city is given.",
         args_schema=weather.WeatherInput,
     )
     tools.append(get_weather_tool)
@@ -216,12 +246,13 @@ class Ecco6Agent:
       )
       tools.append(set_rpi_timer_tool)
 
+    self.light_queue = home_assistant.CommandQueue(home_assistant.get_client(
+        st.secrets["LIGHT"]["URL"], st.secrets["LIGHT"]["API_KEY"]))
+    light_entity_id = st.secrets["LIGHT"].get("ENTITY_ID", "light.bulb")
+
     turn_on_light_tool = StructuredTool.from_function(
         func=functools.partial(
-          light.turn_on_light, 
-          url=st.secrets["LIGHT"]["URL"]+"/api/services/script/turn_on_bulb",
-          token = st.secrets["LIGHT"]["API_KEY"]
-        ),
+          light.turn_on_light, queue=self.light_queue, entity_id=light_entity_id),
         name="turn_on_light",
         description="Turn on the light.",
         args_schema=light.SetLightInput,
@@ -230,10 +261,7 @@ class Ecco6Agent:
 
     turn_off_light_tool = StructuredTool.from_function(
         func=functools.partial(
-          light.turn_off_light,
-          url=st.secrets["LIGHT"]["URL"]+"/api/services/script/turn_off_bulb",
-          token=st.secrets["LIGHT"]["API_KEY"]
-        ),
+          light.turn_off_light, queue=self.light_queue, entity_id=light_entity_id),
         name="turn_off_light",
         description="Turn off the light.",
         args_schema=light.SetLightInput,
@@ -242,10 +270,7 @@ class Ecco6Agent:
 
     set_brightness_low_tool = StructuredTool.from_function(
         func=functools.partial(
-          light.set_brightness_low, 
-          url=st.secrets["LIGHT"]["URL"]+"/api/services/script/set_brightness_low",
-          token = st.secrets["LIGHT"]["API_KEY"]
-        ),
+          light.set_brightness_low, queue=self.light_queue, entity_id=light_entity_id),
         name="set_brightness_low",
         description="Set the brightness of the light as low.",
         args_schema=light.SetLightInput,
@@ -254,10 +279,7 @@ class Ecco6Agent:
 
     set_brightness_medium_tool = StructuredTool.from_function(
         func=functools.partial(
-          light.set_brightness_medium, 
-          url=st.secrets["LIGHT"]["URL"]+"/api/services/script/set_brightness_medium",
-          token = st.secrets["LIGHT"]["API_KEY"]
-        ),
+          light.set_brightness_medium, queue=self.light_queue, entity_id=light_entity_id),
         name="set_brightness_medium",
         description="Set the brightness of the light as medium.",
         args_schema=light.SetLightInput,
@@ -266,16 +288,30 @@ class Ecco6Agent:
 
     set_brightness_high_tool = StructuredTool.from_function(
         func=functools.partial(
-          light.set_brightness_high, 
-          url=st.secrets["LIGHT"]["URL"]+"/api/services/script/set_brightness_high",
-          token = st.secrets["LIGHT"]["API_KEY"]
-        ),
+          light.set_brightness_high, queue=self.light_queue, entity_id=light_entity_id),
         name="set_brightness_high",
         description="Set the brightness of the light as high.",
         args_schema=light.SetLightInput,
     )
     tools.append(set_brightness_high_tool)
-    
+
+    get_light_state_tool = StructuredTool.from_function(
+        func=functools.partial(
+          light.get_light_state, queue=self.light_queue, entity_id=light_entity_id),
+        name="get_light_state",
+        description="Get whether the light is on or off and its brightness.",
+        args_schema=light.SetLightInput,
+    )
+    tools.append(get_light_state_tool)
+
+    activate_scene_tool = StructuredTool.from_function(
+        func=functools.partial(light.activate_scene, queue=self.light_queue),
+        name="activate_scene",
+        description="Activate a smart home scene by name.",
+        args_schema=light.ActivateSceneInput,
+    )
+    tools.append(activate_scene_tool)
+
     get_travel_suggestions_tool = StructuredTool.from_function(
         func=sl.get_travel_suggestions,
         name="get_travel_suggestions",
@@ -323,5 +359,9 @@ class Ecco6Agent:
       "chat_history": chat_history,
       "input": messages[-1]["content"],
     })
-    return result["output"]
+    output = result["output"]
+    errors = self.light_queue.join(timeout=5)
+    if errors:
+      output += f" The light command failed: {errors[0]}"
+    return output
 
@@ -16,6 +16,9 @@ from firebase_admin import credentials, db
 
 import toml
 
+from ecco6 import http_client
+from ecco6.tool import alarm, calendar_store, mailbox_index
+
 firebase_credentials = {
     "type": st.secrets["FIREBASE"]["TYPE"],
     "project_id": st.secrets["FIREBASE"]["PROJECT_ID"],
@@ -66,7 +69,7 @@ def sign_in_with_email_and_password(email, password):
     request_ref = "https://www.googleapis.com/identitytoolkit/v3/relyingparty/verifyPassword?key={0}".format(st.secrets['FIREBASE_WEB_API_KEY'])
     headers = {"content-type": "application/json; charset=UTF-8"}
     data = json.dumps({"email": email, "password": password, "returnSecureToken": True})
-    request_object = requests.post(request_ref, headers=headers, data=data)
+    request_object = http_client.post(request_ref, headers=headers, data=data)
     raise_detailed_error(request_object)
     return request_object.json()
 
@@ -74,7 +77,7 @@ def get_account_info(id_token):
     request_ref = "https://www.googleapis.com/identitytoolkit/v3/relyingparty/getAccountInfo?key={0}".format(st.secrets['FIREBASE_WEB_API_KEY'])
     headers = {"content-type": "application/json; charset=UTF-8"}
     data = json.dumps({"idToken": id_token})
-    request_object = requests.post(request_ref, headers=headers, data=data)
+    request_object = http_client.post(request_ref, headers=headers, data=data)
     raise_detailed_error(request_object)
     return request_object.json()
 
@@ -82,7 +85,7 @@ def send_email_verification(id_token):
     request_ref = "https://www.googleapis.com/identitytoolkit/v3/relyingparty/getOobConfirmationCode?key={0}".format(st.secrets['FIREBASE_WEB_API_KEY'])
     headers = {"content-type": "application/json; charset=UTF-8"}
     data = json.dumps({"requestType": "VERIFY_EMAIL", "idToken": id_token})
-    request_object = requests.post(request_ref, headers=headers, data=data)
+    request_object = http_client.post(request_ref, headers=headers, data=data)
     raise_detailed_error(request_object)
     return request_object.json()
 
@@ -90,7 +93,7 @@ def send_password_reset_email(email):
     request_ref = "https://www.googleapis.com/identitytoolkit/v3/relyingparty/getOobConfirmationCode?key={0}".format(st.secrets['FIREBASE_WEB_API_KEY'])
     headers = {"content-type": "application/json; charset=UTF-8"}
     data = json.dumps({"requestType": "PASSWORD_RESET", "email": email})
-    request_object = requests.post(request_ref, headers=headers, data=data)
+    request_object = http_client.post(request_ref, headers=headers, data=data)
     raise_detailed_error(request_object)
     return request_object.json()
 
@@ -98,7 +101,7 @@ def create_user_with_email_and_password(email, password):
     request_ref = "https://www.googleapis.com/identitytoolkit/v3/relyingparty/signupNewUser?key={0}".format(st.secrets['FIREBASE_WEB_API_KEY'])
     headers = {"content-type": "application/json; charset=UTF-8" }
     data = json.dumps({"email": email, "password": password, "returnSecureToken": True})
-    request_object = requests.post(request_ref, headers=headers, data=data)
+    request_object = http_client.post(request_ref, headers=headers, data=data)
     raise_detailed_error(request_object)
     return request_object.json()
 
@@ -106,7 +109,7 @@ def delete_user_account(id_token):
     request_ref = "https://www.googleapis.com/identitytoolkit/v3/relyingparty/deleteAccount?key={0}".format(st.secrets['FIREBASE_WEB_API_KEY'])
     headers = {"content-type": "application/json; charset=UTF-8"}
     data = json.dumps({"idToken": id_token})
-    request_object = requests.post(request_ref, headers=headers, data=data)
+    request_object = http_client.post(request_ref, headers=headers, data=data)
     raise_detailed_error(request_object)
     return request_object.json()
 
@@ -208,8 +211,15 @@ def reset_password(email:str) -> None:
 
 
 def sign_out() -> None:
+    email = st.session_state.email
+    alarm.stop_notifying_alarms(email)
+    google_credentials = st.session_state.get("google_credentials")
+    if google_credentials is not None:
+        # Stop syncing the mailbox and calendar of the user.
+        mailbox_index.mailbox_sync.discard(google_credentials)
+        calendar_store.calendar_sync.discard(google_credentials)
     st.session_state.clear()
-    remove_user_email_from_firebase(st.session_state.email)
+    remove_user_email_from_firebase(email)
     st.session_state.auth_success = 'You have successfully signed out'
 
 
@@ -0,0 +1,130 @@
+import collections
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def cache_dir() -> str:
+  """Return the directory for persistent caches.
+
+  Defaults to ~/.cache/ecco6 and can be changed with the ECCO6_CACHE_DIR
+  environment variable.
+  """
+  return os.environ.get("ECCO6_CACHE_DIR") or os.path.join(
+      os.path.expanduser("~"), ".cache", "ecco6")
+
+
+class TTLCache:
+  """A thread-safe LRU cache whose entries expire after a time to live.
+
+  The cache is meant to be shared by all sessions of the process, and it
+  counts hits, misses, evictions and expirations so that its effectiveness
+  can be monitored.
+  """
+  def __init__(
+      self, maxsize: int, ttl: float,
+      clock: Callable[[], float] = time.monotonic):
+    """Create the cache.
+
+    Args:
+      maxsize: The maximum number of entries. The least recently used entry
+        is evicted when the cache is full.
+      ttl: The time to live of an entry in seconds.
+      clock: The clock used for expiry, in seconds.
+    """
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self._clock = clock
+    self._entries = collections.OrderedDict()
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.expirations = 0
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def get(self, key: Hashable, default: Any = None) -> Any:
+    """Return the value of a key, or default if it is missing or expired."""
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None:
+        expires_at, value = entry
+        if expires_at > self._clock():
+          self._entries.move_to_end(key)
+          self.hits += 1
+          return value
+        del self._entries[key]
+        self.expirations += 1
+      self.misses += 1
+      return default
+
+  def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+    """Store a value, evicting the least recently used entry if needed.
+
+    Args:
+      key: The key.
+      value: The value.
+      ttl: The time to live of this entry, defaults to the cache setting.
+    """
+    with self._lock:
+      self._entries[key] = (self._clock() + (self.ttl if ttl is None else ttl), value)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.maxsize:
+        self._entries.popitem(last=False)
+        self.evictions += 1
+
+  def clear(self) -> None:
+    with self._lock:
+      self._entries.clear()
+
+  def stats(self) -> Dict[str, float]:
+    """Return the size and the hit/miss counters of the cache."""
+    with self._lock:
+      lookups = self.hits + self.misses
+      return {
+          "size": len(self._entries),
+          "hits": self.hits,
+          "misses": self.misses,
+          "hit_rate": self.hits / lookups if lookups else 0.0,
+          "evictions": self.evictions,
+          "expirations": self.expirations,
+      }
+
+
+class JsonStore:
+  """A small thread-safe dictionary persisted as a JSON file.
+
+  The file is read on first access and rewritten atomically on every
+  change, so it suits small, rarely changing mappings.
+  """
+  def __init__(self, path: str):
+    self.path = path
+    self._data = None
+    self._lock = threading.Lock()
+
+  def _load(self) -> Dict[str, Any]:
+    if self._data is None:
+      try:
+        with open(self.path, encoding="utf-8") as f:
+          self._data = json.load(f)
+      except (OSError, ValueError):
+        self._data = {}
+    return self._data
+
+  def get(self, key: str, default: Any = None) -> Any:
+    with self._lock:
+      return self._load().get(key, default)
+
+  def set(self, key: str, value: Any) -> None:
+    with self._lock:
+      data = self._load()
+      data[key] = value
+      os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+      tmp_path = f"{self.path}.{os.getpid()}.tmp"
+      with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+      os.replace(tmp_path, self.path)
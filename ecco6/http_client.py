@@ -0,0 +1,178 @@
+import collections
+import logging
+import random
+import threading
+import time
+import urllib.parse
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class HostMetrics:
+  """Request counters and latencies of one host."""
+  def __init__(self, window: int = 200):
+    self.requests = 0
+    self.errors = 0
+    self.retries = 0
+    self.total_seconds = 0.0
+    self.latencies = collections.deque(maxlen=window)
+
+  def snapshot(self) -> Dict[str, float]:
+    latencies = sorted(self.latencies)
+    def percentile(p):
+      if not latencies:
+        return 0.0
+      return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e3
+    return {
+        "requests": self.requests,
+        "errors": self.errors,
+        "retries": self.retries,
+        "mean_ms": self.total_seconds / self.requests * 1e3 if self.requests else 0.0,
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+    }
+
+
+class HttpClient:
+  """HTTP client shared by the tools.
+
+  Every host gets its own pooled, keep-alive session, so repeated tool calls
+  reuse the TCP and TLS connection. Requests get a default timeout, and
+  idempotent requests are retried with jittered exponential backoff on
+  connection errors and transient status codes.
+  """
+  def __init__(
+      self, timeout=(3.05, 10), retries: int = 2, backoff: float = 0.3,
+      max_backoff: float = 5.0, max_connections_per_host: int = 10):
+    """Create the client.
+
+    Args:
+      timeout: The default (connect, read) timeout in seconds.
+      retries: How many times an idempotent request is retried.
+      backoff: The base of the exponential backoff in seconds.
+      max_backoff: The maximum sleep between two attempts in seconds.
+      max_connections_per_host: The size of the connection pool of a host.
+        Requests wait for a free connection when the pool is exhausted.
+    """
+    self.timeout = timeout
+    self.retries = retries
+    self.backoff = backoff
+    self.max_backoff = max_backoff
+    self.max_connections_per_host = max_connections_per_host
+    self._sessions = {}
+    self._metrics = collections.defaultdict(HostMetrics)
+    self._lock = threading.Lock()
+
+  def session(self, host: str) -> requests.Session:
+    """Return the pooled session of a host."""
+    with self._lock:
+      session = self._sessions.get(host)
+      if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.max_connections_per_host,
+            pool_block=True, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        self._sessions[host] = session
+      return session
+
+  def _sleep_before_retry(self, attempt: int, response: Optional[requests.Response]):
+    delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+    if response is not None:
+      retry_after = response.headers.get("Retry-After", "")
+      if retry_after.isdigit():
+        delay = min(self.max_backoff, float(retry_after))
+    time.sleep(delay)
+
+  def request(
+      self, method: str, url: str, retries: Optional[int] = None,
+      **kwargs) -> requests.Response:
+    """Send a request through the pooled session of the host.
+
+    Args:
+      method: The HTTP method.
+      url: The URL.
+      retries: How many times to retry. Defaults to the client setting for
+        idempotent methods and to no retries for the others.
+      kwargs: Passed on to requests, e.g. params, headers, json or timeout.
+    Returns:
+      The response of the last attempt.
+    Raises:
+      requests.exceptions.RequestException: If the last attempt failed to
+        get a response.
+    """
+    method = method.upper()
+    if retries is None:
+      retries = self.retries if method in IDEMPOTENT_METHODS else 0
+    kwargs.setdefault("timeout", self.timeout)
+    host = urllib.parse.urlsplit(url).netloc
+    session = self.session(host)
+    metrics = self._metrics[host]
+
+    for attempt in range(retries + 1):
+      start = time.perf_counter()
+      response = None
+      try:
+        response = session.request(method, url, **kwargs)
+      except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        if attempt == retries:
+          self._record(metrics, start, error=True)
+          raise
+      else:
+        if response.status_code not in RETRY_STATUSES or attempt == retries:
+          self._record(metrics, start, error=response.status_code >= 500)
+          return response
+        response.close()
+      self._record(metrics, start, error=True, retry=True)
+      logging.info(f"Retrying {method} {host} (attempt {attempt + 1} of {retries})")
+      self._sleep_before_retry(attempt, response)
+
+  def _record(self, metrics: HostMetrics, start: float, error: bool, retry: bool = False):
+    elapsed = time.perf_counter() - start
+    with self._lock:
+      metrics.requests += 1
+      metrics.errors += error
+      metrics.retries += retry
+      metrics.total_seconds += elapsed
+      metrics.latencies.append(elapsed)
+
+  def get(self, url: str, **kwargs) -> requests.Response:
+    return self.request("GET", url, **kwargs)
+
+  def post(self, url: str, **kwargs) -> requests.Response:
+    return self.request("POST", url, **kwargs)
+
+  def metrics(self) -> Dict[str, Dict[str, float]]:
+    """Return the request counters and latencies per host."""
+    with self._lock:
+      return {host: metrics.snapshot() for host, metrics in self._metrics.items()}
+
+  def close(self):
+    with self._lock:
+      for session in self._sessions.values():
+        session.close()
+      self._sessions.clear()
+
+
+default_client = HttpClient()
+
+
+def get(url: str, **kwargs) -> requests.Response:
+  """Send a GET request with the shared client."""
+  return default_client.get(url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+  """Send a POST request with the shared client."""
+  return default_client.post(url, **kwargs)
+
+
+def metrics() -> Dict[str, Dict[str, float]]:
+  """Return the per-host metrics of the shared client."""
+  return default_client.metrics()
@@ -5,7 +5,6 @@ from views.homepage_view import homepage_view
 from views.login_view import login_view
 
 from ecco6.tool import alarm
-import threading
 
 
 logging.basicConfig(
@@ -19,8 +18,7 @@ def main():
     login_view()
   else:
     user_email = st.session_state.email 
-    alarm_thread = threading.Thread(target=alarm.check_and_notify_alarms, args=(user_email,))
-    alarm_thread.start()
+    alarm.check_and_notify_alarms(user_email)
     homepage_view()
     
 if __name__ == "__main__":
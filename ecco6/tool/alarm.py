@@ -1,11 +1,15 @@
 from firebase_admin import db
 from langchain.pydantic_v1 import BaseModel, Field
+import logging
 import streamlit as st
-import time
-import datetime
-import pyttsx3
+import threading
 from typing import Optional
 
+from ecco6.tool.alarm_scheduler import AlarmScheduler, alarm_fire_at, parse_alarm_time
+from ecco6.tool.alarm_store import AlarmStore
+from ecco6.tool.announcer import Announcer
+from ecco6.tool.alarm_updates import delete_updates, filter_alarms, modify_updates
+
 class SetAlarmInput(BaseModel):
     day: str = Field(description="The day to set the alarm for.")
     date: str = Field(description="The date to set the alarm for.")
@@ -31,11 +35,15 @@ def set_alarm(alarm_info: SetAlarmInput) -> str:
         "day": alarm_info.day,
         "date": alarm_info.date,
         "clock": alarm_info.clock,
-        "title": alarm_info.title  
+        "title": alarm_info.title,
+        "fire_at": parse_alarm_time(alarm_info.date, alarm_info.clock)
     }
 
-    # Push the alarm data to Firebase
-    db.reference(f'/users/{st.session_state.email.replace(".", "_")}/alarms').push(alarm_data)
+    # Add the alarm to the store, which writes it through to Firebase
+    get_alarm_store().add(st.session_state.email.replace(".", "_"), alarm_data)
+
+    # Render the announcement now, so that firing the alarm is only playback
+    announcer.prerender(alarm_message(alarm_data))
 
     return "Alarm set successfully."
 
@@ -44,32 +52,17 @@ def delete_alarm(alarm_info: SetAlarmInput) -> str:
     # Get the user's email
     user_email = st.session_state.email.replace(".", "_")
 
-    # Query Firebase for alarms matching the given properties
-    alarms_ref = db.reference(f'/users/{user_email}/alarms')
-    alarms_to_delete = alarms_ref.get()
-
-    # Filter alarms based on day
-    if alarm_info.day:
-        alarms_to_delete = {alarm_id: alarm_data for alarm_id, alarm_data in alarms_to_delete.items() if alarm_data.get('day') == alarm_info.day}
-
-    # Filter alarms based on date
-    if alarm_info.date:
-        alarms_to_delete = {alarm_id: alarm_data for alarm_id, alarm_data in alarms_to_delete.items() if alarm_data.get('date') == alarm_info.date}
-
-    # Filter alarms based on clock
-    if alarm_info.clock:
-        alarms_to_delete = {alarm_id: alarm_data for alarm_id, alarm_data in alarms_to_delete.items() if alarm_data.get('clock') == alarm_info.clock}
-
-    # Filter alarms based on title
-    if alarm_info.title:
-        alarms_to_delete = {alarm_id: alarm_data for alarm_id, alarm_data in alarms_to_delete.items() if alarm_data.get('title') == alarm_info.title}
+    # Find the alarms matching the given properties
+    store = get_alarm_store()
+    alarms_to_delete = filter_alarms(
+        store.alarms(user_email), day=alarm_info.day, date=alarm_info.date,
+        clock=alarm_info.clock, title=alarm_info.title)
 
     # Check if any alarms match the given properties
     if alarms_to_delete:
-        # Iterate over the matching alarms and delete them
-        for alarm_id in alarms_to_delete.keys():
-            alarms_ref.child(alarm_id).delete()
-        
+        # Delete the matching alarms with one multi-path update
+        store.update(user_email, delete_updates(alarms_to_delete))
+        discard_announcements(user_email, alarms_to_delete.values())
         return "Alarms matching the specified properties deleted successfully."
     else:
         return "No alarms found matching the specified properties."
@@ -79,61 +72,41 @@ def modify_alarm(args: ModifyAlarmArgs) -> str:
     # Get the user's email
     user_email = st.session_state.email.replace(".", "_")
 
-    # Query Firebase for all alarms
-    alarms_ref = db.reference(f'/users/{user_email}/alarms')
-    alarms_to_modify = alarms_ref.get()
-
-    # Filter alarms based on day
-    if args.existing_day:
-        alarms_to_modify = {alarm_id: alarm_data for alarm_id, alarm_data in alarms_to_modify.items() if alarm_data.get('day') == args.existing_day}
-
-    # Filter alarms based on date
-    if args.existing_date:
-        alarms_to_modify = {alarm_id: alarm_data for alarm_id, alarm_data in alarms_to_modify.items() if alarm_data.get('date') == args.existing_date}
-
-    # Filter alarms based on clock
-    if args.existing_clock:
-        alarms_to_modify = {alarm_id: alarm_data for alarm_id, alarm_data in alarms_to_modify.items() if alarm_data.get('clock') == args.existing_clock}
-
-    # Filter alarms based on title
-    if args.existing_title:
-        alarms_to_modify = {alarm_id: alarm_data for alarm_id, alarm_data in alarms_to_modify.items() if alarm_data.get('title') == args.existing_title}
+    # Find the alarms matching the given properties
+    store = get_alarm_store()
+    alarms_to_modify = filter_alarms(
+        store.alarms(user_email), day=args.existing_day, date=args.existing_date,
+        clock=args.existing_clock, title=args.existing_title)
 
     # Check if any alarms match the given properties
     if alarms_to_modify:
-        # Iterate over the matching alarms and modify them
-        for alarm_id, alarm_data in alarms_to_modify.items():  
-            # Update the alarm day if new day is provided
-            if args.new_day is not None:
-                alarms_ref.child(alarm_id).update({"day": args.new_day})
-
-            # Update the alarm date if new date is provided
-            if args.new_date is not None:
-                alarms_ref.child(alarm_id).update({"date": args.new_date})
-
-            # Update the alarm clock if new clock is provided
-            if args.new_clock is not None:
-                alarms_ref.child(alarm_id).update({"clock": args.new_clock})
-
-            # Update the alarm title if new title is provided
-            if args.new_title is not None:
-                alarms_ref.child(alarm_id).update({"title": args.new_title})
-            
+        # Modify the matching alarms with one multi-path update
+        updates = modify_updates(
+            alarms_to_modify, day=args.new_day, date=args.new_date,
+            clock=args.new_clock, title=args.new_title)
+        if updates:
+            store.update(user_email, updates)
+            for alarm_data in alarms_to_modify.values():
+                announcer.prerender(alarm_message({
+                    "day": args.new_day or alarm_data.get("day"),
+                    "date": args.new_date or alarm_data.get("date"),
+                    "clock": args.new_clock or alarm_data.get("clock"),
+                }))
+            discard_announcements(user_email, alarms_to_modify.values())
         return "Alarms matching the specified properties modified successfully."
     else:
         return "No alarms found matching the specified properties."
 
 
 def list_user_alarms():
-    # Query Firebase for user alarms
+    # Read the user alarms from the local store, ordered by time
     user_email = st.session_state.email.replace(".", "_")
-    alarms_ref = db.reference(f'/users/{user_email}/alarms')
-    alarms = alarms_ref.get()
+    alarms = get_alarm_store().alarms(user_email)
 
     user_alarms = []
 
     if alarms:
-        for key, value in alarms.items():
+        for key, value in sorted(alarms.items(), key=lambda item: alarm_fire_at(item[1]) or 0):
             user_alarms.append({
                 "id": key,
                 "day": value.get("day"),
@@ -146,50 +119,67 @@ def list_user_alarms():
 
 
 
+def alarm_message(alarm: dict) -> str:
+    return f"Alarm at {alarm.get('clock')} on {alarm.get('day')}, {alarm.get('date')} has passed."
+
+
+def discard_announcements(user: str, old_alarms):
+    """Delete the rendered announcements of deleted or rescheduled alarms.
+
+    Announcements that a remaining alarm of the user still makes are kept.
+    """
+    remaining = {alarm_message(alarm) for alarm in get_alarm_store().alarms(user).values()}
+    for alarm in old_alarms:
+        message = alarm_message(alarm)
+        if message not in remaining:
+            announcer.discard(message)
+
+
+def announce_alarm(user: str, alarm: dict):
+    message = alarm_message(alarm)
+    logging.info(message)
+    announcer.announce(message, forget=True)
+
+
+# One announcer speaks the alarms, with one text-to-speech engine.
+announcer = Announcer()
+
+# One store holds the alarms of all users of the process, and one scheduler
+# fires the alarms of the signed-in users.
+_store = None
+_scheduler = None
+_lock = threading.Lock()
+
+
+def get_alarm_store() -> AlarmStore:
+    """Return the process-wide alarm store, starting it on first use."""
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                store = AlarmStore(db.reference('/users'))
+                store.start()
+                _store = store
+    return _store
+
+
+def get_alarm_scheduler() -> AlarmScheduler:
+    """Return the process-wide alarm scheduler, starting it on first use."""
+    global _scheduler
+    if _scheduler is None:
+        store = get_alarm_store()
+        with _lock:
+            if _scheduler is None:
+                scheduler = AlarmScheduler(store, announce_alarm, max_workers=1)
+                scheduler.start()
+                _scheduler = scheduler
+    return _scheduler
+
+
 def check_and_notify_alarms(email):
-    while True:
-        # Get the current time
-        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-
-        # Query Firebase for alarms
-        user_email = email.replace(".", "_")
-        alarms_ref = db.reference(f'/users/{user_email}/alarms')
-        alarms = alarms_ref.order_by_key().end_at(current_time).get()
-
-        # Print available alarms
-        if alarms:
-            print("Available alarms:")
-            for key, value in alarms.items():
-                print(f"Alarm ID: {key}, Time: {value['clock']}, Day: {value['day']}, Date: {value['date']}")
-
-        # If there are any alarms that have passed, notify and remove them
-        if alarms:
-            engine = pyttsx3.init()
-
-            for key, value in alarms.items():
-                alarm_time_str = f"{value['date']} {value['clock']}"
-                try:
-                    alarm_time = datetime.datetime.strptime(alarm_time_str, "%Y-%m-%d %H:%M:%S")
-                except ValueError:
-                    alarm_time = datetime.datetime.strptime(alarm_time_str, "%Y-%m-%d %H:%M")
-                    
-                alarm_time_formatted = alarm_time.strftime("%Y-%m-%d %H:%M")
-                
-                print(alarm_time_formatted)
-                if alarm_time_formatted <= current_time:
-                    engine.say(f"Alarm at {value['clock']} on {value['day']}, {value['date']} has passed.")
-                    print(f"Alarm at {value['clock']} on {value['day']}, {value['date']} has passed.")
-                    alarms_ref.child(key).delete()
-                else:
-                    print(f"Alarm {alarm_time} is still pending.")
-            
-            engine.runAndWait()
-
-
-            # Check if the engine is already running
-            if not engine.isBusy():
-                # Start the engine to process the speech synthesis tasks
-                engine.runAndWait()
-
-        # Wait for some time before checking again (e.g., every 60 seconds)
-        time.sleep(60)
\ No newline at end of file
+    """Start announcing the alarms of a user, unless that already happens."""
+    get_alarm_scheduler().add_user(email.replace(".", "_"))
+
+
+def stop_notifying_alarms(email):
+    get_alarm_scheduler().remove_user(email.replace(".", "_"))
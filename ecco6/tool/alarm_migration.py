@@ -0,0 +1,52 @@
+"""Adds the fire_at epoch field to alarms that were written without it.
+
+Run from the repository root, with the Firebase secrets configured:
+  python -m ecco6.tool.alarm_migration
+"""
+import logging
+import time
+
+from ecco6.tool.alarm_scheduler import due_alarms, parse_alarm_time
+
+# Maximum number of fields written by one multi-path update.
+BATCH_SIZE = 500
+
+
+def migrate_fire_at(users_ref) -> int:
+    """Set fire_at on every alarm whose fire_at is missing or out of date.
+
+    Args:
+      users_ref: The database reference of the users, e.g. db.reference("/users").
+    Returns:
+      The number of alarms that were updated.
+    """
+    updates = {}
+    for user, data in (users_ref.get() or {}).items():
+        alarms = data.get("alarms") if isinstance(data, dict) else None
+        for alarm_id, alarm in (alarms or {}).items():
+            fire_at = parse_alarm_time(alarm.get("date"), alarm.get("clock"))
+            if fire_at is None:
+                logging.warning(f"Alarm {alarm_id} of {user} has an invalid time: {alarm}")
+            elif alarm.get("fire_at") != fire_at:
+                updates[f"{user}/alarms/{alarm_id}/fire_at"] = fire_at
+
+    paths = list(updates)
+    for start in range(0, len(paths), BATCH_SIZE):
+        users_ref.update({path: updates[path] for path in paths[start:start + BATCH_SIZE]})
+    return len(updates)
+
+
+def count_due_alarms(users_ref, now: float) -> int:
+    """Count the due alarms of all users with the fire_at index."""
+    users = users_ref.get(shallow=True) or {}
+    return sum(len(due_alarms(users_ref.child(f"{user}/alarms"), now)) for user in users)
+
+
+if __name__ == "__main__":
+    from firebase_admin import db
+
+    from ecco6.auth import firebase_auth  # Initializes the Firebase app.
+
+    users_ref = db.reference("/users")
+    print(f"Added fire_at to {migrate_fire_at(users_ref)} alarms.")
+    print(f"{count_due_alarms(users_ref, time.time())} alarms are due.")
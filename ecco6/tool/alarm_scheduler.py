@@ -0,0 +1,223 @@
+import concurrent.futures
+import datetime
+import heapq
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ecco6.tool.alarm_store import AlarmStore, set_path, split_path
+
+# Upper bound of one sleep, so that a changed wall clock is noticed.
+MAX_SLEEP = 60
+
+
+def parse_alarm_time(date: str, clock: str) -> Optional[float]:
+    """Return the epoch time of an alarm, or None if it cannot be parsed.
+
+    Args:
+      date: The date of the alarm, e.g. 2024-05-01.
+      clock: The local time of the alarm, e.g. 07:30 or 07:30:00.
+    """
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M"):
+        try:
+            return datetime.datetime.strptime(f"{date} {clock}", fmt).timestamp()
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def alarm_fire_at(alarm: dict) -> Optional[float]:
+    """Return the epoch time of an alarm, from fire_at or from date and clock.
+
+    Alarms written before fire_at was added only have date and clock.
+    """
+    fire_at = alarm.get("fire_at")
+    if isinstance(fire_at, (int, float)) and not isinstance(fire_at, bool):
+        return float(fire_at)
+    return parse_alarm_time(alarm.get("date"), alarm.get("clock"))
+
+
+def due_alarms(alarms_ref, now: Optional[float] = None) -> dict:
+    """Return the due alarms of a user with a range query on the fire_at index.
+
+    Only the due records are read. Alarms without fire_at are not returned,
+    since start_at(0) excludes them.
+    """
+    now = time.time() if now is None else now
+    return alarms_ref.order_by_child("fire_at").start_at(0).end_at(now).get() or {}
+
+
+class AlarmScheduler:
+    """Fires the alarms of all users on time.
+
+    The alarms are mirrored locally from one listener on the users node, and
+    their fire times are kept in a min-heap keyed by (fire time, user, alarm),
+    so a single thread sleeps exactly until the next alarm of any user instead
+    of polling the database. Notifications run on a bounded thread pool, so
+    the number of threads does not depend on the number of users.
+
+    Only the alarms of users added with add_user() fire; the due alarms of
+    other users stay in the database until the user is added again. A fired
+    alarm is deleted from the store.
+    """
+
+    def __init__(self, store: AlarmStore, notify: Callable[[str, dict], None],
+                 clock: Callable[[], float] = time.time, max_workers: int = 4):
+        """Create the scheduler.
+
+        Args:
+          store: The alarm store whose changes are followed.
+          notify: Called with the user and the alarm data when an alarm fires.
+          clock: The wall clock in epoch seconds.
+          max_workers: The number of threads that run notify.
+        """
+        self._store = store
+        self._notify = notify
+        self._clock = clock
+        self._users: Dict[str, dict] = {}
+        self._fire_at: Dict[str, Dict[str, float]] = {}
+        self._heap: List[Tuple[float, str, str]] = []
+        self._active = set()
+        self._cond = threading.Condition()
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="alarm-notify")
+        self._registration = None
+        self._thread = None
+        self._stopped = False
+
+    def _alarms_of(self, user: str) -> dict:
+        alarms = self._users.get(user)
+        alarms = alarms.get("alarms") if isinstance(alarms, dict) else None
+        return alarms if isinstance(alarms, dict) else {}
+
+    def _schedule(self, user: str, alarm_id: str):
+        alarm = self._alarms_of(user).get(alarm_id)
+        fire_at = None
+        if isinstance(alarm, dict):
+            fire_at = alarm_fire_at(alarm)
+            if fire_at is None:
+                logging.warning(f"Alarm {alarm_id} of {user} has an invalid time: {alarm}")
+        fire_times = self._fire_at.setdefault(user, {})
+        if fire_at is None:
+            fire_times.pop(alarm_id, None)
+        elif fire_times.get(alarm_id) != fire_at:
+            fire_times[alarm_id] = fire_at
+            if user in self._active:
+                heapq.heappush(self._heap, (fire_at, user, alarm_id))
+
+    def _changed_alarms(self, path: List[str]) -> List[Tuple[str, str]]:
+        if len(path) >= 3:
+            return [(path[0], path[2])] if path[1] == "alarms" else []
+        users = [path[0]] if path else set(self._users) | set(self._fire_at)
+        return [(user, alarm_id) for user in users
+                for alarm_id in set(self._alarms_of(user)) | set(self._fire_at.get(user, {}))]
+
+    def on_event(self, event):
+        """Apply a listener event (put or patch) to the mirror."""
+        path = split_path(event.path)
+        if event.event_type == "patch":
+            updates = [(path + split_path(key), value) for key, value in (event.data or {}).items()]
+        else:
+            updates = [(path, event.data)]
+
+        with self._cond:
+            changed = set()
+            for path, value in updates:
+                # Alarms that are removed by the update must be unscheduled too.
+                changed.update(self._changed_alarms(path))
+                if not path:
+                    self._users = dict(value or {})
+                else:
+                    set_path(self._users, path, value)
+                changed.update(self._changed_alarms(path))
+            for user, alarm_id in changed:
+                self._schedule(user, alarm_id)
+            self._cond.notify()
+
+    def add_user(self, user: str):
+        """Fire the alarms of a user from now on, including overdue ones."""
+        with self._cond:
+            if user in self._active:
+                return
+            self._active.add(user)
+            for alarm_id, fire_at in self._fire_at.get(user, {}).items():
+                heapq.heappush(self._heap, (fire_at, user, alarm_id))
+            self._cond.notify()
+
+    def remove_user(self, user: str):
+        """Stop firing the alarms of a user."""
+        with self._cond:
+            self._active.discard(user)
+
+    def has_user(self, user: str) -> bool:
+        return user in self._active
+
+    def next_fire_time(self) -> Optional[float]:
+        """Return the fire time of the next alarm, or None if there is none."""
+        with self._cond:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def _drop_stale(self):
+        while self._heap:
+            fire_at, user, alarm_id = self._heap[0]
+            if user in self._active and self._fire_at.get(user, {}).get(alarm_id) == fire_at:
+                return
+            heapq.heappop(self._heap)
+
+    def _pop_due(self, now: float) -> List[Tuple[str, str, dict]]:
+        due = []
+        self._drop_stale()
+        while self._heap and self._heap[0][0] <= now:
+            _, user, alarm_id = heapq.heappop(self._heap)
+            del self._fire_at[user][alarm_id]
+            due.append((user, alarm_id, self._alarms_of(user).pop(alarm_id)))
+            self._drop_stale()
+        return due
+
+    def _fire(self, user: str, alarm_id: str, alarm: dict):
+        try:
+            self._notify(user, alarm)
+        except Exception:
+            logging.exception(f"Failed to notify alarm {alarm_id} of {user}.")
+        try:
+            self._store.delete(user, alarm_id)
+        except Exception:
+            logging.exception(f"Failed to delete alarm {alarm_id} of {user}.")
+
+    def run(self):
+        """Fire alarms until stop() is called."""
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                due = self._pop_due(self._clock())
+                if not due:
+                    timeout = MAX_SLEEP
+                    if self._heap:
+                        timeout = min(timeout, max(0.0, self._heap[0][0] - self._clock()))
+                    self._cond.wait(timeout)
+                    continue
+            for user, alarm_id, alarm in due:
+                self._pool.submit(self._fire, user, alarm_id, alarm)
+
+    def start(self):
+        """Start following the store and firing alarms, unless already started."""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.run, name="alarm-scheduler", daemon=True)
+        self._registration = self._store.listen(self.on_event)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5):
+        """Stop listening and wait for the pending notifications."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._registration is not None:
+            self._registration.close()
+            self._registration = None
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._pool.shutdown(wait=True)
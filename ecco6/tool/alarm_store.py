@@ -0,0 +1,200 @@
+import copy
+import logging
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+
+def split_path(path: str) -> List[str]:
+    return [part for part in path.split("/") if part]
+
+
+def set_path(tree: dict, path: List[str], value: Any):
+    """Set or, for None, delete the value at a path of a nested dict."""
+    node = tree
+    for key in path[:-1]:
+        child = node.get(key)
+        if not isinstance(child, dict):
+            child = node[key] = {}
+        node = child
+    if value is None:
+        node.pop(path[-1], None)
+    else:
+        node[path[-1]] = value
+
+
+def new_alarm_id() -> str:
+    """Return a new alarm id that sorts by creation time, like a push id."""
+    return f"{time.time_ns() // 1000:016x}{secrets.token_hex(4)}"
+
+
+class Event:
+    """A change of the alarms, shaped like a firebase_admin.db.Event."""
+
+    def __init__(self, event_type: str, path: str, data: Any):
+        self.event_type = event_type
+        self.path = path
+        self.data = data
+
+
+class Subscription:
+    def __init__(self, store: "AlarmStore", callback: Callable[[Event], None]):
+        self._store = store
+        self._callback = callback
+
+    def close(self):
+        self._store._unsubscribe(self._callback)
+
+
+class AlarmStore:
+    """A local copy of the alarms of all users, written through to Firebase.
+
+    The copy is kept fresh by one listener on the users node, so reads are
+    served from memory. Writes are applied locally first and then written to
+    the database; writes that fail are queued and retried in order by a
+    background thread, and re-applied on top of newer snapshots until they
+    succeed.
+    """
+
+    def __init__(self, users_ref, retry_interval: float = 5, load_timeout: float = 10):
+        """Create the store.
+
+        Args:
+          users_ref: The database reference of the users, e.g. db.reference("/users").
+            The alarms of a user are under <user>/alarms.
+          retry_interval: Seconds between two attempts to write queued writes.
+          load_timeout: How long reads wait for the first snapshot.
+        """
+        self._ref = users_ref
+        self.retry_interval = retry_interval
+        self.load_timeout = load_timeout
+        self._users: Dict[str, dict] = {}
+        self._pending: List[Dict[str, Any]] = []
+        self._subscribers: List[Callable[[Event], None]] = []
+        self._lock = threading.RLock()
+        self._loaded = threading.Event()
+        self._retry = threading.Condition(self._lock)
+        # Held across a direct write, so a later write cannot overtake one
+        # that is about to fail and be queued.
+        self._write_lock = threading.Lock()
+        self._registration = None
+        self._thread = None
+        self._stopped = False
+
+    def start(self):
+        """Start listening to the database, unless already started."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._retry_writes, name="alarm-store-retry", daemon=True)
+            self._thread.start()
+        self._registration = self._ref.listen(self._on_event)
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            self._retry.notify()
+        if self._registration is not None:
+            self._registration.close()
+            self._registration = None
+
+    def listen(self, callback: Callable[[Event], None]) -> Subscription:
+        """Call callback with every change, starting with a snapshot of all users."""
+        with self._lock:
+            self._subscribers.append(callback)
+            if self._loaded.is_set():
+                callback(Event("put", "/", copy.deepcopy(self._users)))
+        return Subscription(self, callback)
+
+    def _unsubscribe(self, callback: Callable[[Event], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _apply(self, event: Event):
+        path = split_path(event.path)
+        if event.event_type == "patch":
+            for key, value in (event.data or {}).items():
+                set_path(self._users, path + split_path(key), copy.deepcopy(value))
+        elif path:
+            set_path(self._users, path, copy.deepcopy(event.data))
+        else:
+            self._users = copy.deepcopy(event.data) or {}
+        for subscriber in list(self._subscribers):
+            subscriber(event)
+
+    def _on_event(self, event):
+        with self._lock:
+            self._apply(event)
+            # The database does not have the queued writes yet.
+            for updates in self._pending:
+                self._apply(Event("patch", "/", updates))
+            if not split_path(event.path):
+                self._loaded.set()
+
+    def alarms(self, user: str) -> Dict[str, dict]:
+        """Return the alarms of a user by id."""
+        self._loaded.wait(self.load_timeout)
+        with self._lock:
+            alarms = self._users.get(user, {}).get("alarms")
+            return copy.deepcopy(alarms) if isinstance(alarms, dict) else {}
+
+    def add(self, user: str, alarm: dict) -> str:
+        """Add an alarm of a user and return its id."""
+        alarm_id = new_alarm_id()
+        self.update(user, {alarm_id: alarm})
+        return alarm_id
+
+    def delete(self, user: str, alarm_id: str):
+        self.update(user, {alarm_id: None})
+
+    def update(self, user: str, updates: Dict[str, Any]):
+        """Apply a multi-path update to the alarms of a user.
+
+        Args:
+          user: The user.
+          updates: Values by path relative to the alarm list of the user, e.g.
+            {"<alarm id>/clock": "07:30"}. None deletes the value.
+        """
+        updates = {f"{user}/alarms/{path}": value for path, value in updates.items()}
+        with self._write_lock:
+            with self._lock:
+                self._apply(Event("patch", "/", updates))
+                if self._pending:
+                    # Keep the writes in order behind the queued ones.
+                    self._pending.append(updates)
+                    self._retry.notify()
+                    return
+            try:
+                self._ref.update(updates)
+            except Exception:
+                logging.exception("Failed to write alarms, the write is queued for retry.")
+                with self._lock:
+                    self._pending.append(updates)
+                    self._retry.notify()
+
+    def pending_writes(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _retry_writes(self):
+        with self._lock:
+            while not self._stopped:
+                if not self._pending:
+                    self._retry.wait()
+                    continue
+                updates = self._pending[0]
+                self._lock.release()
+                try:
+                    self._ref.update(updates)
+                    succeeded = True
+                except Exception:
+                    logging.warning("Failed to write queued alarms, retrying later.")
+                    succeeded = False
+                finally:
+                    self._lock.acquire()
+                if succeeded:
+                    self._pending.pop(0)
+                else:
+                    self._retry.wait(self.retry_interval)
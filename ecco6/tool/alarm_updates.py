@@ -0,0 +1,44 @@
+from typing import Dict, Iterable, Optional
+
+from ecco6.tool.alarm_scheduler import parse_alarm_time
+
+ALARM_FIELDS = ("day", "date", "clock", "title")
+
+
+def filter_alarms(alarms: Optional[dict], **criteria) -> dict:
+    """Return the alarms whose fields equal all given criteria, in one pass.
+
+    Args:
+      alarms: The alarms by id, as read from the database.
+      criteria: Field values, e.g. day="Monday". Empty values match any alarm.
+    """
+    criteria = {field: value for field, value in criteria.items() if value}
+    return {
+        alarm_id: alarm for alarm_id, alarm in (alarms or {}).items()
+        if all(alarm.get(field) == value for field, value in criteria.items())}
+
+
+def modify_updates(alarms: dict, **changes) -> Dict[str, object]:
+    """Return one multi-path update that applies the changes to the alarms.
+
+    The paths are relative to the alarm list, e.g. "<alarm id>/clock", and
+    fire_at is recomputed when the date or the clock changes.
+
+    Args:
+      alarms: The alarms to change by id.
+      changes: New field values. None values are left unchanged.
+    """
+    changes = {field: value for field, value in changes.items() if value is not None}
+    updates = {}
+    for alarm_id, alarm in alarms.items():
+        for field, value in changes.items():
+            updates[f"{alarm_id}/{field}"] = value
+        if "date" in changes or "clock" in changes:
+            updates[f"{alarm_id}/fire_at"] = parse_alarm_time(
+                changes.get("date", alarm.get("date")), changes.get("clock", alarm.get("clock")))
+    return updates
+
+
+def delete_updates(alarm_ids: Iterable[str]) -> Dict[str, None]:
+    """Return one multi-path update that deletes the alarms."""
+    return {alarm_id: None for alarm_id in alarm_ids}
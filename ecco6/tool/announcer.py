@@ -0,0 +1,175 @@
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+import wave
+from typing import Callable, Optional
+
+from ecco6 import cache
+
+CHUNK_FRAMES = 1024
+# Seconds before creating the engine is tried again after it failed.
+ENGINE_RETRY_INTERVAL = 300
+
+
+def play_wav(path: str):
+    """Play a wav file on the default output device."""
+    import pyaudio
+
+    audio = pyaudio.PyAudio()
+    try:
+        with wave.open(path, "rb") as f:
+            stream = audio.open(
+                format=audio.get_format_from_width(f.getsampwidth()),
+                channels=f.getnchannels(), rate=f.getframerate(), output=True)
+            try:
+                data = f.readframes(CHUNK_FRAMES)
+                while data:
+                    stream.write(data)
+                    data = f.readframes(CHUNK_FRAMES)
+            finally:
+                stream.stop_stream()
+                stream.close()
+    finally:
+        audio.terminate()
+
+
+def _create_engine():
+    import pyttsx3
+    return pyttsx3.init()
+
+
+class Announcer:
+    """Speaks announcements with one text-to-speech engine.
+
+    pyttsx3 engines are expensive to create and not thread-safe, so a single
+    worker thread owns the engine and takes its work from a queue.
+    Announcements that are known in advance, like alarms, are rendered to
+    cached wav files with prerender(), so announcing them later is only
+    playback.
+    """
+
+    def __init__(self, directory: Optional[str] = None,
+                 create_engine: Callable[[], object] = _create_engine,
+                 play: Callable[[str], None] = play_wav):
+        """Create the announcer.
+
+        Args:
+          directory: Where rendered announcements are cached. Defaults to the
+            announcements directory of the cache directory.
+          create_engine: Creates the pyttsx3 engine, in the worker thread.
+          play: Plays a rendered wav file.
+        """
+        self.directory = directory or os.path.join(cache.cache_dir(), "announcements")
+        self._create_engine = create_engine
+        self._play = play
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # Playback and speech must not overlap.
+        self._speaker = threading.Lock()
+
+    def path(self, text: str) -> str:
+        """Return the path of the rendered announcement of a text."""
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.wav")
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="announcer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        engine = None
+        failed_at = None
+        while True:
+            action, text, done = self._queue.get()
+            try:
+                if action == "discard":
+                    self._discard(text)
+                    continue
+                # Without an engine, e.g. on a host without espeak, work is
+                # skipped right away instead of blocking the callers.
+                if engine is None and (failed_at is None
+                                       or time.monotonic() - failed_at >= ENGINE_RETRY_INTERVAL):
+                    try:
+                        engine = self._create_engine()
+                    except Exception:
+                        logging.exception("Failed to create the text-to-speech engine.")
+                        failed_at = time.monotonic()
+                if engine is None:
+                    logging.warning(f"No text-to-speech engine, skipping announcement: {text}")
+                elif action == "render":
+                    self._render(engine, text)
+                else:
+                    with self._speaker:
+                        engine.say(text)
+                        engine.runAndWait()
+            except Exception:
+                logging.exception(f"Failed to {action} announcement: {text}")
+            finally:
+                if done is not None:
+                    done.set()
+
+    def _render(self, engine, text: str):
+        path = self.path(text)
+        if os.path.exists(path):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.wav"
+        engine.save_to_file(text, tmp_path)
+        engine.runAndWait()
+        os.replace(tmp_path, path)
+
+    def prerender(self, text: str):
+        """Render an announcement to the cache in the background."""
+        if not os.path.exists(self.path(text)):
+            self._start()
+            self._queue.put(("render", text, None))
+
+    def _discard(self, text: str):
+        try:
+            os.remove(self.path(text))
+        except FileNotFoundError:
+            pass
+
+    def discard(self, text: str):
+        """Delete the rendered announcement of a text that will not be made."""
+        with self._lock:
+            started = self._thread is not None
+        if started:
+            # After any render of the text that is still queued.
+            self._queue.put(("discard", text, None))
+        else:
+            self._discard(text)
+
+    def announce(self, text: str, forget: bool = False, timeout: Optional[float] = 60):
+        """Speak an announcement and wait until it has been spoken.
+
+        A rendered announcement is played back; any other is synthesized by
+        the worker.
+
+        Args:
+          text: The announcement.
+          forget: Whether to delete the rendered announcement after playback,
+            for announcements that are made once.
+          timeout: How long to wait for a synthesized announcement.
+        """
+        path = self.path(text)
+        if os.path.exists(path):
+            try:
+                with self._speaker:
+                    self._play(path)
+            except Exception:
+                logging.exception(f"Failed to play {path}, speaking it instead.")
+            else:
+                if forget:
+                    os.remove(path)
+                return
+        done = threading.Event()
+        self._start()
+        self._queue.put(("say", text, done))
+        done.wait(timeout)
@@ -0,0 +1,110 @@
+import datetime
+import logging
+from typing import Dict, List, Tuple
+
+from tzlocal import get_localzone
+
+from ecco6.tool.calendar_store import PAGE_SIZE, event_time
+
+# The Calendar API takes at most 50 requests per batch.
+BATCH_SIZE = 50
+CALENDAR_FIELDS = "items(id,summary,summaryOverride,primary,hidden),nextPageToken"
+RANGE_FIELDS = "items(summary,start,end),nextPageToken"
+
+
+def list_calendars(service) -> List[Dict]:
+    """Return the calendars of the calendar list that are not hidden, the primary one first."""
+    calendars = []
+    page_token = None
+    while True:
+        response = service.calendarList().list(fields=CALENDAR_FIELDS, pageToken=page_token).execute()
+        calendars.extend(c for c in response.get("items", []) if not c.get("hidden"))
+        page_token = response.get("nextPageToken")
+        if page_token is None:
+            break
+    calendars.sort(key=lambda c: not c.get("primary", False))
+    return calendars
+
+
+def list_events(service, calendars: List[Dict], time_min: datetime.datetime,
+                time_max: datetime.datetime, tz=None) -> List[Tuple[Dict, Dict]]:
+    """List the events of several calendars in a time range with batch requests.
+
+    The first page of every calendar is requested in one batch, then the
+    next pages of the calendars that have more, so the number of round trips
+    is the number of pages of the longest calendar. Calendars that fail are
+    left out.
+
+    Args:
+      service: The Calendar service.
+      calendars: The calendars, from list_calendars.
+      time_min: The start of the range.
+      time_max: The end of the range.
+      tz: The timezone of all-day events. Defaults to the local timezone.
+    Returns:
+      (calendar, event) pairs of all calendars, by start time.
+    """
+    events = {i: [] for i in range(len(calendars))}
+    page_tokens = {i: None for i in range(len(calendars))}
+
+    def collect(request_id, response, exception):
+        i = int(request_id)
+        if exception is not None:
+            logging.warning(f"Failed to list the events of calendar {calendars[i]['id']}: {exception}")
+            page_tokens.pop(i)
+            return
+        events[i].extend(response.get("items", []))
+        if response.get("nextPageToken") is None:
+            page_tokens.pop(i)
+        else:
+            page_tokens[i] = response["nextPageToken"]
+
+    while page_tokens:
+        pending = list(page_tokens.items())
+        for start in range(0, len(pending), BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=collect)
+            for i, page_token in pending[start:start + BATCH_SIZE]:
+                batch.add(service.events().list(
+                    calendarId=calendars[i]["id"], timeMin=time_min.isoformat(), timeMax=time_max.isoformat(),
+                    singleEvents=True, orderBy="startTime", maxResults=PAGE_SIZE, fields=RANGE_FIELDS,
+                    pageToken=page_token), request_id=str(i))
+            batch.execute()
+
+    merged = [(calendars[i], event) for i in events for event in events[i]]
+    merged.sort(key=lambda pair: event_time(pair[1]["start"], tz))
+    return merged
+
+
+def calendar_name(calendar: Dict) -> str:
+    return calendar.get("summaryOverride") or calendar.get("summary") or calendar["id"]
+
+
+def format_events(events: List[Tuple[Dict, Dict]], tz=None) -> str:
+    """Format events by day, one line per event, e.g. "  09:00-09:15 Standup".
+
+    Events of calendars other than the primary one are followed by the name
+    of their calendar.
+    """
+    tz = tz or get_localzone()
+    lines = []
+    day = None
+    for calendar, event in events:
+        start, end = event["start"], event["end"]
+        if "date" in start:
+            event_day = start["date"]
+            last_day = (datetime.date.fromisoformat(end["date"]) - datetime.timedelta(days=1)).isoformat()
+            when = "all day" if last_day == event_day else f"until {last_day}"
+        else:
+            start_time = event_time(start).astimezone(tz)
+            end_time = event_time(end).astimezone(tz)
+            event_day = start_time.date().isoformat()
+            end_format = "%H:%M" if end_time.date() == start_time.date() else "%Y-%m-%d %H:%M"
+            when = f"{start_time:%H:%M}-{end_time.strftime(end_format)}"
+        if event_day != day:
+            day = event_day
+            lines.append(day)
+        line = f"  {when} {event.get('summary', '(No title)')}"
+        if not calendar.get("primary"):
+            line += f" ({calendar_name(calendar)})"
+        lines.append(line)
+    return "\n".join(lines)
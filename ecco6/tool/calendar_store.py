@@ -0,0 +1,199 @@
+import bisect
+import datetime
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from googleapiclient.errors import HttpError
+from tzlocal import get_localzone
+
+from ecco6.tool.google_services import get_service
+from ecco6.tool.synced_stores import SyncedStores
+
+REFRESH_INTERVAL = 60
+# How far back a full sync reaches, like the sync example of the Calendar API.
+FULL_SYNC_DAYS = 365
+# How far ahead a full sync reaches, so recurring events without an end
+# are expanded over a bounded window only.
+FULL_SYNC_FUTURE_DAYS = 180
+PAGE_SIZE = 2500
+EVENT_FIELDS = "id,status,summary,start,end"
+LIST_FIELDS = f"items({EVENT_FIELDS}),nextPageToken,nextSyncToken"
+
+
+def event_time(when: Dict, tz=None) -> datetime.datetime:
+    """Return the aware datetime of the start or end of an event.
+
+    All-day events have a date instead of a dateTime, which is taken as
+    midnight in tz, the local timezone by default.
+    """
+    if "dateTime" in when:
+        value = when["dateTime"]
+        # RFC 3339 allows a Z offset, which fromisoformat takes only from Python 3.11.
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        return datetime.datetime.fromisoformat(value)
+    day = datetime.date.fromisoformat(when["date"])
+    return datetime.datetime.combine(day, datetime.time(), tzinfo=tz or get_localzone())
+
+
+def day_bounds(date: str, tz=None):
+    """Return the start of a YYYY-MM-DD day and of the next day in tz."""
+    start = datetime.datetime.combine(
+        datetime.date.fromisoformat(date), datetime.time(), tzinfo=tz or get_localzone())
+    return start, start + datetime.timedelta(days=1)
+
+
+class CalendarStore:
+    """A local copy of the events of a calendar.
+
+    The first sync lists the events of the last FULL_SYNC_DAYS days and of
+    the next FULL_SYNC_FUTURE_DAYS days, the window of the store. Later syncs only list the changes since the last sync
+    with the syncToken of the previous listing, so lookups are served from
+    memory and only deltas are downloaded.
+    """
+
+    def __init__(self, calendar_id: str = "primary", clock: Callable[[], float] = time.time, tz=None):
+        """Create an empty store.
+
+        Args:
+          calendar_id: The calendar.
+          clock: The clock of the sync times and of the full sync window.
+          tz: The timezone of all-day events and days. Defaults to the local timezone.
+        """
+        self.calendar_id = calendar_id
+        self._clock = clock
+        self._tz = tz
+        self._events: Dict[str, Dict] = {}
+        # (start, end, id) of the events, sorted by start.
+        self._timeline = []
+        self._max_duration = datetime.timedelta()
+        self._sync_token = None
+        # The start and end of the full sync, as aware datetimes.
+        self._window = None
+        self.synced_at = None
+        self._lock = threading.Lock()
+        # Syncs must not overlap, or a sync token would be used twice.
+        self._sync_lock = threading.Lock()
+
+    def _index(self):
+        timeline = []
+        max_duration = datetime.timedelta()
+        for event in self._events.values():
+            start = event_time(event["start"], self._tz)
+            end = event_time(event["end"], self._tz)
+            timeline.append((start, end, event["id"]))
+            max_duration = max(max_duration, end - start)
+        timeline.sort()
+        self._timeline = timeline
+        self._max_duration = max_duration
+
+    def _apply(self, items: List[Dict]):
+        for event in items:
+            if event.get("status") == "cancelled" or "start" not in event:
+                self._events.pop(event["id"], None)
+            else:
+                self._events[event["id"]] = event
+
+    def _list(self, service, **kwargs):
+        items = []
+        page_token = None
+        while True:
+            response = service.events().list(
+                calendarId=self.calendar_id, singleEvents=True, maxResults=PAGE_SIZE,
+                fields=LIST_FIELDS, pageToken=page_token, **kwargs).execute()
+            items.extend(response.get("items", []))
+            page_token = response.get("nextPageToken")
+            if page_token is None:
+                return items, response.get("nextSyncToken")
+
+    def sync(self, service) -> int:
+        """Apply the changes since the last sync. Returns the number of changed events.
+
+        Falls back to a full sync on the first sync, and when the sync token
+        has expired.
+        """
+        with self._sync_lock:
+            full = self._sync_token is None
+            if not full:
+                try:
+                    items, sync_token = self._list(service, syncToken=self._sync_token)
+                except HttpError as e:
+                    if e.resp.status != 410:
+                        raise
+                    logging.info(f"The sync token of calendar {self.calendar_id} has expired, syncing it again.")
+                    full = True
+            if full:
+                now = datetime.datetime.fromtimestamp(self._clock(), datetime.timezone.utc)
+                window = (now - datetime.timedelta(days=FULL_SYNC_DAYS),
+                          now + datetime.timedelta(days=FULL_SYNC_FUTURE_DAYS))
+                items, sync_token = self._list(
+                    service, timeMin=window[0].isoformat(), timeMax=window[1].isoformat())
+            with self._lock:
+                if full:
+                    self._events = {}
+                    self._window = window
+                self._apply(items)
+                self._index()
+                self._sync_token = sync_token
+                self.synced_at = self._clock()
+            return len(items)
+
+    def put(self, event: Dict):
+        """Store an event that was just written, before the next sync lists it."""
+        with self._lock:
+            self._apply([event])
+            self._index()
+
+    def remove(self, event_id: str):
+        with self._lock:
+            self._events.pop(event_id, None)
+            self._index()
+
+    def covers(self, start: datetime.datetime, end: datetime.datetime) -> bool:
+        """Whether all events that overlap [start, end) are in the store."""
+        with self._lock:
+            return self._window is not None and self._window[0] <= start and end <= self._window[1]
+
+    def events_between(self, start: datetime.datetime, end: datetime.datetime) -> List[Dict]:
+        """Return the events that overlap [start, end), by start time."""
+        with self._lock:
+            timeline = self._timeline
+            # Events that start more than the longest event before start
+            # cannot overlap.
+            first = bisect.bisect_left(timeline, (start - self._max_duration,))
+            last = bisect.bisect_left(timeline, (end,))
+            return [self._events[event_id] for event_start, event_end, event_id in timeline[first:last]
+                    if event_end > start or (event_start == event_end and event_start >= start)]
+
+    def day(self, date: str) -> List[Dict]:
+        """Return the events of a YYYY-MM-DD day, by start time."""
+        return self.events_between(*day_bounds(date, self._tz))
+
+    def next_event(self, now: Optional[datetime.datetime] = None) -> Optional[Dict]:
+        """Return the first event that starts at or after now.
+
+        Returns None if there is none before the end of the window of the store.
+        """
+        now = now or datetime.datetime.fromtimestamp(self._clock(), datetime.timezone.utc)
+        with self._lock:
+            i = bisect.bisect_left(self._timeline, (now,))
+            if self._window is None or i == len(self._timeline) or self._timeline[i][0] >= self._window[1]:
+                return None
+            return self._events[self._timeline[i][2]]
+
+    def find(self, title: str, date: Optional[str] = None) -> List[Dict]:
+        """Return the events with a title, ignoring case, optionally of one day."""
+        if date is not None:
+            events = self.day(date)
+        else:
+            with self._lock:
+                events = [self._events[event_id] for _, _, event_id in self._timeline]
+        return [event for event in events if event.get("summary", "").lower() == title.lower()]
+
+
+calendar_sync = SyncedStores(
+    lambda key: CalendarStore(),
+    lambda credentials: get_service("calendar", "v3", credentials),
+    REFRESH_INTERVAL, name="calendar-sync")
@@ -0,0 +1,119 @@
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+UNREAD_QUERY = 'in:inbox is:unread -category:(promotions OR social)'
+# Gmail recommends at most 50 requests per batch.
+BATCH_SIZE = 50
+METADATA_HEADERS = ["From", "Subject"]
+METADATA_FIELDS = "id,threadId,labelIds,snippet,internalDate,payload/headers"
+
+
+def list_message_ids(service, query: str, limit: int) -> Tuple[List[str], bool]:
+    """List the ids of the newest messages matching a query.
+
+    Args:
+      service: The Gmail service.
+      query: The Gmail search query.
+      limit: The maximum number of ids.
+    Returns:
+      The ids, and whether more messages match.
+    """
+    ids = []
+    page_token = None
+    while len(ids) < limit:
+        response = service.users().messages().list(
+            userId='me', q=query, maxResults=min(500, limit - len(ids)),
+            pageToken=page_token, fields="messages/id,nextPageToken").execute()
+        ids.extend(message['id'] for message in response.get('messages', []))
+        page_token = response.get('nextPageToken')
+        if page_token is None:
+            break
+    return ids, page_token is not None
+
+
+def count_unread(service, label_id: str = 'INBOX') -> int:
+    """Return the number of unread messages of a label with one request."""
+    label = service.users().labels().get(userId='me', id=label_id, fields="messagesUnread").execute()
+    return label.get('messagesUnread', 0)
+
+
+def header(message: dict, name: str, default: Optional[str] = None) -> Optional[str]:
+    headers = message.get('payload', {}).get('headers', [])
+    return next((h['value'] for h in headers if h['name'].lower() == name.lower()), default)
+
+
+def fetch_message_metadata(service, ids: List[str], retries: int = 0, backoff: float = 1,
+                           batch_interval: float = 0) -> Tuple[List[Dict], List[str]]:
+    """Fetch the From and Subject headers of messages with batch requests.
+
+    Only the metadata is downloaded, BATCH_SIZE messages per round trip.
+    Messages that no longer exist are left out.
+
+    Args:
+      service: The Gmail service.
+      ids: The message ids.
+      retries: How many times to retry messages that failed, e.g. because
+        of the rate limit.
+      backoff: Seconds before the first retry; it doubles with every retry.
+      batch_interval: Seconds between two batches, to stay within the
+        quota of the user.
+    Returns:
+      The messages in the order of the ids, with the fields of
+      METADATA_FIELDS, and the ids of the messages that failed.
+    """
+    messages = {}
+    failed = []
+
+    def collect(request_id, response, exception):
+        if exception is None:
+            messages[request_id] = response
+        elif getattr(getattr(exception, 'resp', None), 'status', None) != 404:
+            logging.warning(f"Failed to get message {request_id}: {exception}")
+            failed.append(request_id)
+
+    pending = ids
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        failed = []
+        for start in range(0, len(pending), BATCH_SIZE):
+            if start > 0 and batch_interval:
+                time.sleep(batch_interval)
+            batch = service.new_batch_http_request(callback=collect)
+            for message_id in pending[start:start + BATCH_SIZE]:
+                batch.add(service.users().messages().get(
+                    userId='me', id=message_id, format='metadata',
+                    metadataHeaders=METADATA_HEADERS, fields=METADATA_FIELDS),
+                    request_id=message_id)
+            batch.execute()
+        if not failed:
+            break
+        pending = failed
+    return [messages[message_id] for message_id in ids if message_id in messages], failed
+
+
+def get_message_metadata(service, ids: List[str]) -> List[Dict]:
+    """Fetch the metadata of messages, leaving out messages that fail."""
+    return fetch_message_metadata(service, ids)[0]
+
+
+def summarize(message: Dict) -> Dict:
+    """Return the fields of a metadata response that the tools use."""
+    return {
+        "id": message["id"],
+        "thread_id": message.get("threadId"),
+        "internal_date": int(message.get("internalDate", 0)),
+        "sender": header(message, "From", "Unknown"),
+        "subject": header(message, "Subject", "No Subject"),
+        "snippet": message.get("snippet", ""),
+        "label_ids": message.get("labelIds", []),
+    }
+
+
+def format_messages(summaries: List[Dict]) -> str:
+    return "".join(
+        f"From: {summary['sender']}\n"
+        f"Subject: {summary['subject']}\n"
+        f"Snippet: {summary['snippet']}\n\n"
+        for summary in summaries)
@@ -1,61 +1,93 @@
 import base64
+import datetime
 import json
+import logging
 import re
-from datetime import datetime, timedelta
 from email.message import EmailMessage
 from typing import Dict, List
 from googleapiclient.errors import HttpError
-from googleapiclient.discovery import build
 from langchain.pydantic_v1 import BaseModel, Field
 from tzlocal import get_localzone
 from difflib import SequenceMatcher
 
+from ecco6.tool import calendar_range, calendar_store, gmail, mailbox_index
+from ecco6.tool.google_services import get_service
+
 #================== CALENDAR ==================================
 
 class GetEventsByDateInput(BaseModel):
     date: str = Field(description="The date in YYYY-MM-DD format.")
 
+def get_day_events(date: str, google_credentials) -> List[Dict]:
+    time_min, time_max = calendar_store.day_bounds(date)
+    try:
+        # A store that is not fresh is synced in the background meanwhile.
+        store = calendar_store.calendar_sync.get(google_credentials, wait=False)
+        if store is not None and store.covers(time_min, time_max):
+            return store.day(date)
+    except Exception:
+        logging.exception("Failed to read the calendar store, asking Google Calendar instead.")
+    service = get_service("calendar", "v3", google_credentials)
+    events_result = service.events().list(
+        calendarId='primary', timeMin=time_min.isoformat(), timeMax=time_max.isoformat(),
+        singleEvents=True, orderBy='startTime', fields=f"items({calendar_store.EVENT_FIELDS})").execute()
+    return events_result.get('items', [])
+
 def get_events_by_date(date: str, google_credentials) -> str:
-    split_date = date.split('-')
-
-    event_date = datetime(
-        int(split_date[0]),  # YYYY
-        int(split_date[1]),  # MM
-        int(split_date[2]),  # DD
-        00,  # HH
-        00,  # MM
-        00,  # SS
-        0,
-        tzinfo=get_localzone()
-    ).isoformat()
-
-    end_time = datetime(
-        int(split_date[0]),
-        int(split_date[1]),
-        int(split_date[2]),
-        23,
-        59,
-        59,
-        999999,
-        tzinfo=get_localzone()
-    ).isoformat()
-
-    service = build("calendar", "v3", credentials=google_credentials)
-    events_result = service.events().list(calendarId='primary', timeMin=event_date,timeMax=end_time).execute()
-    all_events = events_result.get('items', [])
+    events = get_day_events(date, google_credentials)
     return '\n'.join(
-        [json.dumps({key: event[key] for key in ["summary", "start", "end"]})
-         for event in all_events]
+        [json.dumps({key: event[key] for key in ["summary", "start", "end"] if key in event})
+         for event in events]
     )
 
 
+class GetEventsInRangeInput(BaseModel):
+    start_date: str = Field(description="The first date in YYYY-MM-DD format.")
+    end_date: str = Field(description="The last date in YYYY-MM-DD format, included in the range.")
+
+def get_events_in_range(start_date: str, end_date: str, google_credentials) -> str:
+    service = get_service("calendar", "v3", google_credentials)
+    time_min, _ = calendar_store.day_bounds(start_date)
+    _, time_max = calendar_store.day_bounds(end_date)
+    calendars = calendar_range.list_calendars(service)
+    events = calendar_range.list_events(service, calendars, time_min, time_max)
+    if not events:
+        return f"There are no events from {start_date} to {end_date}."
+    return calendar_range.format_events(events)
+
+
+class GetNextEventInput(BaseModel):
+    pass
+
+def get_next_event(google_credentials) -> str:
+    event = None
+    try:
+        store = calendar_store.calendar_sync.get(google_credentials, wait=False)
+        if store is not None:
+            event = store.next_event()
+    except Exception:
+        logging.exception("Failed to read the calendar store, asking Google Calendar instead.")
+    # Google Calendar is asked until the store is synced, and for events
+    # after its window.
+    if event is None:
+        service = get_service("calendar", "v3", google_credentials)
+        events_result = service.events().list(
+            calendarId='primary', timeMin=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            singleEvents=True, orderBy='startTime', maxResults=1,
+            fields=f"items({calendar_store.EVENT_FIELDS})").execute()
+        event = next(iter(events_result.get('items', [])), None)
+    if event is None:
+        return "There are no upcoming events in the calendar."
+    return json.dumps({key: event[key] for key in ["summary", "start", "end"] if key in event})
+
+
 class AddEventInput(BaseModel):
     title: str = Field(description="The title of the event.")
     start_time: str = Field(description="The start datetime of the event, in the format of YYYY-MM-DDTHH:MM:SS.")
     end_time: str = Field(description="The end datetime of the event, in the format of YYYY-MM-DDTHH:MM:SS.")
 
 def add_event(title: str, start_time: str, end_time: str, google_credentials) -> str:
-    service = build("calendar", "v3", credentials=google_credentials)
+    service = get_service("calendar", "v3", google_credentials)
 
     timezone = str(get_localzone())
 
@@ -71,7 +103,11 @@ def add_event(title: str, start_time: str, end_time: str, google_credentials) ->
         },
     }
 
-    event = service.events().insert(calendarId='primary', body=event).execute()
+    event = service.events().insert(
+        calendarId='primary', body=event, fields=calendar_store.EVENT_FIELDS).execute()
+    store = calendar_store.calendar_sync.peek(google_credentials)
+    if store is not None:
+        store.put(event)
 
 
 class RemoveEventInput(BaseModel):
@@ -80,42 +116,10 @@ class RemoveEventInput(BaseModel):
 
 
 def get_eventID(date: str, google_credentials, event_title: str) -> str:
-    split_date = date.split('-')
-
-    event_date = datetime(
-        int(split_date[0]),  
-        int(split_date[1]), 
-        int(split_date[2]),
-        00,  
-        00,
-        00,
-        0,
-        tzinfo=get_localzone()
-    ).isoformat()
-
-    end_time = datetime(
-        int(split_date[0]),
-        int(split_date[1]),
-        int(split_date[2]),
-        23,
-        59,
-        59,
-        999999,
-        tzinfo=get_localzone()
-    ).isoformat()
-
-    service = build("calendar", "v3", credentials=google_credentials)
-    events_result = service.events().list(calendarId='primary', timeMin=event_date, timeMax=end_time).execute()
-    all_events = events_result.get('items', [])
-    
-    event_ids = []
-
-    for event in all_events:
-        if 'summary' in event and event['summary'].lower() == event_title.lower():
-            event_ids.append(event['id'])
-
-    if event_ids:
-        return event_ids[0]
+    events = [event for event in get_day_events(date, google_credentials)
+              if event.get('summary', '').lower() == event_title.lower()]
+    if events:
+        return events[0]['id']
     else:
         return None
 
@@ -125,8 +129,11 @@ def remove_event(event_title: str, date: str, google_credentials) -> str:
     
     if event_id:
         try:
-            service = build("calendar", "v3", credentials=google_credentials)
+            service = get_service("calendar", "v3", google_credentials)
             service.events().delete(calendarId='primary', eventId=event_id).execute()
+            store = calendar_store.calendar_sync.peek(google_credentials)
+            if store is not None:
+                store.remove(event_id)
             return f"Event '{event_title}' deleted successfully"
         except Exception as e:
             return f"An error occurred while deleting event '{event_title}': {str(e)}"
@@ -140,29 +147,47 @@ class GetUnreadMessagesInput(BaseModel):
 
 #======================= GMAIL =======================
 
-def get_unread_messages(google_credentials) -> str:
-    creds = google_credentials
-    service = build('gmail', 'v1', credentials=creds)
+# The most unread messages that are listed, so the latency does not grow
+# with the inbox.
+MAX_UNREAD_MESSAGES = 20
 
-    query = 'in:inbox is:unread -category:(promotions OR social)'
-    unread_msgs = service.users().messages().list(userId='me', q=query).execute()
-
-    messages = unread_msgs.get('messages', [])
-    if not messages:
+def get_unread_messages(google_credentials, max_results: int = MAX_UNREAD_MESSAGES) -> str:
+    summaries = None
+    try:
+        # The index is built in the background on the first question.
+        index = mailbox_index.mailbox_sync.index(google_credentials, wait=False)
+        if index is not None and index.complete:
+            summaries = index.unread(max_results)
+            more = index.unread_count() > len(summaries)
+    except Exception:
+        logging.exception("Failed to read the mailbox index, asking Gmail instead.")
+    # Until the index has all unread messages, Gmail lists them.
+    if summaries is None:
+        service = get_service("gmail", "v1", google_credentials)
+        ids, more = gmail.list_message_ids(service, gmail.UNREAD_QUERY, max_results)
+        summaries = [gmail.summarize(m) for m in gmail.get_message_metadata(service, ids)]
+    if not summaries:
         return "You have no unread messages in your primary inbox."
 
-    unread_info = ""
-    for msg in messages:
-        msg_info = service.users().messages().get(userId='me', id=msg['id']).execute()
-        headers = msg_info['payload']['headers']
-        sender = next((header['value'] for header in headers if header['name'] == 'From'), 'Unknown')
-        subject = next((header['value'] for header in headers if header['name'] == 'Subject'), 'No Subject')
-        snippet = msg_info['snippet']
-        unread_info += f"From: {sender}\nSubject: {subject}\nSnippet: {snippet}\n\n"
-
+    unread_info = gmail.format_messages(summaries)
+    if more:
+        unread_info += f"These are the {len(summaries)} newest unread messages, there are more."
     return unread_info
 
 
+class CountUnreadMessagesInput(BaseModel):
+    pass
+
+
+def count_unread_messages(google_credentials) -> str:
+    # One request that Gmail answers from its label counters, exact for any
+    # number of unread messages.
+    count = gmail.count_unread(get_service("gmail", "v1", google_credentials))
+    if count == 0:
+        return "You have no unread messages in your inbox."
+    return f"You have {count} unread message{'s' if count != 1 else ''} in your inbox."
+
+
 class SendEmailInput(BaseModel):
     recipient: str = Field(description="The email address of the recipient.")
     subject: str = Field(description="The subject of the email.")
@@ -189,7 +214,7 @@ def send_email(recipient: str, subject: str, body: str, google_credentials) -> s
     email_msg.set_content(body)
 
     try:
-        service = build('gmail', 'v1', credentials=google_credentials)
+        service = get_service("gmail", "v1", google_credentials)
         message = {'raw': base64.urlsafe_b64encode(email_msg.as_bytes()).decode()}
         sent_message = service.users().messages().send(userId='me', body=message).execute()
 
@@ -204,7 +229,7 @@ class ListTaskListsInput(BaseModel):
 
 
 def list_task_lists(google_credentials) -> List[str]:
-    service = build("tasks", "v1", credentials=google_credentials)
+    service = get_service("tasks", "v1", google_credentials)
     task_lists = service.tasklists().list(maxResults=10).execute()
     items = task_lists.get("items", [])
     return [item["title"] for item in items]
@@ -216,7 +241,7 @@ class CreateTaskListInput(BaseModel):
 
 def create_taskList(google_credentials, name: str) -> Dict:
     try:
-        service = build("tasks", "v1", credentials=google_credentials)
+        service = get_service("tasks", "v1", google_credentials)
         
         new_task_list = service.tasklists().insert(body={"title": name}).execute()
         
@@ -233,7 +258,7 @@ class ListTasksInListInput(BaseModel):
 
 def list_tasks_in_list(task_list_name: str, google_credentials) -> List[str]:
     try:
-        service = build("tasks", "v1", credentials=google_credentials)
+        service = get_service("tasks", "v1", google_credentials)
         task_lists = service.tasklists().list(maxResults=10).execute()
         items = task_lists.get("items", [])
         
@@ -266,7 +291,7 @@ class AddTaskInput(BaseModel):
 
 def add_task(task_name: str, task_list_name: str, google_credentials) -> str:
     try:
-        service = build("tasks", "v1", credentials=google_credentials)
+        service = get_service("tasks", "v1", google_credentials)
         
         task_lists = service.tasklists().list(maxResults=10).execute()
         items = task_lists.get("items", [])
@@ -294,7 +319,7 @@ class RemoveTaskListInput(BaseModel):
     task_list_name: str = Field(description="The name of the task list to remove the task.")
 
 def remove_task_list(task_list_name: str, google_credentials) -> str:
-    service = build("tasks", "v1", credentials=google_credentials)
+    service = get_service("tasks", "v1", google_credentials)
 
     task_lists = service.tasklists().list(maxResults=10).execute()
     items = task_lists.get("items", [])
@@ -316,7 +341,7 @@ class RemoveTaskInput(BaseModel):
 
 
 def remove_task(task_list_name: str, task_name: str, google_credentials) -> str:
-    service = build("tasks", "v1", credentials=google_credentials)
+    service = get_service("tasks", "v1", google_credentials)
 
     task_lists = service.tasklists().list(maxResults=10).execute()
     items = task_lists.get("items", [])
@@ -346,7 +371,7 @@ class CreateDocumnetInput(BaseModel):
 
 def create_document(google_credentials, name: str) -> Dict:
     try:
-        service = build("docs", "v1", credentials=google_credentials)
+        service = get_service("docs", "v1", google_credentials)
         
         new_doc = service.documents().create(body={"title": name}).execute()
         
@@ -363,7 +388,7 @@ class InsertTextInput(BaseModel):
 def get_document_id(google_credentials, document_name: str) -> str:
     SCOPES = ['https://www.googleapis.com/auth/drive']
 
-    service = build('drive', 'v3', credentials=google_credentials)
+    service = get_service("drive", "v3", google_credentials)
 
     results = service.files().list(q=f"name='{document_name}' and mimeType='application/vnd.google-apps.document'",
                                     fields="files(id)").execute()
@@ -390,7 +415,7 @@ def insert_text(google_credentials, text: str, document_name: str) -> Dict:
                 }
             ]
 
-            service = build("docs", "v1", credentials=google_credentials)
+            service = get_service("docs", "v1", google_credentials)
             result = service.documents().batchUpdate(documentId=document_id, body={'requests': requests}).execute()
             return result
         else:
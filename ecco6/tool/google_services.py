@@ -0,0 +1,118 @@
+import hashlib
+import threading
+from typing import Hashable, Optional
+
+import google_auth_httplib2
+import httplib2
+from googleapiclient.discovery import build
+
+from ecco6 import cache
+
+# Services are kept for an hour; credentials are refreshed by the service.
+SERVICE_TTL = 60 * 60
+MAX_SERVICES = 128
+
+
+class ThreadLocalHttp:
+    """An authorized HTTP transport with one httplib2.Http per thread.
+
+    httplib2 connections are not thread-safe, so a service that is shared
+    between threads must not share its transport. The discovery document is
+    parsed once per service, and every thread sends its requests through its
+    own connection.
+    """
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self._local = threading.local()
+
+    def _http(self) -> google_auth_httplib2.AuthorizedHttp:
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = google_auth_httplib2.AuthorizedHttp(
+                self.credentials, http=httplib2.Http())
+        return http
+
+    def request(self, *args, **kwargs):
+        return self._http().request(*args, **kwargs)
+
+    @property
+    def redirect_codes(self):
+        return self._http().redirect_codes
+
+    def close(self):
+        http = getattr(self._local, "http", None)
+        if http is not None:
+            http.close()
+
+
+def credentials_key(credentials) -> Optional[Hashable]:
+    """Return a key that identifies the user and client of the credentials.
+
+    The key is derived from the refresh token, or from the access token of
+    credentials that cannot be refreshed. Returns None if there is neither.
+    """
+    token = getattr(credentials, "refresh_token", None) or getattr(credentials, "token", None)
+    if not token:
+        return None
+    digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    return (getattr(credentials, "client_id", None), digest)
+
+
+def _memoize_resources(resource):
+    """Make the collection methods of a resource return one shared resource.
+
+    Every call of e.g. service.events() builds a new resource with all its
+    methods and their docstrings, which takes tens of milliseconds for the
+    larger APIs.
+    """
+    for name in list(resource._dynamic_attrs):
+        method = getattr(resource, name)
+        if getattr(method, "__is_resource__", False):
+            resource._set_dynamic_attr(name, _memoized(method))
+    return resource
+
+
+def _memoized(create_resource):
+    child = None
+    def get_resource():
+        nonlocal child
+        if child is None:
+            child = _memoize_resources(create_resource())
+        return child
+    return get_resource
+
+
+def _build(api: str, version: str, credentials):
+    return _memoize_resources(build(
+        api, version, http=ThreadLocalHttp(credentials), static_discovery=True))
+
+
+_services = cache.TTLCache(maxsize=MAX_SERVICES, ttl=SERVICE_TTL)
+_build_lock = threading.Lock()
+
+
+def get_service(api: str, version: str, credentials):
+    """Return the cached service client of an API for the credentials.
+
+    The client is built from the discovery document bundled with
+    google-api-python-client, so nothing is fetched at runtime, and its
+    collections, e.g. service.events(), are built once.
+
+    Args:
+      api: The API, e.g. "calendar".
+      version: The version of the API, e.g. "v3".
+      credentials: The Google credentials of the user.
+    """
+    user_key = credentials_key(credentials)
+    if user_key is None:
+        return _build(api, version, credentials)
+    key = (user_key, api, version)
+    service = _services.get(key)
+    if service is None:
+        with _build_lock:
+            service = _services.get(key)
+            if service is None:
+                service = _build(api, version, credentials)
+                _services.set(key, service)
+    return service
@@ -0,0 +1,435 @@
+"""Offline journey planning over a local GTFS feed.
+
+The feed is loaded once into compact arrays: trips with the same stop
+sequence are grouped into patterns whose arrival and departure times are
+stored column-major, so the earliest trip leaving a stop is a binary
+search. Journeys are found with RAPTOR (Delling et al., "Round-Based
+Public Transit Routing"), which computes earliest arrivals round by round,
+one round per vehicle taken.
+"""
+import bisect
+import csv
+import datetime
+import logging
+import os
+import threading
+from array import array
+from dataclasses import dataclass
+from typing import (Callable, Dict, Iterable, List, Optional, Sequence, Set,
+                    Tuple)
+
+from ecco6.tool.trigram_index import TrigramIndex
+
+INFINITY = 2 ** 31 - 1
+
+
+@dataclass
+class Leg:
+    line: Optional[str]  # None for a walk between two stops.
+    origin: str
+    destination: str
+    departure: int  # Seconds after midnight of the service day.
+    arrival: int
+
+
+@dataclass
+class _Pattern:
+    route_id: str
+    stops: array  # Stop indices along the pattern.
+    trip_ids: List[str]
+    arrivals: array  # Column-major: arrivals[position * n_trips + trip].
+    departures: array
+
+    @property
+    def n_trips(self) -> int:
+        return len(self.trip_ids)
+
+
+def parse_time(value: str) -> int:
+    """Parse a GTFS HH:MM:SS time, which may exceed 24:00:00, into seconds."""
+    hours, minutes, seconds = value.strip().split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def format_time(seconds: int) -> str:
+    """Format seconds after midnight as HH:MM."""
+    return f"{seconds // 3600 % 24:02d}:{seconds // 60 % 60:02d}"
+
+
+def _read_csv(directory: str, name: str) -> Iterable[Dict[str, str]]:
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def active_service_ids(directory: str, date: datetime.date) -> Optional[Set[str]]:
+    """Return the service ids running on a date.
+
+    Args:
+      directory: The GTFS feed directory.
+      date: The service date.
+    Returns:
+      The active service ids, or None if the feed has no calendar files.
+    """
+    calendar = _read_csv(directory, "calendar.txt")
+    calendar_dates = _read_csv(directory, "calendar_dates.txt")
+    if not calendar and not calendar_dates:
+        return None
+
+    day = date.strftime("%Y%m%d")
+    weekday = date.strftime("%A").lower()
+    services = {
+        row['service_id'] for row in calendar
+        if row['start_date'] <= day <= row['end_date'] and row[weekday] == "1"}
+    for row in calendar_dates:
+        if row['date'] == day:
+            if row['exception_type'] == "1":
+                services.add(row['service_id'])
+            else:
+                services.discard(row['service_id'])
+    return services
+
+
+class Timetable:
+    """A GTFS timetable indexed for RAPTOR queries."""
+
+    def __init__(self, stops: Sequence[Dict[str, str]], trips: Sequence[Dict[str, str]],
+                 stop_times: Iterable[Dict[str, str]], routes: Sequence[Dict[str, str]] = (),
+                 transfers: Sequence[Dict[str, str]] = (), transfer_time: int = 180):
+        """Index GTFS rows.
+
+        Args:
+          stops: The rows of stops.txt.
+          trips: The rows of trips.txt.
+          stop_times: The rows of stop_times.txt.
+          routes: The rows of routes.txt, used for line names.
+          transfers: The rows of transfers.txt, used for walks between stops.
+          transfer_time: The walking time in seconds between stops of the same
+            station that have no entry in transfers.txt.
+        """
+        self.stop_ids = [row['stop_id'] for row in stops]
+        self.stop_names = [row['stop_name'].strip() for row in stops]
+        self._stop_index = {stop_id: i for i, stop_id in enumerate(self.stop_ids)}
+
+        # Stops grouped by station, so that a query by name covers every
+        # platform of the station.
+        self.stations: Dict[str, List[int]] = {}
+        for i, row in enumerate(stops):
+            parent = row.get('parent_station') or row['stop_id']
+            parent_index = self._stop_index.get(parent, i)
+            name = self.stop_names[parent_index].lower()
+            self.stations.setdefault(name, []).append(i)
+        self._name_index = TrigramIndex(list(self.stations))
+
+        route_names = {
+            row['route_id']: row.get('route_short_name') or row.get('route_long_name') or row['route_id']
+            for row in routes}
+        self.trip_route = {row['trip_id']: row['route_id'] for row in trips}
+        self.route_names = route_names
+
+        self._build_patterns(stop_times)
+        self._build_footpaths(transfers, transfer_time)
+
+    @classmethod
+    def load(cls, directory: str, service_date: Optional[datetime.date] = None,
+             **kwargs) -> "Timetable":
+        """Load a timetable from a GTFS feed directory.
+
+        Args:
+          directory: The directory with the GTFS text files.
+          service_date: If given, only trips running on this date are loaded.
+          kwargs: Passed on to the constructor.
+        Returns:
+          The timetable.
+        """
+        trips = _read_csv(directory, "trips.txt")
+        if service_date is not None:
+            services = active_service_ids(directory, service_date)
+            if services is not None:
+                trips = [row for row in trips if row['service_id'] in services]
+        with open(os.path.join(directory, "stop_times.txt"), encoding="utf-8-sig", newline="") as f:
+            return cls(
+                _read_csv(directory, "stops.txt"), trips, csv.DictReader(f),
+                routes=_read_csv(directory, "routes.txt"),
+                transfers=_read_csv(directory, "transfers.txt"), **kwargs)
+
+    def _build_patterns(self, stop_times: Iterable[Dict[str, str]]) -> None:
+        trip_stops: Dict[str, List[Tuple[int, int, int, int]]] = {}
+        for row in stop_times:
+            trip_id = row['trip_id']
+            if trip_id not in self.trip_route:
+                continue
+            stop = self._stop_index.get(row['stop_id'])
+            if stop is None:
+                continue
+            arrival = row['arrival_time'] or row['departure_time']
+            departure = row['departure_time'] or row['arrival_time']
+            if not arrival:
+                continue
+            trip_stops.setdefault(trip_id, []).append((
+                int(row['stop_sequence']), stop, parse_time(arrival), parse_time(departure)))
+
+        # Group trips by route and stop sequence, then split the groups so
+        # that no trip overtakes another one, which binary search relies on.
+        groups: Dict[Tuple[str, Tuple[int, ...]], List[Tuple[str, list]]] = {}
+        for trip_id, rows in trip_stops.items():
+            if len(rows) < 2:
+                continue
+            rows.sort()
+            key = (self.trip_route[trip_id], tuple(stop for _, stop, _, _ in rows))
+            groups.setdefault(key, []).append((trip_id, rows))
+
+        self.patterns: List[_Pattern] = []
+        for (route_id, stops), trips in groups.items():
+            trips.sort(key=lambda trip: trip[1][0][3])
+            lanes: List[List[Tuple[str, list]]] = []
+            for trip in trips:
+                for lane in lanes:
+                    last = lane[-1][1]
+                    if all(a[2] <= b[2] and a[3] <= b[3] for a, b in zip(last, trip[1])):
+                        lane.append(trip)
+                        break
+                else:
+                    lanes.append([trip])
+            for lane in lanes:
+                self.patterns.append(_Pattern(
+                    route_id=route_id,
+                    stops=array("i", stops),
+                    trip_ids=[trip_id for trip_id, _ in lane],
+                    arrivals=array("i", (rows[i][2] for i in range(len(stops)) for _, rows in lane)),
+                    departures=array("i", (rows[i][3] for i in range(len(stops)) for _, rows in lane)),
+                ))
+
+        self._stop_patterns: List[List[Tuple[int, int]]] = [[] for _ in self.stop_ids]
+        for p, pattern in enumerate(self.patterns):
+            for position, stop in enumerate(pattern.stops):
+                self._stop_patterns[stop].append((p, position))
+
+    def _build_footpaths(self, transfers, transfer_time) -> None:
+        self._footpaths: List[Dict[int, int]] = [{} for _ in self.stop_ids]
+        for stops in self.stations.values():
+            for a in stops:
+                for b in stops:
+                    if a != b:
+                        self._footpaths[a][b] = transfer_time
+        for row in transfers:
+            a = self._stop_index.get(row['from_stop_id'])
+            b = self._stop_index.get(row['to_stop_id'])
+            if a is None or b is None or a == b or row.get('transfer_type') == "3":
+                continue
+            self._footpaths[a][b] = int(row.get('min_transfer_time') or transfer_time)
+
+    def find_station(self, name: str, cutoff: float = 0.6) -> List[int]:
+        """Return the stops of the station best matching a name."""
+        stops = self.stations.get(name.strip().lower())
+        if stops is not None:
+            return stops
+        matches = self._name_index.search(name, k=1, cutoff=cutoff)
+        if not matches:
+            return []
+        return self.stations[matches[0][0]]
+
+    def earliest_arrival(self, sources: Sequence[int], targets: Sequence[int],
+                         departure_time: int, max_rounds: int = 5) -> List[Leg]:
+        """Find the journey arriving earliest at any of the target stops.
+
+        Args:
+          sources: The stops the journey may start from.
+          targets: The stops the journey may end at.
+          departure_time: The earliest departure in seconds after midnight.
+          max_rounds: The maximum number of vehicles taken.
+        Returns:
+          The legs of the journey, or an empty list if there is none.
+        """
+        targets = set(targets)
+        best = [INFINITY] * len(self.stop_ids)
+        previous_round = [INFINITY] * len(self.stop_ids)
+        parents: List[Dict[int, tuple]] = []
+        best_target = INFINITY
+        marked = set()
+        for stop in sources:
+            best[stop] = previous_round[stop] = departure_time
+            marked.add(stop)
+        if targets & marked:
+            return []
+
+        for _ in range(max_rounds):
+            queue: Dict[int, int] = {}
+            for stop in marked:
+                for p, position in self._stop_patterns[stop]:
+                    if position < queue.get(p, INFINITY):
+                        queue[p] = position
+
+            current_round = list(previous_round)
+            parent: Dict[int, tuple] = {}
+            marked = set()
+            for p, start in queue.items():
+                pattern = self.patterns[p]
+                n_trips = pattern.n_trips
+                trip = None
+                boarded_at = None
+                for position in range(start, len(pattern.stops)):
+                    stop = pattern.stops[position]
+                    offset = position * n_trips
+                    if trip is not None:
+                        arrival = pattern.arrivals[offset + trip]
+                        if arrival < best[stop] and arrival < best_target:
+                            best[stop] = current_round[stop] = arrival
+                            parent[stop] = (p, trip, boarded_at, position)
+                            marked.add(stop)
+                            if stop in targets:
+                                best_target = arrival
+                    ready = previous_round[stop]
+                    if ready == INFINITY:
+                        continue
+                    if trip is None or ready <= pattern.departures[offset + trip]:
+                        earliest = bisect.bisect_left(
+                            pattern.departures, ready, offset, offset + n_trips) - offset
+                        if earliest < n_trips and (trip is None or earliest < trip):
+                            trip = earliest
+                            boarded_at = position
+
+            for stop in list(marked):
+                for other, duration in self._footpaths[stop].items():
+                    arrival = current_round[stop] + duration
+                    if arrival < best[other] and arrival < best_target:
+                        best[other] = current_round[other] = arrival
+                        parent[other] = ("walk", stop, current_round[stop])
+                        marked.add(other)
+                        if other in targets:
+                            best_target = arrival
+
+            parents.append(parent)
+            previous_round = current_round
+            if not marked:
+                break
+
+        if best_target == INFINITY:
+            return []
+        target = min(targets, key=lambda stop: best[stop])
+        return self._journey(parents, target)
+
+    def _journey(self, parents: List[Dict[int, tuple]], stop: int) -> List[Leg]:
+        legs = []
+        round_index = len(parents) - 1
+        while True:
+            # A label carries over to later rounds, so the parent of a stop
+            # is in the latest round that improved it.
+            while round_index >= 0 and stop not in parents[round_index]:
+                round_index -= 1
+            if round_index < 0:
+                break
+            entry = parents[round_index][stop]
+            if entry[0] == "walk":
+                _, origin, departure = entry
+                legs.append(Leg(None, self.stop_names[origin], self.stop_names[stop],
+                                departure, departure + self._footpaths[origin][stop]))
+                stop = origin
+                continue
+            p, trip, boarded_at, alighted_at = entry
+            pattern = self.patterns[p]
+            origin = pattern.stops[boarded_at]
+            legs.append(Leg(
+                self.route_names.get(pattern.route_id, pattern.route_id),
+                self.stop_names[origin], self.stop_names[stop],
+                pattern.departures[boarded_at * pattern.n_trips + trip],
+                pattern.arrivals[alighted_at * pattern.n_trips + trip]))
+            stop = origin
+            round_index -= 1
+        legs.reverse()
+        return legs
+
+    def plan(self, origin: str, destination: str, departure_time: int,
+             max_rounds: int = 5) -> List[Leg]:
+        """Plan a journey between two stations given by name.
+
+        Args:
+          origin: The name of the origin station.
+          destination: The name of the destination station.
+          departure_time: The earliest departure in seconds after midnight.
+          max_rounds: The maximum number of vehicles taken.
+        Returns:
+          The legs of the journey, or an empty list if there is none.
+        """
+        sources = self.find_station(origin)
+        targets = self.find_station(destination)
+        if not sources or not targets:
+            return []
+        return self.earliest_arrival(sources, targets, departure_time, max_rounds)
+
+
+class DailyTimetable:
+    """The timetable of the current service day, loaded in the background.
+
+    Loading a large feed takes seconds, so it never happens in a request:
+    the first load starts when the loader is created, and when the day
+    changes, the timetable of the previous day is served until the one of
+    the new day has been loaded.
+    """
+
+    def __init__(self, directory: str, load: Callable[..., Timetable] = Timetable.load,
+                 today: Callable[[], datetime.date] = datetime.date.today):
+        """Create the loader and start loading the timetable of today.
+
+        Args:
+          directory: The directory of the feed.
+          load: Loads the timetable of a service day, like Timetable.load.
+          today: Returns the current service day.
+        """
+        self.directory = directory
+        self._load = load
+        self._today = today
+        self._timetable = None
+        self._date = None
+        self._loading = None
+        self._lock = threading.Lock()
+        self.get()
+
+    def get(self) -> Optional[Timetable]:
+        """Return the newest loaded timetable, or None before the first load.
+
+        Starts loading the timetable of today if it is not loaded yet.
+        """
+        today = self._today()
+        with self._lock:
+            if self._date != today and self._loading is None:
+                self._loading = threading.Thread(
+                    target=self._load_day, args=(today,), name="gtfs-load", daemon=True)
+                self._loading.start()
+            return self._timetable
+
+    def wait(self, timeout: Optional[float] = None):
+        """Wait until the timetable that is being loaded, if any, is loaded."""
+        with self._lock:
+            loading = self._loading
+        if loading is not None:
+            loading.join(timeout)
+
+    def _load_day(self, day: datetime.date):
+        timetable = None
+        try:
+            timetable = self._load(self.directory, service_date=day)
+        except Exception:
+            logging.exception(f"Failed to load the GTFS feed in {self.directory}.")
+        with self._lock:
+            if timetable is not None:
+                self._timetable = timetable
+                self._date = day
+            self._loading = None
+
+
+def format_journey(legs: Sequence[Leg]) -> str:
+    """Format journey legs like the suggestions of the SL travel planner."""
+    travel_suggestions = ""
+    for leg in legs:
+        if leg.line is None:
+            travel_suggestions += f"Walk from {leg.origin} to {leg.destination}\n"
+        else:
+            travel_suggestions += f"Line: {leg.line}\n"
+            travel_suggestions += f"Departure: {leg.origin}\n"
+            travel_suggestions += f"Destination: {leg.destination}\n"
+        travel_suggestions += f"Departure Time: {format_time(leg.departure)}\n"
+        travel_suggestions += f"Arrival Time: {format_time(leg.arrival)}\n\n"
+    return travel_suggestions
@@ -0,0 +1,241 @@
+import concurrent.futures
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Union
+
+from ecco6 import http_client
+
+
+def _domain(entity_id: Union[str, List[str]]) -> str:
+    if not isinstance(entity_id, str):
+        entity_id = entity_id[0]
+    return entity_id.split(".", 1)[0]
+
+
+class HomeAssistantClient:
+    """Client of the Home Assistant REST API with a local state mirror.
+
+    Requests go through the pooled session of the shared HTTP client. The
+    state of every entity the client has touched is mirrored locally, kept
+    fresh from the states returned by service calls and by polling
+    /api/states, so state questions are answered without a request.
+    """
+
+    def __init__(self, url: str, token: str, poll_interval: float = 30,
+                 http: Optional[http_client.HttpClient] = None):
+        """Create the client.
+
+        Args:
+          url: The base URL of Home Assistant, e.g. http://homeassistant:8123.
+          token: A long-lived access token.
+          poll_interval: Seconds between two refreshes of the mirrored states.
+          http: The HTTP client, defaults to the shared one.
+        """
+        self.url = url.rstrip("/")
+        self.headers = {"Content-Type": "application/json",
+                        "Authorization": f"Bearer {token}"}
+        self.poll_interval = poll_interval
+        self._http = http or http_client.default_client
+        self._states: Dict[str, dict] = {}
+        self._tracked = set()
+        self._lock = threading.Lock()
+        self._poller = None
+        self._stop = threading.Event()
+
+    def _update(self, states: Iterable[dict]):
+        with self._lock:
+            for state in states:
+                self._states[state["entity_id"]] = state
+
+    def call_service(self, domain: str, service: str, **data) -> List[dict]:
+        """Call a Home Assistant service.
+
+        Args:
+          domain: The service domain, e.g. "light".
+          service: The service, e.g. "turn_on".
+          data: The service data, e.g. entity_id and brightness_pct.
+        Returns:
+          The states that changed because of the call.
+        Raises:
+          requests.exceptions.RequestException: If the call failed.
+        """
+        r = self._http.post(
+            f"{self.url}/api/services/{domain}/{service}",
+            headers=self.headers, json=data, timeout=3)
+        r.raise_for_status()
+        changed = r.json() if r.content else []
+        self._update(changed)
+        entity_ids = data.get("entity_id") or []
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_ids]
+        changed_ids = {state["entity_id"] for state in changed}
+        for entity_id in entity_ids:
+            self._tracked.add(entity_id)
+            if entity_id not in changed_ids:
+                self.refresh(entity_id)
+        return changed
+
+    def turn_on(self, entity_id: Union[str, List[str]], **data) -> List[dict]:
+        """Turn on an entity, with optional data such as brightness_pct."""
+        return self.call_service(_domain(entity_id), "turn_on", entity_id=entity_id, **data)
+
+    def turn_off(self, entity_id: Union[str, List[str]]) -> List[dict]:
+        return self.call_service(_domain(entity_id), "turn_off", entity_id=entity_id)
+
+    def set_brightness(self, entity_id: str, brightness_pct: int) -> List[dict]:
+        return self.turn_on(entity_id, brightness_pct=brightness_pct)
+
+    def activate_scene(self, scene_id: str) -> List[dict]:
+        if not scene_id.startswith("scene."):
+            scene_id = f"scene.{scene_id}"
+        return self.call_service("scene", "turn_on", entity_id=scene_id)
+
+    def refresh(self, entity_id: Optional[str] = None):
+        """Fetch the state of one entity, or of all entities, into the mirror."""
+        if entity_id is None:
+            r = self._http.get(f"{self.url}/api/states", headers=self.headers, timeout=3)
+            r.raise_for_status()
+            self._update(r.json())
+        else:
+            r = self._http.get(f"{self.url}/api/states/{entity_id}", headers=self.headers, timeout=3)
+            r.raise_for_status()
+            self._update([r.json()])
+
+    def state(self, entity_id: str) -> Optional[dict]:
+        """Return the mirrored state of an entity.
+
+        The state is only fetched if the entity has not been seen before.
+        """
+        self._tracked.add(entity_id)
+        with self._lock:
+            state = self._states.get(entity_id)
+        if state is None:
+            self.refresh(entity_id)
+            with self._lock:
+                state = self._states.get(entity_id)
+        return state
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval):
+            for entity_id in list(self._tracked):
+                try:
+                    self.refresh(entity_id)
+                except Exception:
+                    logging.exception(f"Failed to refresh the state of {entity_id}.")
+
+    def start_polling(self):
+        """Start refreshing the tracked entities in a daemon thread."""
+        with self._lock:
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll, name="home-assistant-poller", daemon=True)
+                self._poller.start()
+
+    def stop_polling(self):
+        self._stop.set()
+
+
+class CommandQueue:
+    """Merges the commands issued within one agent turn into few service calls.
+
+    Commands are held until no new command has arrived for `delay` seconds,
+    or until flush() is called at the end of the turn. The pending commands
+    of an entity are merged: the latest service wins, and the data of
+    consecutive calls of the same service is combined, so "turn on" followed
+    by "set brightness" becomes one turn_on call with brightness_pct.
+    Entities that end up with the same service and data share one call.
+    """
+
+    def __init__(self, client: HomeAssistantClient, delay: float = 0.5):
+        self.client = client
+        self.delay = delay
+        self._pending: Dict[str, list] = {}
+        self._submitted: List[concurrent.futures.Future] = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def submit(self, entity_id: str, service: str, **data) -> concurrent.futures.Future:
+        """Queue a service call of an entity.
+
+        Args:
+          entity_id: The entity, e.g. "light.bulb".
+          service: The service of the entity domain, e.g. "turn_on".
+          data: The service data, e.g. brightness_pct.
+        Returns:
+          A future of the states changed by the call the command ends up in.
+        """
+        future = concurrent.futures.Future()
+        with self._lock:
+            pending = self._pending.get(entity_id)
+            if pending is not None and pending[0] == service:
+                pending[1].update(data)
+                pending[2].append(future)
+            else:
+                futures = pending[2] if pending is not None else []
+                futures.append(future)
+                self._pending[entity_id] = [service, dict(data), futures]
+            self._submitted.append(future)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+        return future
+
+    def flush(self):
+        """Dispatch the pending commands now."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        calls = {}
+        for entity_id, (service, data, futures) in pending.items():
+            key = (_domain(entity_id), service, tuple(sorted(data.items())))
+            entity_ids, call_futures = calls.setdefault(key, ([], []))
+            entity_ids.append(entity_id)
+            call_futures.extend(futures)
+
+        for (domain, service, data), (entity_ids, futures) in calls.items():
+            entity_id = entity_ids[0] if len(entity_ids) == 1 else entity_ids
+            try:
+                changed = self.client.call_service(domain, service, entity_id=entity_id, **dict(data))
+            except Exception as e:
+                logging.exception(f"Failed to call {domain}.{service} for {entity_id}.")
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future in futures:
+                    future.set_result(changed)
+
+    def join(self, timeout: Optional[float] = None) -> List[Exception]:
+        """Flush the queue and wait for every command submitted so far.
+
+        Returns:
+          The errors of the failed commands, without duplicates.
+        """
+        self.flush()
+        with self._lock:
+            submitted, self._submitted = self._submitted, []
+        errors = []
+        for future in submitted:
+            try:
+                future.result(timeout)
+            except Exception as e:
+                if e not in errors:
+                    errors.append(e)
+        return errors
+
+
+_clients: Dict[tuple, HomeAssistantClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url: str, token: str) -> HomeAssistantClient:
+    """Return the process-wide client of a Home Assistant instance."""
+    with _clients_lock:
+        client = _clients.get((url, token))
+        if client is None:
+            client = _clients[(url, token)] = HomeAssistantClient(url, token)
+            client.start_polling()
+        return client
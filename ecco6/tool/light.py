@@ -1,63 +1,65 @@
-import json
 import requests
 from langchain.pydantic_v1 import BaseModel, Field
 
+from ecco6.tool.home_assistant import CommandQueue
+
+BRIGHTNESS_PCT = {"low": 20, "medium": 60, "high": 100}
+
+
 class SetLightInput(BaseModel):
     pass
 
-def turn_on_light(url: str, token: str):
-    headers = {"Content-Type": "application/json",
-               "Authorization": f"Bearer {token}"}
-    try:
-        r = requests.post(url, headers=headers, timeout=3)
-        r.raise_for_status()
-    except requests.exceptions.HTTPError as e:
-        return str(e)
 
-    return "The light has been successfully turned on."
+class ActivateSceneInput(BaseModel):
+    scene: str = Field(description="The name of the Home Assistant scene, e.g. movie_night.")
 
-def turn_off_light(url: str, token: str):
-    headers = {"Content-Type": "application/json",
-               "Authorization": f"Bearer {token}"}
-    try:
-        r = requests.post(url, headers=headers, timeout=3)
-        r.raise_for_status()
-    except requests.exceptions.HTTPError as e:
-        return str(e)
-    
-def set_brightness_low(url: str, token: str):
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-    try:
-        r = requests.post(url, headers=headers, timeout=3)
-        r.raise_for_status()
-    except requests.exceptions.HTTPError as e:
-        return str(e)
 
-    return "Brightness of the light has been set as low."
+# The light commands are queued, so the commands of one agent turn are merged
+# into one service call. The queue is joined at the end of the turn, and
+# failures are added to the answer then, so the replies only say that the
+# command has been sent.
 
-def set_brightness_medium(url: str, token: str):
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}"}
-    try:
-        r = requests.post(url, headers=headers, timeout=3)
-        r.raise_for_status()
-    except requests.exceptions.HTTPError as e:
-        return str(e)
+def turn_on_light(queue: CommandQueue, entity_id: str):
+    queue.submit(entity_id, "turn_on")
+    return "Turning on the light has been requested."
+
+def turn_off_light(queue: CommandQueue, entity_id: str):
+    queue.submit(entity_id, "turn_off")
+    return "Turning off the light has been requested."
+
+def set_brightness(queue: CommandQueue, entity_id: str, level: str):
+    queue.submit(entity_id, "turn_on", brightness_pct=BRIGHTNESS_PCT[level])
+    return f"Setting the brightness of the light as {level} has been requested."
+
+def set_brightness_low(queue: CommandQueue, entity_id: str):
+    return set_brightness(queue, entity_id, "low")
+
+def set_brightness_medium(queue: CommandQueue, entity_id: str):
+    return set_brightness(queue, entity_id, "medium")
+
+def set_brightness_high(queue: CommandQueue, entity_id: str):
+    return set_brightness(queue, entity_id, "high")
 
-    return "Brightness of the light has been set as medium."
+def activate_scene(queue: CommandQueue, scene: str):
+    if not scene.startswith("scene."):
+        scene = f"scene.{scene}"
+    queue.submit(scene, "turn_on")
+    return f"Activating the scene {scene} has been requested."
 
-def set_brightness_high(url: str, token: str):
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}"}
+def get_light_state(queue: CommandQueue, entity_id: str):
+    """Answer from the mirrored state, which needs no request once known."""
+    errors = queue.join(timeout=5)
+    if errors:
+        return str(errors[0])
     try:
-        r = requests.post(url, headers=headers, timeout=3)
-        r.raise_for_status()
-    except requests.exceptions.HTTPError as e:
+        state = queue.client.state(entity_id)
+    except requests.exceptions.RequestException as e:
         return str(e)
+    if state is None:
+        return "The state of the light is unknown."
 
-    return "Brightness of the light has been set as high."
\ No newline at end of file
+    result = {"state": state["state"]}
+    brightness = state.get("attributes", {}).get("brightness")
+    if state["state"] == "on" and brightness is not None:
+        result["brightness_pct"] = round(brightness / 255 * 100)
+    return result
@@ -0,0 +1,278 @@
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+from googleapiclient.errors import HttpError
+
+from ecco6 import cache
+from ecco6.tool import gmail
+from ecco6.tool.google_services import get_service
+from ecco6.tool.synced_stores import SyncedStores
+
+REFRESH_INTERVAL = 60
+# How many of the newest inbox messages a full sync indexes.
+FULL_SYNC_LIMIT = 500
+# How many unread messages a full sync indexes, however old they are.
+UNREAD_SYNC_LIMIT = 1000
+EXCLUDED_CATEGORIES = ("CATEGORY_PROMOTIONS", "CATEGORY_SOCIAL")
+HISTORY_TYPES = ["messageAdded", "messageDeleted", "labelAdded", "labelRemoved"]
+# How many times messages that failed to be fetched, e.g. because of the
+# rate limit, are fetched again, and the seconds before the first retry.
+FETCH_RETRIES = 3
+FETCH_BACKOFF = 1
+# Seconds between two batches of a sync. A metadata get costs 5 of the 250
+# quota units per second of a user, so a batch of 50 takes one second.
+BATCH_INTERVAL = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    thread_id TEXT,
+    internal_date INTEGER,
+    sender TEXT,
+    subject TEXT,
+    snippet TEXT
+);
+CREATE TABLE IF NOT EXISTS labels (
+    message_id TEXT,
+    label_id TEXT,
+    PRIMARY KEY (message_id, label_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS labels_by_label ON labels (label_id, message_id);
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+UNREAD_WHERE = f"""
+    EXISTS (SELECT 1 FROM labels WHERE message_id = m.id AND label_id = 'INBOX')
+    AND EXISTS (SELECT 1 FROM labels WHERE message_id = m.id AND label_id = 'UNREAD')
+    AND NOT EXISTS (SELECT 1 FROM labels WHERE message_id = m.id
+                    AND label_id IN ({", ".join(f"'{c}'" for c in EXCLUDED_CATEGORIES)}))
+"""
+
+
+class MailboxIndex:
+    """A local SQLite index of the metadata and labels of a Gmail mailbox.
+
+    The first sync indexes the newest inbox messages and all unread ones,
+    up to UNREAD_SYNC_LIMIT. Later syncs only apply
+    the changes since the last history id with users.history.list, so the
+    index answers mailbox questions locally and only deltas are downloaded.
+    """
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time):
+        """Open or create the index.
+
+        Args:
+          path: The SQLite file, or ":memory:".
+          clock: The clock of the sync times.
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        # Syncs must not overlap, or changes would be applied twice.
+        self._sync_lock = threading.Lock()
+        self._clock = clock
+
+    def _state(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key: str, value):
+        self._db.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def history_id(self) -> Optional[str]:
+        with self._lock:
+            return self._state("history_id")
+
+    @property
+    def synced_at(self) -> Optional[float]:
+        with self._lock:
+            synced_at = self._state("synced_at")
+        return float(synced_at) if synced_at is not None else None
+
+    @property
+    def complete(self) -> bool:
+        """Whether all unread messages of the primary inbox are indexed."""
+        with self._lock:
+            return self._state("complete") == "1"
+
+    def _store(self, summaries: List[Dict]):
+        for summary in summaries:
+            self._db.execute(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+                (summary["id"], summary["thread_id"], summary["internal_date"],
+                 summary["sender"], summary["subject"], summary["snippet"]))
+            self._db.execute("DELETE FROM labels WHERE message_id = ?", (summary["id"],))
+            self._db.executemany(
+                "INSERT INTO labels VALUES (?, ?)",
+                [(summary["id"], label_id) for label_id in summary["label_ids"]])
+
+    def _indexed(self, ids: Set[str]) -> Set[str]:
+        indexed = set()
+        ids = list(ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            indexed.update(row[0] for row in self._db.execute(
+                f"SELECT id FROM messages WHERE id IN ({', '.join('?' * len(chunk))})", chunk))
+        return indexed
+
+    def full_sync(self, service) -> int:
+        """Replace the index with the newest and the unread inbox messages. Returns their number."""
+        # The history id is read first, so no change is missed.
+        history_id = service.users().getProfile(userId='me', fields="historyId").execute()["historyId"]
+        ids, _ = gmail.list_message_ids(service, "in:inbox", FULL_SYNC_LIMIT)
+        # Unread messages older than the newest ones are indexed too, so the
+        # unread questions are answered from all of them.
+        unread_ids, more_unread = gmail.list_message_ids(service, gmail.UNREAD_QUERY, UNREAD_SYNC_LIMIT)
+        newest = set(ids)
+        ids += [message_id for message_id in unread_ids if message_id not in newest]
+        messages, failed = self._fetch(service, ids)
+        summaries = [gmail.summarize(m) for m in messages]
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM messages")
+            self._db.execute("DELETE FROM labels")
+            self._store(summaries)
+            # Without a history id, the next sync is a full sync again, which
+            # fetches the messages that failed.
+            self._db.execute("DELETE FROM state WHERE key = 'history_id'")
+            if not failed:
+                self._set_state("history_id", history_id)
+            self._set_state("synced_at", self._clock())
+            # Later syncs index every message that becomes unread, so the
+            # index stays complete.
+            self._set_state("complete", int(not more_unread and not failed))
+        return len(summaries)
+
+    def _fetch(self, service, ids: List[str]):
+        messages, failed = gmail.fetch_message_metadata(
+            service, ids, retries=FETCH_RETRIES, backoff=FETCH_BACKOFF, batch_interval=BATCH_INTERVAL)
+        if failed:
+            logging.warning(f"Failed to index {len(failed)} messages, they are fetched on the next sync.")
+        return messages, failed
+
+    def sync(self, service) -> int:
+        """Apply the changes since the last sync. Returns the number of changed messages.
+
+        Falls back to a full sync on the first sync, and when Gmail no longer
+        has the history since the last sync.
+        """
+        with self._sync_lock:
+            return self._sync(service)
+
+    def _sync(self, service) -> int:
+        start_history_id = self.history_id
+        if start_history_id is None:
+            return self.full_sync(service)
+
+        added, deleted = set(), set()
+        label_changes = []
+        history_id = start_history_id
+        page_token = None
+        try:
+            while True:
+                response = service.users().history().list(
+                    userId='me', startHistoryId=start_history_id, historyTypes=HISTORY_TYPES,
+                    pageToken=page_token).execute()
+                for record in response.get("history", []):
+                    for change in record.get("messagesAdded", []):
+                        added.add(change["message"]["id"])
+                        deleted.discard(change["message"]["id"])
+                    for change in record.get("messagesDeleted", []):
+                        deleted.add(change["message"]["id"])
+                        added.discard(change["message"]["id"])
+                    for change in record.get("labelsAdded", []):
+                        label_changes.append((change["message"]["id"], change["labelIds"], True))
+                    for change in record.get("labelsRemoved", []):
+                        label_changes.append((change["message"]["id"], change["labelIds"], False))
+                history_id = response.get("historyId", history_id)
+                page_token = response.get("nextPageToken")
+                if page_token is None:
+                    break
+        except HttpError as e:
+            if e.resp.status == 404:
+                logging.info("The mailbox history has expired, indexing the mailbox again.")
+                return self.full_sync(service)
+            raise
+
+        # Messages that changed labels but are not indexed yet, e.g. old
+        # messages that were marked as unread, are fetched too.
+        with self._lock:
+            changed = {message_id for message_id, _, _ in label_changes} - deleted - added
+            added |= changed - self._indexed(changed)
+        messages, failed = self._fetch(service, sorted(added))
+        summaries = [gmail.summarize(m) for m in messages]
+        fetched = {summary["id"] for summary in summaries}
+
+        with self._lock, self._db:
+            for message_id, label_ids, is_added in label_changes:
+                if message_id in fetched or message_id in deleted:
+                    continue
+                if is_added:
+                    self._db.executemany(
+                        "INSERT OR IGNORE INTO labels VALUES (?, ?)",
+                        [(message_id, label_id) for label_id in label_ids])
+                else:
+                    self._db.executemany(
+                        "DELETE FROM labels WHERE message_id = ? AND label_id = ?",
+                        [(message_id, label_id) for label_id in label_ids])
+            self._db.executemany("DELETE FROM messages WHERE id = ?", [(i,) for i in deleted])
+            self._db.executemany("DELETE FROM labels WHERE message_id = ?", [(i,) for i in deleted])
+            self._store(summaries)
+            # The changes are replayed by the next sync until the messages
+            # that failed are fetched, which applying them again allows.
+            if not failed:
+                self._set_state("history_id", history_id)
+            self._set_state("synced_at", self._clock())
+        return len(added | deleted | {message_id for message_id, _, _ in label_changes})
+
+    def unread(self, limit: int) -> List[Dict]:
+        """Return the newest unread messages of the primary inbox."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, sender, subject, snippet, internal_date FROM messages m "
+                f"WHERE {UNREAD_WHERE} ORDER BY internal_date DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(zip(("id", "sender", "subject", "snippet", "internal_date"), row)) for row in rows]
+
+    def unread_count(self) -> int:
+        """Return the number of unread messages of the primary inbox."""
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM messages m WHERE {UNREAD_WHERE}").fetchone()[0]
+
+
+class MailboxSync(SyncedStores):
+    """Keeps the mailbox indexes of the users of the process up to date.
+
+    The indexes hold the senders, subjects and snippets of the mail of the
+    users, so they are kept in memory only and go away with the user.
+    """
+
+    def __init__(self, refresh_interval: float = REFRESH_INTERVAL,
+                 get_gmail: Callable = lambda credentials: get_service("gmail", "v1", credentials)):
+        """Create the syncer.
+
+        Args:
+          refresh_interval: Seconds between two background syncs.
+          get_gmail: Returns the Gmail service of credentials.
+        """
+        super().__init__(lambda key: MailboxIndex(":memory:"), get_gmail, refresh_interval, name="mailbox-sync")
+
+    def index(self, credentials, wait: bool = True) -> Optional[MailboxIndex]:
+        """Return the synced index of the mailbox of the credentials.
+
+        Without wait, None is returned until the index is built in the background.
+        """
+        return self.get(credentials, wait)
+
+
+# Indexes used to be stored in the cache directory, where they outlived the
+# sessions of their users.
+shutil.rmtree(os.path.join(cache.cache_dir(), "mailbox"), ignore_errors=True)
+
+mailbox_sync = MailboxSync()
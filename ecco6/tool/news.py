@@ -1,7 +1,19 @@
-import requests
+import logging
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
 import streamlit as st
 
-def get_top_headlines():
+from ecco6 import http_client
+
+# World headlines change slowly, so they are refreshed in the background and
+# served from memory.
+REFRESH_INTERVAL = 10 * 60
+MAX_STALENESS = 30 * 60
+
+
+def fetch_top_headlines():
     url = "https://google-news13.p.rapidapi.com/world"
     querystring = {"lr": "en-US"}
     headers = {
@@ -9,7 +21,8 @@ def get_top_headlines():
         "X-RapidAPI-Host": "google-news13.p.rapidapi.com"
     }
 
-    response = requests.get(url, headers=headers, params=querystring)
+    response = http_client.get(url, headers=headers, params=querystring)
+    response.raise_for_status()
     data = response.json()
 
     headlines_info = []
@@ -27,4 +40,77 @@ def get_top_headlines():
             }
             headlines_info.append(headline_info)
 
-    return headlines_info
\ No newline at end of file
+    return headlines_info
+
+
+class HeadlinePrefetcher:
+    """Keeps the latest headlines in memory, refreshed by a daemon thread.
+
+    If a refresh fails the previous headlines are kept, so readers always get
+    the latest headlines that could be fetched together with their age.
+    """
+
+    def __init__(self, fetch: Callable[[], List[dict]], refresh_interval: float = REFRESH_INTERVAL,
+                 clock: Callable[[], float] = time.time):
+        self._fetch = fetch
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._headlines = None
+        self._fetched_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def refresh(self) -> bool:
+        """Fetch the headlines now. Returns whether the fetch succeeded."""
+        try:
+            headlines = self._fetch()
+        except Exception:
+            logging.exception("Failed to refresh the top headlines.")
+            return False
+        with self._lock:
+            self._headlines = headlines
+            self._fetched_at = self._clock()
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+    def start(self):
+        """Start the refresh thread, unless it is already running."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="headline-prefetcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def get(self) -> Tuple[Optional[List[dict]], float]:
+        """Return the latest headlines and their age in seconds.
+
+        Fetches synchronously if no headlines have been fetched yet. Returns
+        (None, 0) if that fails too.
+        """
+        if self._headlines is None:
+            self.refresh()
+        with self._lock:
+            if self._headlines is None:
+                return None, 0.0
+            return self._headlines, self._clock() - self._fetched_at
+
+
+prefetcher = HeadlinePrefetcher(fetch_top_headlines)
+
+
+def get_top_headlines():
+    prefetcher.start()
+    headlines, age = prefetcher.get()
+    if headlines is None:
+        return "The news service is not available right now."
+    if age > MAX_STALENESS:
+        note = f"These headlines were fetched {int(age // 60)} minutes ago."
+        return [{**headline, 'note': note} for headline in headlines]
+    return headlines
@@ -1,6 +1,8 @@
 import requests
 from langchain.pydantic_v1 import BaseModel, Field
 
+from ecco6 import http_client
+
 
 class SetRpiTimerInput(BaseModel):
     time: str = Field(description="The time set for the timer in HH:MM:SS format.")
@@ -13,7 +15,7 @@ def set_rpi_timer(time: str, url: str):
     count_down = {'hour': time_list[0], 'minute': time_list[1], 'second': time_list[2]}
 
     try:
-        r = requests.post(url, json = count_down)
+        r = http_client.post(url, json = count_down)
         r.raise_for_status()
     except requests.exceptions.HTTPError as e:
         return str(e)
@@ -1,39 +1,87 @@
+import datetime
+import logging
 import os
-import difflib
-import csv
-import requests
+import time
 from langchain.pydantic_v1 import BaseModel, Field
 from langchain.tools import StructuredTool
 import streamlit as st
-import requests
 from .location import get_current_location
-from ecco6.tool import stops
+from ecco6 import cache, http_client
+from ecco6.tool import gtfs, station_index
 
 #================ TRAVEL PLANER ===================
 current_dir = os.path.dirname(__file__)
 #current_dir = os.path.dirname(os.path.abspath(__file__))
 stops_file = os.path.join(current_dir, "stops.txt")
 
+def get_station(station_name):
+    return station_index.get_station_index().find(station_name)
+
 def get_station_coordinates(station_name):
-    reader = csv.DictReader(stops.STOP_CSV_STR.splitlines())
-    station_names = [row['stop_name'].lower() for row in reader]
-
-    closest_matches = difflib.get_close_matches(station_name.lower(), station_names, n=1, cutoff=0.6)
-    if closest_matches:
-        closest_station_name = closest_matches[0]
-        reader = csv.DictReader(stops.STOP_CSV_STR.splitlines())
-        for row in reader:
-            if row['stop_name'].lower() == closest_station_name:
-                return float(row['stop_lat']), float(row['stop_lon'])
-    return None, None
+    station = get_station(station_name)
+    if station is None:
+        return None, None
+    return station[0], station[1]
 
 SL_RESEPLANERARE_API_KEY = st.secrets["SL_RESEPLANERARE_API_KEY"]
 
+# Optional directory with an SL GTFS feed. When set, journeys are planned
+# locally and the TravelplannerV3_1 API is only used as a fallback.
+SL_GTFS_DIR = st.secrets.get("SL_GTFS_DIR")
+
+# The timetable is loaded in the background, starting at import time; until
+# the first load finishes, journeys are planned with the API.
+daily_timetable = gtfs.DailyTimetable(SL_GTFS_DIR) if SL_GTFS_DIR else None
+
+def get_local_travel_suggestions(origin_station_name: str, destination_station_name: str) -> str:
+    timetable = daily_timetable.get()
+    if timetable is None:
+        logging.info("The GTFS timetable is still loading, using the SL API.")
+        return ""
+    now = datetime.datetime.now()
+    departure_time = now.hour * 3600 + now.minute * 60 + now.second
+    legs = timetable.plan(origin_station_name, destination_station_name, departure_time)
+    return gtfs.format_journey(legs)
+
 class GetTravelSuggestionsInput(BaseModel):
     origin_station_name: str = Field(description="The name of the origin station.")
     destination_station_name: str = Field(description="The name of the destination station.")
 
+# Journeys are cached per (origin stop, destination stop, departure bucket)
+# and shared by all sessions, since the same commute is asked again and again.
+TRAVEL_CACHE_BUCKET_SECONDS = 300
+travel_cache = cache.TTLCache(maxsize=256, ttl=TRAVEL_CACHE_BUCKET_SECONDS)
+
+def travel_cache_key(origin_station_name: str, destination_station_name: str) -> tuple:
+    stops = []
+    for station_name in (origin_station_name, destination_station_name):
+        station = get_station(station_name)
+        stops.append(station[2] if station is not None else station_index.normalize_name(station_name))
+    return (*stops, int(time.time() // TRAVEL_CACHE_BUCKET_SECONDS))
+
 def get_travel_suggestions(origin_station_name: str, destination_station_name: str) -> str:
+    key = travel_cache_key(origin_station_name, destination_station_name)
+    travel_suggestions = travel_cache.get(key)
+    if travel_suggestions is not None:
+        logging.info(f"SL travel cache hit: {travel_cache.stats()}")
+        return travel_suggestions
+
+    logging.info(f"SL travel cache miss: {travel_cache.stats()}")
+    travel_suggestions = plan_travel(origin_station_name, destination_station_name)
+    if not travel_suggestions.startswith("Error"):
+        travel_cache.set(key, travel_suggestions)
+    return travel_suggestions
+
+def plan_travel(origin_station_name: str, destination_station_name: str) -> str:
+    if SL_GTFS_DIR:
+        try:
+            travel_suggestions = get_local_travel_suggestions(origin_station_name, destination_station_name)
+        except Exception:
+            logging.exception("Local journey planning failed, falling back to the SL API.")
+        else:
+            if travel_suggestions:
+                return travel_suggestions
+
     origin_lat, origin_lon = get_station_coordinates(origin_station_name)
     destination_lat, destination_lon = get_station_coordinates(destination_station_name)
 
@@ -44,7 +92,7 @@ def get_travel_suggestions(origin_station_name: str, destination_station_name: s
         return f"Error: Station '{destination_station_name}' not found in the database."
 
     url = f"https://journeyplanner.integration.sl.se/v1/TravelplannerV3_1/trip.json?key={SL_RESEPLANERARE_API_KEY}&originCoordLat={origin_lat}&originCoordLong={origin_lon}&destCoordLat={destination_lat}&destCoordLong={destination_lon}"
-    response = requests.get(url)
+    response = http_client.get(url)
 
     if response.status_code == 200:
         data = response.json()
@@ -89,8 +137,23 @@ class GetNearbyStopsInput(BaseModel):
 SL_NEARBYSTOPS_API_KEY = st.secrets["SL_NEARBYSTOPS_API_KEY"]
 
 def get_nearby_stops(latitude: float, longitude: float, max_results: int = 3, radius: int = 1000) -> list:
+    # Answer from the bundled stop data, the SL API is only asked when no
+    # known stop is within the radius.
+    nearby_stops = station_index.get_station_index().nearby(latitude, longitude, max_results, radius)
+    if nearby_stops:
+        return [
+            {
+                'name': name,
+                'distance': round(distance),
+                'location': str(stop_id)
+            }
+            for name, distance, stop_id in nearby_stops
+        ]
+    return get_nearby_stops_from_api(latitude, longitude, max_results, radius)
+
+def get_nearby_stops_from_api(latitude: float, longitude: float, max_results: int = 3, radius: int = 1000) -> list:
     url = f"https://journeyplanner.integration.sl.se/v1/nearbystopsv2.json?key={SL_NEARBYSTOPS_API_KEY}&originCoordLat={latitude}&originCoordLong={longitude}&maxNo={max_results}&r={radius}"
-    response = requests.get(url)
+    response = http_client.get(url)
     if response.status_code == 200:
         data = response.json()
         nearby_stops = data.get('stopLocationOrCoordLocation', [])
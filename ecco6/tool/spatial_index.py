@@ -0,0 +1,95 @@
+import math
+from typing import List, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+
+def haversine(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Return the great-circle distances in meters from one point to many.
+
+    Args:
+      lat: The latitude of the origin in degrees.
+      lon: The longitude of the origin in degrees.
+      lats: The latitudes of the destinations in degrees.
+      lons: The longitudes of the destinations in degrees.
+    Returns:
+      An array with the distance to every destination.
+    """
+    phi = math.radians(lat)
+    phis = np.radians(lats)
+    a = (np.sin((phis - phi) / 2) ** 2
+         + math.cos(phi) * np.cos(phis) * np.sin(np.radians(lons - lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridIndex:
+    """Spatial index bucketing points into a fixed lat/lon grid.
+
+    A radius query only computes distances to the points in the grid cells
+    overlapping the bounding box of the circle.
+    """
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, cell_deg: float = 0.01):
+        """Build the index.
+
+        Args:
+          lats: The latitudes of the points in degrees.
+          lons: The longitudes of the points in degrees.
+          cell_deg: The side of a grid cell in degrees.
+        """
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.cell_deg = cell_deg
+
+        keys = self._keys(np.floor(self.lats / cell_deg), np.floor(self.lons / cell_deg))
+        order = np.argsort(keys, kind="stable")
+        unique_keys, starts = np.unique(keys[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        self._cells = {
+            key: order[start:end]
+            for key, start, end in zip(unique_keys.tolist(), starts.tolist(), ends.tolist())}
+
+    @staticmethod
+    def _keys(rows, cols):
+        return (np.asarray(rows, dtype=np.int64) << 32) + (np.asarray(cols, dtype=np.int64) + (1 << 31))
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def _candidates(self, lat: float, lon: float, radius: float) -> np.ndarray:
+        dlat = radius / METERS_PER_DEGREE
+        dlon = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        rows = range(math.floor((lat - dlat) / self.cell_deg), math.floor((lat + dlat) / self.cell_deg) + 1)
+        cols = range(math.floor((lon - dlon) / self.cell_deg), math.floor((lon + dlon) / self.cell_deg) + 1)
+        if len(rows) * len(cols) > len(self._cells):
+            return np.arange(len(self.lats))
+        keys = self._keys(np.repeat(rows, len(cols)), np.tile(cols, len(rows)))
+        cells = [self._cells[key] for key in keys.tolist() if key in self._cells]
+        if not cells:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(cells)
+
+    def nearby(self, lat: float, lon: float, radius: float,
+               max_results: int) -> List[Tuple[int, float]]:
+        """Find the points closest to a location.
+
+        Args:
+          lat: The latitude of the location in degrees.
+          lon: The longitude of the location in degrees.
+          radius: The search radius in meters.
+          max_results: The maximum number of points to return.
+        Returns:
+          A list of up to max_results (row, distance in meters) tuples within
+          the radius, closest first.
+        """
+        rows = self._candidates(lat, lon, radius)
+        if len(rows) == 0 or max_results <= 0:
+            return []
+        distances = haversine(lat, lon, self.lats[rows], self.lons[rows])
+        within = distances <= radius
+        rows, distances = rows[within], distances[within]
+        order = np.lexsort((rows, distances))[:max_results]
+        return list(zip(rows[order].tolist(), distances[order].tolist()))
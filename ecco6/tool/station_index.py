@@ -0,0 +1,163 @@
+import csv
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ecco6.tool import stop_table
+from ecco6.tool.spatial_index import GridIndex
+from ecco6.tool.trigram_index import TrigramIndex
+
+# Trailing words of SL stop names that people usually leave out.
+STOP_NAME_SUFFIXES = ("t-bana", "spårv", "station")
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a station name for lookups.
+
+    Args:
+      name: The station name as written in the stop data or by the user.
+    Returns:
+      The lower-cased name with surrounding and repeated whitespace removed.
+    """
+    return " ".join(name.lower().split())
+
+
+class StationIndex:
+    """In-memory index over the SL stop data.
+
+    The stop data is kept in compact column arrays. A dictionary maps every
+    normalized stop name to the row of its first occurrence, so exact name
+    lookups are O(1). Misspelled names are matched through a trigram index
+    and nearby-stop queries through a grid index, both built on first use.
+    """
+
+    def __init__(self, names: Sequence[str], lat: np.ndarray, lon: np.ndarray,
+                 stop_id: np.ndarray):
+        """Index stop data given as columns.
+
+        Args:
+          names: The stop names.
+          lat: The latitudes of the stops.
+          lon: The longitudes of the stops.
+          stop_id: The GTFS stop ids.
+        """
+        self.display_names = [name.strip() for name in names]
+        self.lat = lat
+        self.lon = lon
+        self.stop_id = stop_id
+
+        self._rows = {}
+        for row, name in enumerate(self.display_names):
+            self._rows.setdefault(normalize_name(name), row)
+        self.unique_names = list(self._rows)
+        self._trigram_index = None
+        self._spatial_index = None
+        self._lazy_lock = threading.Lock()
+
+    @classmethod
+    def from_csv(cls, csv_str: str) -> "StationIndex":
+        """Build an index from GTFS stops.txt content."""
+        rows = list(csv.DictReader(csv_str.splitlines()))
+        return cls(
+            [row['stop_name'] for row in rows],
+            np.array([float(row['stop_lat']) for row in rows], dtype=np.float64),
+            np.array([float(row['stop_lon']) for row in rows], dtype=np.float64),
+            np.array([int(row['stop_id']) for row in rows], dtype=np.int64))
+
+    @classmethod
+    def from_table(cls, table: stop_table.StopTable) -> "StationIndex":
+        """Build an index over a memory-mapped stop table."""
+        return cls(table.names(), table.lat, table.lon, table.stop_id)
+
+    def __len__(self) -> int:
+        return len(self.stop_id)
+
+    def row(self, name: str) -> Optional[int]:
+        """Return the row of an exactly matching stop name, or None."""
+        return self._rows.get(normalize_name(name))
+
+    def get(self, row: int) -> Tuple[float, float, int]:
+        """Return (lat, lon, stop_id) of a row."""
+        return round(float(self.lat[row]), 6), round(float(self.lon[row]), 6), int(self.stop_id[row])
+
+    def lookup(self, name: str) -> Optional[Tuple[float, float, int]]:
+        """Look up a stop by its exact (normalized) name.
+
+        Args:
+          name: The name of the stop.
+        Returns:
+          A tuple of (lat, lon, stop_id), or None if the name is unknown.
+        """
+        row = self.row(name)
+        if row is None:
+            return None
+        return self.get(row)
+
+    @property
+    def trigram_index(self) -> TrigramIndex:
+        if self._trigram_index is None:
+            with self._lazy_lock:
+                if self._trigram_index is None:
+                    self._trigram_index = TrigramIndex(
+                        self.unique_names, strip_suffixes=STOP_NAME_SUFFIXES)
+        return self._trigram_index
+
+    @property
+    def spatial_index(self) -> GridIndex:
+        if self._spatial_index is None:
+            with self._lazy_lock:
+                if self._spatial_index is None:
+                    self._spatial_index = GridIndex(self.lat, self.lon)
+        return self._spatial_index
+
+    def nearby(self, latitude: float, longitude: float, max_results: int = 3,
+               radius: float = 1000) -> List[Tuple[str, float, int]]:
+        """Find the stops closest to a location.
+
+        Args:
+          latitude: The latitude of the location.
+          longitude: The longitude of the location.
+          max_results: The maximum number of stops to return.
+          radius: The search radius in meters.
+        Returns:
+          A list of (name, distance in meters, stop_id) tuples, closest first.
+        """
+        return [
+            (self.display_names[row], distance, int(self.stop_id[row]))
+            for row, distance in self.spatial_index.nearby(latitude, longitude, radius, max_results)]
+
+    def close_matches(self, name: str, n: int = 1, cutoff: float = 0.6) -> List[str]:
+        """Return the normalized stop names closest to the given name."""
+        return [match for match, _ in self.trigram_index.search(name, k=n, cutoff=cutoff)]
+
+    def find(self, name: str, cutoff: float = 0.6) -> Optional[Tuple[float, float, int]]:
+        """Find a stop by name, falling back to fuzzy matching.
+
+        Args:
+          name: The name of the stop, possibly misspelled.
+          cutoff: The minimum similarity of a fuzzy match.
+        Returns:
+          A tuple of (lat, lon, stop_id), or None if nothing matches.
+        """
+        found = self.lookup(name)
+        if found is not None:
+            return found
+        matches = self.close_matches(name, cutoff=cutoff)
+        if matches:
+            return self.lookup(matches[0])
+        return None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_station_index() -> StationIndex:
+    """Return the process-wide station index, building it on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = StationIndex.from_table(stop_table.get_stop_table())
+    return _index
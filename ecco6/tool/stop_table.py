@@ -0,0 +1,158 @@
+"""Compact columnar stop data, memory-mapped on first use.
+
+The GTFS stops.txt bundled with the package is compiled into a binary file
+with the following little-endian layout:
+
+  header        8s magic, uint32 count, uint32 names blob size
+  stop_id       int64[count]
+  lat           float32[count]
+  lon           float32[count]
+  name_offsets  uint32[count + 1], offsets of each name in the blob
+  names         UTF-8 stop names separated by newlines
+
+The file is opened with mmap, so the columns are zero-copy numpy views and
+the pages are shared by every process that loads it.
+
+To rebuild the file after updating stops.txt, run from the repository root:
+  python -m ecco6.tool.stop_table ecco6/stops.txt ecco6/stops.bin
+"""
+import csv
+import mmap
+import os
+import struct
+import sys
+import threading
+from typing import Iterable, List, Mapping
+
+import numpy as np
+
+MAGIC = b"ECSTOPS1"
+_HEADER = struct.Struct("<8sII")
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(__file__))
+STOPS_CSV = os.path.join(PACKAGE_DIR, "stops.txt")
+STOPS_BIN = os.path.join(PACKAGE_DIR, "stops.bin")
+
+
+def clean_stop_name(name: str) -> str:
+    """Shorten a GTFS stop name the way the assistant refers to stops.
+
+    "Stockholm Centralstation" becomes "Stockholm Central" and
+    "Alvesta station" becomes "Alvesta ".
+    """
+    return name.replace("station", "")
+
+
+def build(rows: Iterable[Mapping[str, str]]) -> bytes:
+    """Serialize GTFS stop rows into the columnar format.
+
+    Args:
+      rows: The rows of a GTFS stops.txt, e.g. from csv.DictReader.
+    Returns:
+      The content of the binary stop file.
+    """
+    stop_ids = []
+    lats = []
+    lons = []
+    names = []
+    for row in rows:
+        stop_ids.append(int(row['stop_id']))
+        lats.append(float(row['stop_lat']))
+        lons.append(float(row['stop_lon']))
+        names.append(clean_stop_name(row['stop_name']).replace("\n", " "))
+
+    encoded = [name.encode("utf-8") for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(name) + 1 for name in encoded])
+    blob = b"\n".join(encoded) + b"\n" if encoded else b""
+    return b"".join([
+        _HEADER.pack(MAGIC, len(names), len(blob)),
+        np.array(stop_ids, dtype="<i8").tobytes(),
+        np.array(lats, dtype="<f4").tobytes(),
+        np.array(lons, dtype="<f4").tobytes(),
+        offsets.tobytes(),
+        blob,
+    ])
+
+
+def build_file(csv_path: str, out_path: str) -> None:
+    """Compile a GTFS stops.txt into a binary stop file."""
+    with open(csv_path, encoding="utf-8", newline="") as f:
+        data = build(csv.DictReader(f))
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, out_path)
+
+
+class StopTable:
+    """Read-only view of a binary stop file.
+
+    Attributes:
+      stop_id: int64 array of GTFS stop ids.
+      lat: float32 array of latitudes.
+      lon: float32 array of longitudes.
+    """
+
+    def __init__(self, buffer):
+        magic, count, blob_size = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a stop table file.")
+        self._buffer = buffer
+        offset = _HEADER.size
+        self.stop_id = np.frombuffer(buffer, dtype="<i8", count=count, offset=offset)
+        offset += 8 * count
+        self.lat = np.frombuffer(buffer, dtype="<f4", count=count, offset=offset)
+        offset += 4 * count
+        self.lon = np.frombuffer(buffer, dtype="<f4", count=count, offset=offset)
+        offset += 4 * count
+        self._name_offsets = np.frombuffer(buffer, dtype="<u4", count=count + 1, offset=offset)
+        offset += 4 * (count + 1)
+        self._blob = memoryview(buffer)[offset:offset + blob_size]
+
+    @classmethod
+    def open(cls, path: str) -> "StopTable":
+        """Memory-map a binary stop file."""
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self) -> int:
+        return len(self.stop_id)
+
+    def name(self, row: int) -> str:
+        """Return the name of the stop in a row."""
+        start, end = self._name_offsets[row], self._name_offsets[row + 1] - 1
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+    def names(self) -> List[str]:
+        """Decode the names of all stops."""
+        if len(self) == 0:
+            return []
+        return bytes(self._blob).decode("utf-8").split("\n")[:-1]
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_stop_table() -> StopTable:
+    """Return the bundled stop table, mapping it on first use.
+
+    Falls back to compiling stops.txt in memory if stops.bin is missing.
+    """
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                if os.path.exists(STOPS_BIN):
+                    _table = StopTable.open(STOPS_BIN)
+                else:
+                    with open(STOPS_CSV, encoding="utf-8", newline="") as f:
+                        _table = StopTable(build(csv.DictReader(f)))
+    return _table
+
+
+if __name__ == "__main__":
+    csv_path, out_path = sys.argv[1:3] if len(sys.argv) > 2 else (STOPS_CSV, STOPS_BIN)
+    build_file(csv_path, out_path)
+    print(f"Wrote {len(StopTable.open(out_path))} stops to {out_path}")
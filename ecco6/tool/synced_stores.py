@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional, Set
+
+from ecco6.tool.google_services import credentials_key
+
+# Stores that have not been read for this many seconds are dropped.
+IDLE_TIMEOUT = 60 * 60
+
+
+class SyncedStores:
+    """Keeps one local store per user of the process in sync.
+
+    A store is created and synced on first use. After that, one daemon
+    thread syncs all stores every refresh_interval seconds, and reads only
+    wait for a sync when a store is stale, or do not wait at all and sync
+    it in the background. Stores are dropped, with the
+    credentials of their user, on sign-out or when they have not been read
+    for idle_timeout seconds.
+
+    Stores have a sync(service) method and a synced_at property with the
+    time of their last sync.
+    """
+
+    def __init__(self, create: Callable[[Optional[Hashable]], object], get_service: Callable,
+                 refresh_interval: float, name: str, idle_timeout: float = IDLE_TIMEOUT):
+        """Create the syncer.
+
+        Args:
+          create: Creates the store of a credentials key; the key is None for
+            credentials that cannot be told apart.
+          get_service: Returns the service that the stores of credentials sync from.
+          refresh_interval: Seconds between two background syncs.
+          name: The name of the sync thread.
+          idle_timeout: Seconds without reads after which a store is dropped.
+        """
+        self._create = create
+        self._get_service = get_service
+        self.refresh_interval = refresh_interval
+        self._name = name
+        self.idle_timeout = idle_timeout
+        self._stores: Dict[Optional[Hashable], list] = {}
+        # The keys of the stores that are synced by a background thread of get.
+        self._syncing: Set[Optional[Hashable]] = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _fresh(self, store) -> bool:
+        synced_at = store.synced_at
+        return synced_at is not None and synced_at >= time.time() - 2 * self.refresh_interval
+
+    def get(self, credentials, wait: bool = True):
+        """Return the synced store of the credentials.
+
+        Args:
+          credentials: The credentials of the user.
+          wait: Whether to wait for the sync of a store that is not fresh.
+            If not, the store is synced in a background thread and None is
+            returned until it is fresh.
+        """
+        key = credentials_key(credentials)
+        with self._lock:
+            entry = self._stores.get(key)
+            if entry is None:
+                entry = self._stores[key] = [self._create(key), credentials, None]
+            entry[1] = credentials
+            entry[2] = time.time()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+        store = entry[0]
+        if self._fresh(store):
+            return store
+        if wait:
+            store.sync(self._get_service(credentials))
+            return store
+        with self._lock:
+            if key not in self._syncing:
+                self._syncing.add(key)
+                threading.Thread(target=self._sync_in_background, args=(key, store, credentials),
+                                 name=f"{self._name}-first", daemon=True).start()
+        return None
+
+    def _sync_in_background(self, key, store, credentials):
+        try:
+            store.sync(self._get_service(credentials))
+        except Exception:
+            logging.exception(f"Failed to sync a store of {self._name}.")
+        finally:
+            with self._lock:
+                self._syncing.discard(key)
+
+    def peek(self, credentials):
+        """Return the store of the credentials if it is fresh, without syncing."""
+        with self._lock:
+            entry = self._stores.get(credentials_key(credentials))
+            if entry is None or not self._fresh(entry[0]):
+                return None
+            entry[2] = time.time()
+            return entry[0]
+
+    def discard(self, credentials):
+        """Drop the store of the credentials, e.g. when the user signs out."""
+        with self._lock:
+            self._stores.pop(credentials_key(credentials), None)
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            with self._lock:
+                idle_since = time.time() - self.idle_timeout
+                for key in [key for key, entry in self._stores.items() if entry[2] < idle_since]:
+                    del self._stores[key]
+                entries = list(self._stores.values())
+            for store, credentials, _ in entries:
+                try:
+                    store.sync(self._get_service(credentials))
+                except Exception:
+                    logging.exception(f"Failed to sync a store of {self._name}.")
+
+    def stop(self):
+        self._stop.set()
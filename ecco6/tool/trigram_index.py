@@ -0,0 +1,120 @@
+import difflib
+import re
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+_FOLD_TABLE = str.maketrans("åäöéèëüæø", "aaoeeeuao")
+_NON_ALNUM = re.compile(r"[\W_]+")
+
+
+def fold(text: str) -> str:
+    """Fold a name into the form used for fuzzy matching.
+
+    Lower-cases the text, strips Swedish diacritics and replaces punctuation
+    with spaces, so that "T-Centralen" and "t centralen" or "Högskolan" and
+    "hogskolan" fold to the same string.
+    """
+    text = text.lower().translate(_FOLD_TABLE)
+    return " ".join(_NON_ALNUM.sub(" ", text).split())
+
+
+def trigrams(folded: str) -> set:
+    """Return the set of character trigrams of a folded string."""
+    padded = f"  {folded} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Fuzzy name matcher backed by a character-trigram inverted index.
+
+    Candidates are found through the posting lists of the query trigrams and
+    ranked by their Dice coefficient. Only the best candidates are then
+    scored with difflib's SequenceMatcher, so a lookup touches a few dozen
+    names instead of every name in the index.
+    """
+
+    def __init__(self, names: Sequence[str], strip_suffixes: Iterable[str] = ()):
+        """Build the index.
+
+        Args:
+          names: The names to search, returned as-is from search().
+          strip_suffixes: Trailing words that may be left out by the user,
+            e.g. "t-bana" for "Odenplan T-bana". Names are also scored
+            without these suffixes.
+        """
+        self.names = list(names)
+        self._folded = [fold(name) for name in self.names]
+        self._suffixes = tuple(f" {fold(suffix)}" for suffix in strip_suffixes)
+        self._base = {}
+        for row, folded in enumerate(self._folded):
+            base = self._strip_suffix(folded)
+            if base is not None:
+                self._base[row] = base
+
+        postings: Dict[str, List[int]] = {}
+        sizes = np.empty(len(self.names), dtype=np.float32)
+        for row, folded in enumerate(self._folded):
+            grams = trigrams(folded)
+            sizes[row] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(row)
+        self._sizes = sizes
+        self._postings = {
+            gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _strip_suffix(self, folded: str):
+        for suffix in self._suffixes:
+            if folded.endswith(suffix) and len(folded) > len(suffix):
+                return folded[:-len(suffix)]
+        return None
+
+    def search(self, query: str, k: int = 1, cutoff: float = 0.6,
+               candidates: int = 16) -> List[Tuple[str, float]]:
+        """Return the names most similar to the query.
+
+        Args:
+          query: The name to look up, e.g. as transcribed from speech.
+          k: The maximum number of matches to return.
+          cutoff: The minimum similarity, between 0 and 1, of a match.
+          candidates: How many trigram candidates to score with difflib.
+        Returns:
+          A list of up to k (name, score) tuples, best match first.
+        """
+        folded = fold(query)
+        if not folded:
+            return []
+        grams = trigrams(folded)
+        hits = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not hits:
+            return []
+
+        counts = np.bincount(np.concatenate(hits), minlength=len(self.names))
+        rows = np.flatnonzero(counts > 0)
+        dice = 2 * counts[rows] / (len(grams) + self._sizes[rows])
+        if len(rows) > candidates:
+            best = np.argpartition(-dice, candidates)[:candidates]
+            rows, dice = rows[best], dice[best]
+
+        matchers = [difflib.SequenceMatcher(b=folded)]
+        query_base = self._strip_suffix(folded)
+        if query_base is not None:
+            matchers.append(difflib.SequenceMatcher(b=query_base))
+        scored = []
+        for row, row_dice in zip(rows.tolist(), dice.tolist()):
+            targets = [self._folded[row]]
+            if row in self._base:
+                targets.append(self._base[row])
+            score = 0.0
+            for matcher in matchers:
+                for target in targets:
+                    matcher.set_seq1(target)
+                    if matcher.quick_ratio() > score:
+                        score = max(score, matcher.ratio())
+            if score >= cutoff:
+                scored.append((score, row_dice, -row))
+        scored.sort(reverse=True)
+        return [(self.names[-row], score) for score, _, row in scored[:k]]
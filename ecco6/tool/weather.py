@@ -1,48 +1,81 @@
-from langchain.pydantic_v1 import BaseModel
-import requests
+import os
+from langchain.pydantic_v1 import BaseModel, Field
 import streamlit as st
 from typing import Optional
 
+from ecco6 import cache, http_client
+
+BASE_URL = "https://ai-weather-by-meteosource.p.rapidapi.com"
+
+# City name -> Meteosource place_id, kept on disk since it practically
+# never changes and saves a round trip on every weather question.
+place_id_cache = cache.JsonStore(os.path.join(cache.cache_dir(), "weather_place_ids.json"))
+
+# Time to live in seconds of the cached forecasts, per Meteosource section.
+FORECAST_TTL = {"current": 30 * 60, "daily": 3 * 60 * 60}
+forecast_cache = cache.TTLCache(maxsize=128, ttl=FORECAST_TTL["daily"])
+
 class WeatherInput(BaseModel):
-    city_name: str
+    city_name: Optional[str] = Field(description="The city to get the weather for. Leave empty for the current location.")
     date: Optional[str]
 
+def normalize_city_name(city_name: str) -> str:
+    return " ".join(city_name.lower().split())
+
+def get_location_query(city_name: Optional[str], headers: dict) -> dict:
+    if not city_name and "latitude" in st.session_state and "longitude" in st.session_state:
+        return {"lat": st.session_state.latitude, "lon": st.session_state.longitude}
+
+    key = normalize_city_name(city_name)
+    place_id = place_id_cache.get(key)
+    if place_id is None:
+        find_places_url = f"{BASE_URL}/find_places"
+        find_places_query = {"text": city_name, "language": "en"}
+        find_places_response = http_client.get(find_places_url, headers=headers, params=find_places_query)
+        place_id = find_places_response.json()[0]['place_id']
+        place_id_cache.set(key, place_id)
+    return {"place_id": place_id}
+
+def get_forecast(section: str, location_query: dict, headers: dict) -> dict:
+    """Return the current weather or the daily forecast of a place.
+
+    Daily forecasts are returned as a dict keyed by date (YYYY-MM-DD), so
+    questions about different days are answered from one download.
+    """
+    key = (section, tuple(sorted(
+        (name, round(value, 2) if isinstance(value, float) else value)
+        for name, value in location_query.items())))
+    forecast = forecast_cache.get(key)
+    if forecast is None:
+        querystring = {
+            **location_query,
+            "timezone": "auto",
+            "language": "en",
+            "units": "metric"
+        }
+        weather_data = http_client.get(f"{BASE_URL}/{section}", headers=headers, params=querystring).json()
+        if section == "daily":
+            forecast = {daily_forecast['day']: daily_forecast for daily_forecast in weather_data['daily']['data']}
+        else:
+            forecast = weather_data['current']
+        forecast_cache.set(key, forecast, ttl=FORECAST_TTL[section])
+    return forecast
+
 def get_weather(input_data: WeatherInput) -> str:
-    base_url = "https://ai-weather-by-meteosource.p.rapidapi.com"
     headers = {
         "X-RapidAPI-Key": st.secrets["WEATHER_API_KEY"],
         "X-RapidAPI-Host": "ai-weather-by-meteosource.p.rapidapi.com"
     }
-
-    find_places_url = f"{base_url}/find_places"
-    find_places_query = {"text": input_data.city_name, "language": "en"}
-    find_places_response = requests.get(find_places_url, headers=headers, params=find_places_query)
-    place_id = find_places_response.json()[0]['place_id']
-
-    if input_data.date:
-        url = f"{base_url}/daily"
-    else:
-        url = f"{base_url}/current"
-    
-    querystring = {
-        "place_id": place_id,
-        "timezone": "auto",
-        "language": "en",
-        "units": "metric"
-    }
-
-    response = requests.get(url, headers=headers, params=querystring)
+    if not input_data.city_name and "latitude" not in st.session_state:
+        return "Please tell me which city you want the weather for."
+    location_query = get_location_query(input_data.city_name, headers)
+    city_name = input_data.city_name or "your current location"
 
     if input_data.date:
-        daily_forecast = None
-        weather_data = response.json()
-        for i in range(21):  # Assuming 22 days of forecast data are available
-            daily_forecast = weather_data['daily']['data'][i]
-            if daily_forecast['day'] == input_data.date:
-                break
+        daily_forecast = get_forecast("daily", location_query, headers).get(input_data.date)
 
         if daily_forecast is not None:
-            response = f"On {daily_forecast['day']}, the weather in {input_data.city_name} is forecasted to be {daily_forecast['summary']}. "
+            response = f"On {daily_forecast['day']}, the weather in {city_name} is forecasted to be {daily_forecast['summary']}. "
             response += f"The temperature will range from {daily_forecast['temperature_min']}°C to {daily_forecast['temperature_max']}°C. "
             response += f"It will feel like {daily_forecast['feels_like_min']}°C to {daily_forecast['feels_like_max']}°C. "
             response += f"The wind speed will be {daily_forecast['wind']['speed']} m/s coming from the {daily_forecast['wind']['dir']} direction, "
@@ -50,11 +83,10 @@ def get_weather(input_data: WeatherInput) -> str:
             response += f"There is {daily_forecast['precipitation']['type']} precipitation, and the humidity level is {daily_forecast['humidity']}%. "
             response += f"The visibility is {daily_forecast['visibility']} km."
         else:
-            response = f"No forecast available for {input_data.date} in {input_data.city_name}."
+            response = f"No forecast available for {input_data.date} in {city_name}."
     else:
-        weather_data_c = response.json()
-        current_weather = weather_data_c['current']
-        response = f"In {input_data.city_name}, the weather is currently {current_weather['summary']}. "
+        current_weather = get_forecast("current", location_query, headers)
+        response = f"In {city_name}, the weather is currently {current_weather['summary']}. "
         response += f"The temperature is {current_weather['temperature']}°C, but it feels like {current_weather['feels_like']}°C. "
         response += f"The wind speed is {current_weather['wind']['speed']} m/s coming from the {current_weather['wind']['dir']} direction, "
         response += f"with gusts up to {current_weather['wind']['gusts']} m/s. "
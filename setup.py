@@ -1,3 +1,5 @@
 from setuptools import find_packages, setup
 
-setup(name="ecco6", version='0.1', packages=find_packages())
+setup(name="ecco6", version='0.1', packages=find_packages(exclude=["benchmark", "benchmark.*", "test", "test.*"]),
+      # The stop table is data, not a module.
+      package_data={"ecco6": ["stops.bin", "stops.txt"]})
@@ -0,0 +1,160 @@
+"""An in-memory stand-in for the parts of the Calendar API used by the tools."""
+
+import time
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+def when(moment):
+  return moment.get("dateTime", moment.get("date"))
+
+
+class Request:
+  def __init__(self, service, execute):
+    self._service = service
+    self._execute = execute
+
+  def execute(self):
+    self._service.round_trips += 1
+    if self._service.latency:
+      time.sleep(self._service.latency)
+    return self._execute()
+
+
+class Batch:
+  def __init__(self, service, callback):
+    self._service = service
+    self._callback = callback
+    self._requests = []
+
+  def add(self, request, request_id):
+    self._requests.append((request_id, request))
+
+  def execute(self):
+    assert len(self._requests) <= 50
+    Request(self._service, lambda: None).execute()
+    for request_id, request in self._requests:
+      try:
+        response, exception = request._execute(), None
+      except KeyError as e:
+        response, exception = None, e
+      self._callback(request_id, response, exception)
+
+
+class CalendarList:
+  def __init__(self, service):
+    self._service = service
+
+  def list(self, fields=None, pageToken=None, maxResults=100):
+    def execute():
+      items = list(self._service.calendar_list)
+      start = int(pageToken or 0)
+      page = items[start:start + min(maxResults, self._service.page_size)]
+      response = {"items": page}
+      if start + len(page) < len(items):
+        response["nextPageToken"] = str(start + len(page))
+      return response
+    return Request(self._service, execute)
+
+
+class Events:
+  def __init__(self, service):
+    self._service = service
+
+  def list(self, calendarId, timeMin=None, timeMax=None, singleEvents=False, orderBy=None,
+           syncToken=None, pageToken=None, maxResults=250, fields=None):
+    def execute():
+      service = self._service
+      calendar = service.calendars[calendarId]
+      if syncToken is not None:
+        assert timeMin is None and timeMax is None and orderBy is None
+        if int(syncToken) < service.oldest_sync_token:
+          raise HttpError(httplib2.Response({"status": 410}), b"Sync token is no longer valid.")
+        items = [dict(e) for e in calendar.values() if e["updated"] > int(syncToken)]
+      else:
+        items = [dict(e) for e in calendar.values() if e["status"] != "cancelled"
+                 and (timeMin is None or when(e["end"]) > timeMin)
+                 and (timeMax is None or when(e["start"]) < timeMax)]
+      if orderBy == "startTime":
+        assert singleEvents
+        items.sort(key=lambda e: when(e["start"]))
+      for item in items:
+        del item["updated"]
+      start = int(pageToken or 0)
+      page = items[start:start + min(maxResults, service.page_size)]
+      response = {"items": page}
+      if start + len(page) < len(items):
+        response["nextPageToken"] = str(start + len(page))
+      else:
+        response["nextSyncToken"] = str(service.version)
+      return response
+    return Request(self._service, execute)
+
+  def insert(self, calendarId, body, fields=None):
+    def execute():
+      return dict(self._service.put(calendarId, body))
+    return Request(self._service, execute)
+
+  def delete(self, calendarId, eventId):
+    def execute():
+      self._service.delete(calendarId, eventId)
+    return Request(self._service, execute)
+
+
+class Calendar:
+  """A calendar service with the events of calendars by id.
+
+  Event times are UTC dateTimes with an offset, so they compare as strings.
+  """
+
+  def __init__(self, events=(), calendar_id="primary", page_size=250, latency=0):
+    self.calendars = {calendar_id: {}}
+    self.calendar_list = [{"id": calendar_id, "summary": "me@example.com", "primary": True}]
+    self.page_size = page_size
+    self.latency = latency
+    self.round_trips = 0
+    self.version = 0
+    self.oldest_sync_token = 0
+    for event in events:
+      self.put(calendar_id, event)
+
+  def events(self):
+    return Events(self)
+
+  def calendarList(self):
+    return CalendarList(self)
+
+  def new_batch_http_request(self, callback):
+    return Batch(self, callback)
+
+  def add_calendar(self, calendar_id, summary, events=(), **fields):
+    self.calendars[calendar_id] = {}
+    self.calendar_list.append({"id": calendar_id, "summary": summary, **fields})
+    for event in events:
+      self.put(calendar_id, event)
+
+  def put(self, calendar_id, event):
+    self.version += 1
+    event = dict(event, status="confirmed", updated=self.version)
+    event.setdefault("id", f"e{self.version}")
+    self.calendars.setdefault(calendar_id, {})[event["id"]] = event
+    return {k: v for k, v in event.items() if k != "updated"}
+
+  def delete(self, calendar_id, event_id):
+    self.version += 1
+    self.calendars[calendar_id][event_id] = {"id": event_id, "status": "cancelled", "updated": self.version}
+
+  def expire_sync_tokens(self):
+    self.oldest_sync_token = self.version + 1
+
+
+def event(title, start, end, event_id=None, offset="+00:00"):
+  """Return an event from start to end, e.g. "2024-05-01T09:00", in UTC.
+
+  The offset can also be "Z", which the API uses for some events.
+  """
+  body = {"summary": title, "start": {"dateTime": f"{start}:00{offset}"}, "end": {"dateTime": f"{end}:00{offset}"}}
+  if event_id is not None:
+    body["id"] = event_id
+  return body
@@ -0,0 +1,167 @@
+"""An in-memory stand-in for the parts of the Gmail API used by the tools."""
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+class Request:
+  def __init__(self, service, execute):
+    self._service = service
+    self._execute = execute
+
+  def execute(self):
+    self._service.round_trips += 1
+    return self._execute()
+
+
+class Batch:
+  def __init__(self, service, callback):
+    self._service = service
+    self._callback = callback
+    self._requests = []
+
+  def add(self, request, request_id):
+    self._requests.append((request_id, request))
+
+  def execute(self):
+    assert len(self._requests) <= 100
+    self._service.round_trips += 1
+    for request_id, request in self._requests:
+      try:
+        response, exception = request._execute(), None
+      except HttpError as e:
+        response, exception = None, e
+      self._callback(request_id, response, exception)
+
+
+class Messages:
+  def __init__(self, service):
+    self._service = service
+
+  def list(self, userId, q=None, maxResults=100, pageToken=None, fields=None, labelIds=None):
+    def execute():
+      required = [label for term, label in (("in:inbox", "INBOX"), ("is:unread", "UNREAD")) if term in (q or "")]
+      ids = [m["id"] for m in self._service.messages if all(label in m["labelIds"] for label in required)]
+      start = int(pageToken or 0)
+      page = ids[start:start + min(maxResults, self._service.page_size)]
+      response = {"messages": [{"id": i} for i in page], "resultSizeEstimate": len(ids)}
+      if start + len(page) < len(ids):
+        response["nextPageToken"] = str(start + len(page))
+      return response
+    return Request(self._service, execute)
+
+  def get(self, userId, id, format="full", metadataHeaders=None, fields=None):
+    def execute():
+      service = self._service
+      if service.failures.get(id):
+        service.failures[id] -= 1
+        raise HttpError(httplib2.Response({"status": 429}), b"Too many concurrent requests for user.")
+      message = service.by_id().get(id)
+      if message is None:
+        raise HttpError(httplib2.Response({"status": 404}), b"Requested entity was not found.")
+      service.formats.append(format)
+      return message
+    return Request(self._service, execute)
+
+
+class History:
+  def __init__(self, service):
+    self._service = service
+
+  def list(self, userId, startHistoryId, historyTypes=None, pageToken=None, maxResults=100):
+    def execute():
+      service = self._service
+      if int(startHistoryId) < service.oldest_history_id:
+        raise HttpError(httplib2.Response({"status": 404}), b"Requested entity was not found.")
+      records = [r for r in service.history if int(r["id"]) > int(startHistoryId)]
+      start = int(pageToken or 0)
+      page = records[start:start + min(maxResults, service.page_size)]
+      response = {"history": page, "historyId": str(service.history_id)}
+      if start + len(page) < len(records):
+        response["nextPageToken"] = str(start + len(page))
+      return response
+    return Request(self._service, execute)
+
+
+class Labels:
+  def __init__(self, service):
+    self._service = service
+
+  def get(self, userId, id, fields=None):
+    def execute():
+      messages = [m for m in self._service.messages if id in m["labelIds"]]
+      return {"id": id, "messagesUnread": sum("UNREAD" in m["labelIds"] for m in messages)}
+    return Request(self._service, execute)
+
+
+class Users:
+  def __init__(self, service):
+    self._service = service
+
+  def messages(self):
+    return Messages(self._service)
+
+  def history(self):
+    return History(self._service)
+
+  def labels(self):
+    return Labels(self._service)
+
+  def getProfile(self, userId, fields=None):
+    return Request(self._service, lambda: {"historyId": str(self._service.history_id)})
+
+
+class Gmail:
+  def __init__(self, messages, page_size=100):
+    self.messages = messages
+    self.page_size = page_size
+    self.round_trips = 0
+    self.formats = []
+    # How many more times getting a message fails with 429, by id.
+    self.failures = {}
+    self.history = []
+    self.history_id = 100
+    self.oldest_history_id = 0
+
+  def by_id(self):
+    return {m["id"]: m for m in self.messages}
+
+  def users(self):
+    return Users(self)
+
+  def new_batch_http_request(self, callback):
+    return Batch(self, callback)
+
+  def _record(self, key, message_id, **change):
+    self.history_id += 1
+    self.history.append({"id": str(self.history_id), key: [{"message": {"id": message_id}, **change}]})
+
+  def add(self, message):
+    self.messages.insert(0, message)
+    self._record("messagesAdded", message["id"])
+
+  def delete(self, message_id):
+    self.messages = [m for m in self.messages if m["id"] != message_id]
+    self._record("messagesDeleted", message_id)
+
+  def modify(self, message_id, add=(), remove=()):
+    message = self.by_id()[message_id]
+    if add:
+      message["labelIds"] += [label for label in add if label not in message["labelIds"]]
+      self._record("labelsAdded", message_id, labelIds=list(add))
+    if remove:
+      message["labelIds"] = [label for label in message["labelIds"] if label not in remove]
+      self._record("labelsRemoved", message_id, labelIds=list(remove))
+
+  def expire_history(self):
+    self.oldest_history_id = self.history_id + 1
+
+
+def message(i, labels=("INBOX", "UNREAD")):
+  return {
+      "id": f"m{i}", "threadId": f"t{i}", "labelIds": list(labels),
+      "snippet": f"Snippet {i}", "internalDate": str(1700000000000 + i),
+      "payload": {"headers": [
+          {"name": "From", "value": f"sender{i}@example.com"},
+          {"name": "Subject", "value": f"Subject {i}"}]},
+  }
@@ -0,0 +1,157 @@
+"""An in-memory stand-in for the firebase_admin.db API used by the alarms."""
+import copy
+import itertools
+import threading
+
+
+def _split(path):
+  return [part for part in path.split("/") if part]
+
+
+class Event:
+  def __init__(self, event_type, path, data):
+    self.event_type = event_type
+    self.path = path
+    self.data = data
+
+
+class Registration:
+  def __init__(self, database, listener):
+    self._database = database
+    self._listener = listener
+
+  def close(self):
+    with self._database.lock:
+      if self._listener in self._database.listeners:
+        self._database.listeners.remove(self._listener)
+
+
+class Database:
+  def __init__(self):
+    self.root = {}
+    self.listeners = []
+    self.lock = threading.RLock()
+    self.reads = 0
+    self.writes = 0
+    self._ids = itertools.count()
+
+  def reference(self, path="/"):
+    return Reference(self, _split(path))
+
+  def _get(self, parts):
+    node = self.root
+    for part in parts:
+      if not isinstance(node, dict) or part not in node:
+        return None
+      node = node[part]
+    # Like Firebase, empty nodes do not exist.
+    return copy.deepcopy(node) if node != {} else None
+
+  def _set(self, parts, value):
+    if not parts:
+      self.root = value or {}
+      return
+    node = self.root
+    for part in parts[:-1]:
+      node = node.setdefault(part, {})
+    if value is None:
+      node.pop(parts[-1], None)
+    else:
+      node[parts[-1]] = copy.deepcopy(value)
+
+  def _notify(self, event_type, parts, data):
+    for listener_parts, callback in list(self.listeners):
+      if parts[:len(listener_parts)] == listener_parts:
+        relative = "/" + "/".join(parts[len(listener_parts):])
+        callback(Event(event_type, relative, copy.deepcopy(data)))
+      elif listener_parts[:len(parts)] == parts:
+        callback(Event("put", "/", self._get(listener_parts)))
+
+  def write(self, parts, value, event_type="put"):
+    with self.lock:
+      self.writes += 1
+      if event_type == "patch":
+        for key, child in value.items():
+          self._set(parts + _split(key), child)
+      else:
+        self._set(parts, value)
+      self._notify(event_type, parts, value)
+
+
+class Query:
+  """An order_by_child query over numeric children, like the fire_at index."""
+  def __init__(self, reference, child):
+    self._reference = reference
+    self._child = child
+    self._start = None
+    self._end = None
+
+  def start_at(self, value):
+    self._start = value
+    return self
+
+  def end_at(self, value):
+    self._end = value
+    return self
+
+  def _matches(self, value):
+    if value is None:
+      # Children without the value sort first, before any number.
+      return self._start is None
+    return ((self._start is None or value >= self._start)
+            and (self._end is None or value <= self._end))
+
+  def get(self):
+    items = (self._reference.get() or {}).items()
+    def order(item):
+      value = item[1].get(self._child)
+      return (value is not None, value or 0, item[0])
+    return dict(sorted(
+        ((key, value) for key, value in items if self._matches(value.get(self._child))),
+        key=order))
+
+
+class Reference:
+  def __init__(self, database, parts):
+    self._database = database
+    self._parts = parts
+
+  @property
+  def key(self):
+    return self._parts[-1] if self._parts else None
+
+  def child(self, path):
+    return Reference(self._database, self._parts + _split(path))
+
+  def get(self, shallow=False):
+    with self._database.lock:
+      self._database.reads += 1
+      value = self._database._get(self._parts)
+    if shallow and isinstance(value, dict):
+      return {key: True for key in value}
+    return value
+
+  def set(self, value):
+    self._database.write(self._parts, value)
+
+  def update(self, value):
+    self._database.write(self._parts, value, event_type="patch")
+
+  def delete(self):
+    self._database.write(self._parts, None)
+
+  def push(self, value):
+    key = f"-N{next(self._database._ids):08d}"
+    self.child(key).set(value)
+    return self.child(key)
+
+  def order_by_child(self, child):
+    return Query(self, child)
+
+  def listen(self, callback):
+    with self._database.lock:
+      self._database.reads += 1
+      listener = (self._parts, callback)
+      self._database.listeners.append(listener)
+      callback(Event("put", "/", self._database._get(self._parts)))
+    return Registration(self._database, listener)
@@ -0,0 +1,31 @@
+from test import fake_rtdb
+
+from ecco6.tool import alarm_migration
+
+
+def test_migrate_fire_at():
+  database = fake_rtdb.Database()
+  users = database.reference("/users")
+  users.set({
+      "a": {"alarms": {
+          "legacy": {"date": "2024-05-01", "clock": "07:30", "day": "Wednesday"},
+          "seconds": {"date": "2024-05-01", "clock": "07:30:15", "day": "Wednesday"},
+          "broken": {"date": "tomorrow", "clock": "07:30", "day": "Thursday"},
+      }},
+      "b": {"alarms": {
+          "current": {"date": "2040-01-01", "clock": "08:00", "day": "Sunday"},
+      }},
+  })
+  users.child("b/alarms/current/fire_at").set(
+      alarm_migration.parse_alarm_time("2040-01-01", "08:00"))
+  writes = database.writes
+
+  assert alarm_migration.migrate_fire_at(users) == 2
+  assert database.writes == writes + 1
+  alarms = users.child("a/alarms").get()
+  assert alarms["legacy"]["fire_at"] == alarm_migration.parse_alarm_time("2024-05-01", "07:30")
+  assert alarms["seconds"]["fire_at"] - alarms["legacy"]["fire_at"] == 15
+  assert "fire_at" not in alarms["broken"]
+
+  assert alarm_migration.migrate_fire_at(users) == 0
+  assert alarm_migration.count_due_alarms(users, now=alarms["seconds"]["fire_at"]) == 2
@@ -0,0 +1,149 @@
+import datetime
+import threading
+import time
+from test import fake_rtdb
+
+from ecco6.tool import alarm_scheduler, alarm_store
+
+
+def alarm_at(epoch, title="wake up"):
+  when = datetime.datetime.fromtimestamp(epoch)
+  return {"day": when.strftime("%A"), "date": when.strftime("%Y-%m-%d"),
+          "clock": when.strftime("%H:%M:%S"), "title": title}
+
+
+def started_store(database):
+  store = alarm_store.AlarmStore(database.reference("/users"))
+  store.start()
+  return store
+
+
+def test_parse_alarm_time():
+  expected = datetime.datetime(2024, 5, 1, 7, 30).timestamp()
+  assert alarm_scheduler.parse_alarm_time("2024-05-01", "07:30") == expected
+  assert alarm_scheduler.parse_alarm_time("2024-05-01", "07:30:00") == expected
+  assert alarm_scheduler.parse_alarm_time("tomorrow", "07:30") is None
+
+
+def test_alarm_fire_at_prefers_the_epoch_field():
+  alarm = alarm_at(2e9)
+  assert alarm_scheduler.alarm_fire_at(alarm) == 2e9
+  assert alarm_scheduler.alarm_fire_at({**alarm, "fire_at": 1.5e9}) == 1.5e9
+
+
+def test_due_alarms_reads_only_due_records():
+  database = fake_rtdb.Database()
+  alarms = database.reference("/users/a/alarms")
+  alarms.child("past").set({**alarm_at(1e9), "fire_at": 1e9})
+  alarms.child("future").set({**alarm_at(2e9), "fire_at": 2e9})
+  alarms.child("legacy").set(alarm_at(1e9))
+  assert list(alarm_scheduler.due_alarms(alarms, now=1.5e9)) == ["past"]
+
+
+def test_mirror_follows_the_database():
+  database = fake_rtdb.Database()
+  alarms = database.reference("/users/a/alarms")
+  first = alarms.push(alarm_at(2e9))
+  scheduler = alarm_scheduler.AlarmScheduler(started_store(database), notify=lambda user, alarm: None)
+  registration = scheduler._store.listen(scheduler.on_event)
+  assert scheduler.next_fire_time() is None
+  scheduler.add_user("a")
+  assert scheduler.next_fire_time() == 2e9
+
+  second = alarms.push(alarm_at(1.9e9))
+  assert scheduler.next_fire_time() == 1.9e9
+  second.update({"clock": alarm_at(2.1e9)["clock"], "date": alarm_at(2.1e9)["date"]})
+  assert scheduler.next_fire_time() == 2e9
+  first.delete()
+  assert scheduler.next_fire_time() == 2.1e9
+  alarms.delete()
+  assert scheduler.next_fire_time() is None
+
+  database.reference("/users/b/alarms").push(alarm_at(1.8e9))
+  assert scheduler.next_fire_time() is None
+  scheduler.add_user("b")
+  assert scheduler.next_fire_time() == 1.8e9
+  scheduler.remove_user("b")
+  assert scheduler.next_fire_time() is None
+  registration.close()
+
+
+def test_fires_on_time_and_deletes_the_alarm():
+  database = fake_rtdb.Database()
+  alarms = database.reference("/users/a/alarms")
+  fired = []
+  done = threading.Event()
+  def notify(user, alarm):
+    fired.append((user, alarm["title"], time.time()))
+    done.set()
+
+  scheduler = alarm_scheduler.AlarmScheduler(started_store(database), notify)
+  scheduler.start()
+  scheduler.add_user("a")
+  fire_at = int(time.time()) + 1
+  alarms.push(alarm_at(fire_at))
+
+  assert done.wait(3)
+  scheduler.stop()
+  assert fired[0][:2] == ("a", "wake up")
+  assert 0 <= fired[0][2] - fire_at < 0.5
+  assert alarms.get() is None
+
+
+def test_thread_count_is_flat_across_reruns():
+  database = fake_rtdb.Database()
+  store = started_store(database)
+  scheduler = alarm_scheduler.AlarmScheduler(store, notify=lambda user, alarm: None)
+  threads_before = threading.active_count()
+
+  for _ in range(100):
+    store.start()
+    scheduler.start()
+    scheduler.add_user("a")
+    scheduler.add_user("b")
+  assert threading.active_count() == threads_before + 1
+  assert len(database.listeners) == 1
+  assert len(scheduler._heap) == 0
+
+  scheduler.remove_user("a")
+  assert not scheduler.has_user("a")
+  scheduler.stop()
+  assert threading.active_count() == threads_before
+  assert store._subscribers == []
+  store.stop()
+  assert database.listeners == []
+
+
+def test_load_10k_users():
+  """10k users with two alarms each, of which 1000 fire within two seconds."""
+  users, due_users = 10_000, 1000
+  database = fake_rtdb.Database()
+  now = int(time.time())
+  database.reference("/users").set({
+      f"user{i}": {"alarms": {
+          "later": alarm_at(now + 3600),
+          "soon": alarm_at(now + 1 + i % 2 if i < due_users else now + 7200),
+      }} for i in range(users)})
+
+  fired = []
+  lock = threading.Lock()
+  done = threading.Event()
+  def notify(user, alarm):
+    with lock:
+      fired.append((user, time.time()))
+      if len(fired) == due_users:
+        done.set()
+
+  scheduler = alarm_scheduler.AlarmScheduler(started_store(database), notify, max_workers=4)
+  threads_before = threading.active_count()
+  scheduler.start()
+  for i in range(users):
+    scheduler.add_user(f"user{i}")
+
+  assert done.wait(10)
+  assert threading.active_count() <= threads_before + 1 + 4
+  scheduler.stop()
+  assert sorted(user for user, _ in fired) == sorted(f"user{i}" for i in range(due_users))
+  assert all(at - (now + 1 + int(user[4:]) % 2) < 1 for user, at in fired)
+  assert database.reads == 1
+  assert sum(len(user["alarms"]) for user in database.reference("/users").get().values()) == 2 * users - due_users
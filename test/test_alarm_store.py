@@ -0,0 +1,112 @@
+import threading
+import time
+from test import fake_rtdb
+
+from ecco6.tool import alarm_store
+
+
+class FlakyReference:
+  """Forwards to a reference, but fails updates while offline."""
+  def __init__(self, reference):
+    self.reference = reference
+    self.offline = False
+
+  def listen(self, callback):
+    return self.reference.listen(callback)
+
+  def update(self, value):
+    if self.offline:
+      raise ConnectionError("offline")
+    self.reference.update(value)
+
+
+def wait_for(condition, timeout=5):
+  deadline = time.time() + timeout
+  while not condition():
+    assert time.time() < deadline
+    time.sleep(0.01)
+
+
+def test_reads_are_local_and_writes_go_through():
+  database = fake_rtdb.Database()
+  users = database.reference("/users")
+  users.child("a/alarms/x").set({"clock": "07:00"})
+  store = alarm_store.AlarmStore(users)
+  store.start()
+
+  for _ in range(10):
+    assert store.alarms("a") == {"x": {"clock": "07:00"}}
+  assert store.alarms("b") == {}
+  assert database.reads == 1
+
+  alarm_id = store.add("a", {"clock": "08:00"})
+  store.update("a", {"x/clock": "07:30"})
+  assert users.child("a/alarms").get() == {"x": {"clock": "07:30"}, alarm_id: {"clock": "08:00"}}
+  store.delete("a", "x")
+  assert list(users.child("a/alarms").get()) == [alarm_id]
+
+  users.child("a/alarms/y").set({"clock": "09:00"})
+  assert store.alarms("a")["y"] == {"clock": "09:00"}
+  store.stop()
+
+
+def test_failed_writes_are_retried_in_order():
+  database = fake_rtdb.Database()
+  users = FlakyReference(database.reference("/users"))
+  store = alarm_store.AlarmStore(users, retry_interval=0.01)
+  store.start()
+
+  users.offline = True
+  store.add("a", {"clock": "07:00"})
+  alarm_id = store.add("a", {"clock": "08:00"})
+  store.delete("a", alarm_id)
+  assert store.pending_writes() == 3
+  assert len(store.alarms("a")) == 1
+  assert database.reference("/users").get() is None
+
+  # Queued writes survive a new snapshot from the database.
+  database.reference("/users/b/alarms/z").set({"clock": "10:00"})
+  assert len(store.alarms("a")) == 1
+
+  users.offline = False
+  wait_for(lambda: store.pending_writes() == 0)
+  assert database.reference("/users/a/alarms").get() == store.alarms("a")
+  store.stop()
+
+
+def test_writes_do_not_overtake_a_failing_write():
+  database = fake_rtdb.Database()
+  reference = database.reference("/users")
+  writing = threading.Event()
+  fail = threading.Event()
+
+  class SlowFailingReference(FlakyReference):
+    def update(self, value):
+      if "a/alarms/x/clock" in value and not fail.is_set():
+        writing.set()
+        fail.wait(5)
+        raise ConnectionError("timed out")
+      super().update(value)
+
+  users = SlowFailingReference(reference)
+  store = alarm_store.AlarmStore(users, retry_interval=0.01)
+  store.start()
+  store.update("a", {"x": {"clock": "07:00", "title": "wake up"}})
+
+  slow = threading.Thread(target=store.update, args=("a", {"x/clock": "07:30"}))
+  slow.start()
+  writing.wait(5)
+  delete = threading.Thread(target=store.delete, args=("a", "x"))
+  delete.start()
+  time.sleep(0.05)
+  # The delete waits behind the clock change, which fails and is queued.
+  assert reference.child("a/alarms/x").get() is not None
+  fail.set()
+  slow.join(5)
+  delete.join(5)
+  # The retried clock change is written before the delete, so no partial
+  # alarm is left behind.
+  wait_for(lambda: store.pending_writes() == 0)
+  assert reference.child("a/alarms").get() is None
+  assert store.alarms("a") == {}
+  store.stop()
@@ -0,0 +1,40 @@
+from test import fake_rtdb
+
+from ecco6.tool import alarm_updates
+from ecco6.tool.alarm_scheduler import parse_alarm_time
+
+ALARMS = {
+    "a": {"day": "Monday", "date": "2024-05-06", "clock": "07:00", "title": "gym"},
+    "b": {"day": "Monday", "date": "2024-05-06", "clock": "08:00", "title": "work"},
+    "c": {"day": "Tuesday", "date": "2024-05-07", "clock": "07:00", "title": "gym"},
+}
+
+
+def test_filter_alarms():
+  assert list(alarm_updates.filter_alarms(ALARMS, day="Monday")) == ["a", "b"]
+  assert list(alarm_updates.filter_alarms(ALARMS, clock="07:00", title="gym")) == ["a", "c"]
+  assert list(alarm_updates.filter_alarms(ALARMS, day="Monday", title=None)) == ["a", "b"]
+  assert alarm_updates.filter_alarms(None, day="Monday") == {}
+
+
+def test_modify_and_delete_are_one_write():
+  database = fake_rtdb.Database()
+  alarms = database.reference("/users/u/alarms")
+  alarms.set(ALARMS)
+  writes = database.writes
+
+  monday = alarm_updates.filter_alarms(alarms.get(), day="Monday")
+  alarms.update(alarm_updates.modify_updates(monday, clock="09:00", title=None))
+  assert database.writes == writes + 1
+  assert alarms.child("a").get() == {
+      **ALARMS["a"], "clock": "09:00", "fire_at": parse_alarm_time("2024-05-06", "09:00")}
+  assert alarms.child("c").get() == ALARMS["c"]
+
+  alarms.update(alarm_updates.delete_updates(monday))
+  assert database.writes == writes + 2
+  assert list(alarms.get()) == ["c"]
+
+
+def test_modify_without_time_change_keeps_fire_at():
+  updates = alarm_updates.modify_updates({"a": ALARMS["a"]}, title="run", day=None)
+  assert updates == {"a/title": "run"}
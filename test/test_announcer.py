@@ -0,0 +1,95 @@
+import threading
+
+from ecco6.tool import announcer
+
+
+class FakeEngine:
+  """Records what it is asked to do, like a pyttsx3 engine without audio."""
+  def __init__(self):
+    self.thread = threading.current_thread()
+    self.said = []
+    self.files = []
+
+  def say(self, text):
+    assert threading.current_thread() is self.thread
+    self.said.append(text)
+
+  def save_to_file(self, text, path):
+    assert threading.current_thread() is self.thread
+    self.files.append((text, path))
+
+  def runAndWait(self):
+    for text, path in self.files:
+      with open(path, "w") as f:
+        f.write(text)
+    self.files = []
+
+
+def test_prerendered_announcements_are_played_back(tmp_path):
+  engines = []
+  played = []
+  def create_engine():
+    engines.append(FakeEngine())
+    return engines[-1]
+
+  speaker = announcer.Announcer(str(tmp_path), create_engine, play=played.append)
+  speaker.prerender("Alarm at 07:00")
+  speaker.prerender("Alarm at 08:00")
+  speaker.announce("Good morning")
+  assert engines[0].said == ["Good morning"]
+
+  speaker.announce("Alarm at 07:00", forget=True)
+  speaker.announce("Alarm at 08:00")
+  assert played == [speaker.path("Alarm at 07:00"), speaker.path("Alarm at 08:00")]
+  assert engines[0].said == ["Good morning"]
+  assert len(engines) == 1
+  assert sorted(p.name for p in tmp_path.iterdir()) == [
+      announcer.os.path.basename(speaker.path("Alarm at 08:00"))]
+
+
+def test_falls_back_to_speech_when_playback_fails(tmp_path):
+  engines = []
+  def create_engine():
+    engines.append(FakeEngine())
+    return engines[-1]
+  def fail(path):
+    raise OSError("no output device")
+
+  speaker = announcer.Announcer(str(tmp_path), create_engine, play=fail)
+  speaker.prerender("Alarm at 07:00")
+  speaker.announce("Hello")
+  speaker.announce("Alarm at 07:00")
+  assert engines[0].said == ["Hello", "Alarm at 07:00"]
+
+
+def test_failing_engine_does_not_block_announcements(tmp_path, monkeypatch):
+  attempts = []
+  def create_engine():
+    attempts.append(len(attempts))
+    if len(attempts) == 1:
+      raise RuntimeError("eSpeak is not installed")
+    return FakeEngine()
+
+  speaker = announcer.Announcer(str(tmp_path), create_engine, play=lambda path: None)
+  speaker.prerender("Alarm at 07:00")
+  start = announcer.time.monotonic()
+  speaker.announce("Hello", timeout=5)
+  speaker.announce("Hello again", timeout=5)
+  assert announcer.time.monotonic() - start < 1
+  assert attempts == [0]
+  assert not announcer.os.path.exists(speaker.path("Alarm at 07:00"))
+
+  # Creating the engine is retried after a while.
+  monkeypatch.setattr(announcer, "ENGINE_RETRY_INTERVAL", 0)
+  speaker.announce("Hello", timeout=5)
+  assert attempts == [0, 1]
+
+
+def test_discarded_announcements_are_deleted(tmp_path):
+  speaker = announcer.Announcer(str(tmp_path), FakeEngine, play=lambda path: None)
+  speaker.discard("Never rendered")
+  speaker.prerender("Alarm at 07:00")
+  # Queued behind the render, so the file does not outlive the discard.
+  speaker.discard("Alarm at 07:00")
+  speaker.announce("Hello")
+  assert list(tmp_path.iterdir()) == []
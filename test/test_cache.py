@@ -0,0 +1,52 @@
+from ecco6 import cache
+
+
+class FakeClock:
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self):
+    return self.now
+
+
+def test_get_and_expire():
+  clock = FakeClock()
+  ttl_cache = cache.TTLCache(maxsize=10, ttl=60, clock=clock)
+  ttl_cache.set("key", "value")
+  assert ttl_cache.get("key") == "value"
+  clock.now = 61
+  assert ttl_cache.get("key") is None
+  assert ttl_cache.get("other", "default") == "default"
+  stats = ttl_cache.stats()
+  assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 2, 1)
+  assert stats["size"] == 0
+
+
+def test_evicts_least_recently_used():
+  ttl_cache = cache.TTLCache(maxsize=2, ttl=60, clock=FakeClock())
+  ttl_cache.set("a", 1)
+  ttl_cache.set("b", 2)
+  ttl_cache.get("a")
+  ttl_cache.set("c", 3)
+  assert ttl_cache.get("b") is None
+  assert ttl_cache.get("a") == 1
+  assert ttl_cache.get("c") == 3
+  assert ttl_cache.stats()["evictions"] == 1
+
+
+def test_json_store_persists(tmp_path):
+  path = str(tmp_path / "sub" / "store.json")
+  store = cache.JsonStore(path)
+  assert store.get("stockholm") is None
+  store.set("stockholm", "place-1")
+  assert cache.JsonStore(path).get("stockholm") == "place-1"
+
+
+def test_per_entry_ttl():
+  clock = FakeClock()
+  ttl_cache = cache.TTLCache(maxsize=10, ttl=60, clock=clock)
+  ttl_cache.set("short", 1, ttl=10)
+  ttl_cache.set("long", 2)
+  clock.now = 30
+  assert ttl_cache.get("short") is None
+  assert ttl_cache.get("long") == 2
@@ -0,0 +1,51 @@
+import datetime
+from test import fake_calendar
+
+from ecco6.tool import calendar_range
+
+UTC = datetime.timezone.utc
+
+
+def test_calendars_are_listed_in_batches_and_merged():
+  service = fake_calendar.Calendar([
+      fake_calendar.event("Standup", "2024-05-01T09:00", "2024-05-01T09:15"),
+      fake_calendar.event("Review", "2024-05-02T14:00", "2024-05-02T15:00"),
+      fake_calendar.event("Next week", "2024-05-09T14:00", "2024-05-09T15:00")], page_size=2)
+  service.add_calendar("family", "Family", [
+      fake_calendar.event("Dinner", "2024-05-01T18:00", "2024-05-01T20:00", offset="Z"),
+      fake_calendar.event("Party", "2024-05-03T21:00", "2024-05-04T01:00"),
+      {"summary": "Holiday", "start": {"date": "2024-05-02"}, "end": {"date": "2024-05-03"}},
+      {"summary": "Trip", "start": {"date": "2024-05-05"}, "end": {"date": "2024-05-08"}}],
+      summaryOverride="Home")
+  service.add_calendar("hidden", "Hidden", [
+      fake_calendar.event("Hidden", "2024-05-01T10:00", "2024-05-01T11:00")], hidden=True)
+  service.add_calendar("deleted", "Deleted")
+  del service.calendars["deleted"]
+
+  calendars = calendar_range.list_calendars(service)
+  assert [c["id"] for c in calendars] == ["primary", "family", "deleted"]
+  service.round_trips = 0
+
+  start = datetime.datetime(2024, 5, 1, tzinfo=UTC)
+  events = calendar_range.list_events(service, calendars, start, start + datetime.timedelta(days=7), tz=UTC)
+  # Two pages of the family calendar, both batched with the other calendars.
+  assert service.round_trips == 2
+  assert calendar_range.format_events(events, tz=UTC) == "\n".join([
+      "2024-05-01",
+      "  09:00-09:15 Standup",
+      "  18:00-20:00 Dinner (Home)",
+      "2024-05-02",
+      "  all day Holiday (Home)",
+      "  14:00-15:00 Review",
+      "2024-05-03",
+      "  21:00-2024-05-04 01:00 Party (Home)",
+      "2024-05-05",
+      "  until 2024-05-07 Trip (Home)",
+  ])
+
+
+def test_no_calendars():
+  service = fake_calendar.Calendar()
+  start = datetime.datetime(2024, 5, 1, tzinfo=UTC)
+  assert calendar_range.list_events(service, [], start, start + datetime.timedelta(days=1)) == []
+  assert calendar_range.format_events([]) == ""
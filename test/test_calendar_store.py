@@ -0,0 +1,99 @@
+import datetime
+from test import fake_calendar
+
+from ecco6.tool import calendar_store
+
+UTC = datetime.timezone.utc
+NOW = datetime.datetime(2024, 5, 1, 8, 0, tzinfo=UTC)
+
+
+def new_store():
+  return calendar_store.CalendarStore(clock=NOW.timestamp, tz=UTC)
+
+
+def titles(events):
+  return [event["summary"] for event in events]
+
+
+def test_lookups_are_served_locally():
+  service = fake_calendar.Calendar([
+      fake_calendar.event("Standup", "2024-05-01T09:00", "2024-05-01T09:15"),
+      fake_calendar.event("Lunch", "2024-05-01T12:00", "2024-05-01T13:00"),
+      fake_calendar.event("Gym", "2024-05-01T07:00", "2024-05-01T07:45", offset="Z"),
+      fake_calendar.event("Trip", "2024-04-30T18:00", "2024-05-02T10:00"),
+      fake_calendar.event("Dentist", "2024-05-03T15:00", "2024-05-03T16:00"),
+      fake_calendar.event("Old", "2022-05-01T09:00", "2022-05-01T10:00"),
+      fake_calendar.event("Far", "2025-05-01T09:00", "2025-05-01T10:00"),
+      {"summary": "Holiday", "start": {"date": "2024-05-02"}, "end": {"date": "2024-05-03"},
+       "id": "holiday"}], page_size=2)
+  store = new_store()
+  assert store.sync(service) == 6
+  assert store.synced_at == NOW.timestamp()
+  service.round_trips = 0
+
+  assert titles(store.day("2024-05-01")) == ["Trip", "Gym", "Standup", "Lunch"]
+  assert titles(store.day("2024-05-02")) == ["Trip", "Holiday"]
+  assert titles(store.day("2024-05-04")) == []
+  start = datetime.datetime(2024, 5, 2, 11, tzinfo=UTC)
+  assert titles(store.events_between(start, start + datetime.timedelta(days=2))) == ["Holiday", "Dentist"]
+  assert titles([store.next_event()]) == ["Standup"]
+  assert store.next_event(datetime.datetime(2024, 6, 1, tzinfo=UTC)) is None
+  assert titles(store.find("lunch")) == ["Lunch"]
+  assert store.find("Lunch", "2024-05-02") == []
+  assert service.round_trips == 0
+
+
+def test_sync_applies_only_the_changes():
+  service = fake_calendar.Calendar([
+      fake_calendar.event("Standup", "2024-05-01T09:00", "2024-05-01T09:15", "standup"),
+      fake_calendar.event("Lunch", "2024-05-01T12:00", "2024-05-01T13:00", "lunch")])
+  store = new_store()
+  store.sync(service)
+
+  service.put("primary", fake_calendar.event("Review", "2024-05-01T10:00", "2024-05-01T11:00"))
+  service.put("primary", fake_calendar.event("Late lunch", "2024-05-01T13:00", "2024-05-01T14:00", "lunch"))
+  service.delete("primary", "standup")
+  service.round_trips = 0
+  assert store.sync(service) == 3
+  assert service.round_trips == 1
+  assert titles(store.day("2024-05-01")) == ["Review", "Late lunch"]
+
+  assert store.sync(service) == 0
+
+
+def test_lookups_outside_the_window_are_not_covered():
+  service = fake_calendar.Calendar([
+      fake_calendar.event("Far", "2025-05-01T09:00", "2025-05-01T10:00")])
+  store = new_store()
+  assert not store.covers(*calendar_store.day_bounds("2024-05-01", UTC))
+  assert store.sync(service) == 0
+  assert store.covers(*calendar_store.day_bounds("2024-05-01", UTC))
+  assert store.covers(*calendar_store.day_bounds("2023-05-03", UTC))
+  assert not store.covers(*calendar_store.day_bounds("2025-05-01", UTC))
+  # Events after the window are not known, even when a later sync lists them.
+  service.put("primary", fake_calendar.event("Farther", "2025-06-01T09:00", "2025-06-01T10:00"))
+  assert store.sync(service) == 1
+  assert store.next_event() is None
+
+
+def test_expired_sync_token_syncs_everything_again():
+  service = fake_calendar.Calendar([
+      fake_calendar.event("Standup", "2024-05-01T09:00", "2024-05-01T09:15", "standup")])
+  store = new_store()
+  store.sync(service)
+  service.delete("primary", "standup")
+  service.put("primary", fake_calendar.event("Review", "2024-05-01T10:00", "2024-05-01T11:00"))
+  service.expire_sync_tokens()
+  assert store.sync(service) == 1
+  assert titles(store.day("2024-05-01")) == ["Review"]
+
+
+def test_writes_are_visible_before_the_next_sync():
+  service = fake_calendar.Calendar()
+  store = new_store()
+  store.sync(service)
+  event = service.put("primary", fake_calendar.event("Review", "2024-05-01T10:00", "2024-05-01T11:00"))
+  store.put(event)
+  assert titles(store.day("2024-05-01")) == ["Review"]
+  store.remove(event["id"])
+  assert store.day("2024-05-01") == []
@@ -0,0 +1,49 @@
+from test import fake_gmail
+
+from ecco6.tool import gmail
+
+
+def test_metadata_is_fetched_in_batches():
+  service = fake_gmail.Gmail([fake_gmail.message(i) for i in range(120)], page_size=30)
+  ids, more = gmail.list_message_ids(service, gmail.UNREAD_QUERY, limit=80)
+  assert ids == [f"m{i}" for i in range(80)]
+  assert more
+  assert service.round_trips == 3
+
+  messages = gmail.get_message_metadata(service, ids)
+  assert [m["id"] for m in messages] == ids
+  assert service.round_trips == 3 + 2
+  assert set(service.formats) == {"metadata"}
+  assert gmail.format_messages([gmail.summarize(messages[0])]) == (
+      "From: sender0@example.com\nSubject: Subject 0\nSnippet: Snippet 0\n\n")
+
+
+def test_small_inbox_and_failed_messages():
+  service = fake_gmail.Gmail([fake_gmail.message(i) for i in range(3)])
+  ids, more = gmail.list_message_ids(service, gmail.UNREAD_QUERY, limit=20)
+  assert (ids, more) == (["m0", "m1", "m2"], False)
+  messages = gmail.get_message_metadata(service, ["m0", "gone", "m2"])
+  assert [m["id"] for m in messages] == ["m0", "m2"]
+
+
+def test_failed_messages_are_retried():
+  service = fake_gmail.Gmail([fake_gmail.message(i) for i in range(3)])
+  service.failures = {"m0": 1, "m2": 5}
+  messages, failed = gmail.fetch_message_metadata(service, ["m0", "m1", "gone", "m2"], retries=2, backoff=0)
+  assert [m["id"] for m in messages] == ["m0", "m1"]
+  # Missing messages are not retried.
+  assert failed == ["m2"]
+  assert service.round_trips == 3
+
+
+def test_unread_count_is_one_request():
+  service = fake_gmail.Gmail([fake_gmail.message(i) for i in range(3)] + [
+      fake_gmail.message(3, labels=("INBOX",)), fake_gmail.message(4, labels=("SENT", "UNREAD"))])
+  assert gmail.count_unread(service) == 3
+  assert service.round_trips == 1
+
+
+def test_unread_count_is_exact_for_large_inboxes():
+  service = fake_gmail.Gmail([fake_gmail.message(i) for i in range(600)])
+  assert gmail.count_unread(service) == 600
+  assert service.round_trips == 1
@@ -0,0 +1,42 @@
+import threading
+
+from google.oauth2.credentials import Credentials
+
+from ecco6.tool import google_services
+
+
+def credentials(refresh_token):
+  return Credentials(
+      token="token", refresh_token=refresh_token, client_id="client",
+      client_secret="secret", token_uri="https://oauth2.googleapis.com/token")
+
+
+def test_services_are_cached_per_credentials_and_api():
+  alice = google_services.get_service("calendar", "v3", credentials("alice"))
+  assert google_services.get_service("calendar", "v3", credentials("alice")) is alice
+  assert google_services.get_service("calendar", "v3", credentials("bob")) is not alice
+  assert google_services.get_service("tasks", "v1", credentials("alice")) is not alice
+
+
+def test_collections_are_built_once():
+  gmail = google_services.get_service("gmail", "v1", credentials("alice"))
+  assert gmail.users() is gmail.users()
+  assert gmail.users().messages() is gmail.users().messages()
+  request = gmail.users().messages().list(userId="me", q="is:unread")
+  assert "q=is%3Aunread" in request.uri
+
+
+def test_each_thread_has_its_own_connection():
+  http = google_services.ThreadLocalHttp(credentials("alice"))
+  connections = []
+  def connect():
+    connections.append(http._http())
+    connections.append(http._http())
+
+  threads = [threading.Thread(target=connect) for _ in range(3)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  assert len(set(map(id, connections))) == 3
+  assert all(connection.credentials is http.credentials for connection in connections)
@@ -0,0 +1,125 @@
+import datetime
+import threading
+
+from ecco6.tool import gtfs
+
+FEED = {
+    "stops.txt": """\
+stop_id,stop_name,parent_station
+A,Alby,
+B,Bergsjö,
+C,Centrum,
+C1,Centrum,C
+C2,Centrum,C
+D,Dalen,
+""",
+    "routes.txt": """\
+route_id,route_short_name
+r1,Bus 1
+r2,Bus 2
+""",
+    "trips.txt": """\
+route_id,service_id,trip_id
+r1,weekday,t1
+r1,weekday,t2
+r2,weekday,t3
+r2,weekend,t4
+""",
+    "stop_times.txt": """\
+trip_id,arrival_time,departure_time,stop_id,stop_sequence
+t1,08:00:00,08:00:00,A,1
+t1,08:10:00,08:10:00,B,2
+t1,08:20:00,08:20:00,C1,3
+t2,08:30:00,08:30:00,A,1
+t2,08:40:00,08:40:00,B,2
+t2,08:50:00,08:50:00,C1,3
+t3,08:25:00,08:25:00,C2,1
+t3,08:35:00,08:35:00,D,2
+t4,08:21:00,08:21:00,C2,1
+t4,08:31:00,08:31:00,D,2
+""",
+    "calendar.txt": """\
+service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date
+weekday,1,1,1,1,1,0,0,20240101,20301231
+weekend,0,0,0,0,0,1,1,20240101,20301231
+""",
+}
+
+
+def write_feed(tmp_path):
+  for name, content in FEED.items():
+    (tmp_path / name).write_text(content)
+
+
+def load(tmp_path, **kwargs):
+  write_feed(tmp_path)
+  return gtfs.Timetable.load(str(tmp_path), **kwargs)
+
+
+def test_parse_and_format_time():
+  assert gtfs.parse_time("25:01:30") == 90090
+  assert gtfs.format_time(90090) == "01:01"
+
+
+def test_plan_with_transfer_between_platforms(tmp_path):
+  timetable = load(tmp_path, service_date=datetime.date(2024, 5, 6))
+  legs = timetable.plan("alby", "Dalen", gtfs.parse_time("07:55:00"))
+  assert [(leg.line, leg.origin, leg.destination) for leg in legs] == [
+      ("Bus 1", "Alby", "Centrum"),
+      (None, "Centrum", "Centrum"),
+      ("Bus 2", "Centrum", "Dalen"),
+  ]
+  assert gtfs.format_time(legs[0].departure) == "08:00"
+  assert gtfs.format_time(legs[-1].arrival) == "08:35"
+
+
+def test_plan_takes_earliest_trip(tmp_path):
+  timetable = load(tmp_path)
+  legs = timetable.plan("Bergsjö", "Centrum", gtfs.parse_time("08:15:00"))
+  assert len(legs) == 1
+  assert gtfs.format_time(legs[0].departure) == "08:40"
+  assert timetable.plan("Dalen", "Alby", gtfs.parse_time("08:00:00")) == []
+  assert timetable.plan("Alby", "Nowhere", gtfs.parse_time("08:00:00")) == []
+
+
+def test_daily_timetable_loads_in_the_background(tmp_path):
+  write_feed(tmp_path)
+  release = threading.Event()
+  days = []
+  day = [datetime.date(2024, 5, 6)]
+
+  def slow_load(directory, service_date):
+    days.append(service_date)
+    release.wait(5)
+    return gtfs.Timetable.load(directory, service_date=service_date)
+
+  daily = gtfs.DailyTimetable(str(tmp_path), load=slow_load, today=lambda: day[0])
+  assert daily.get() is None
+  release.set()
+  daily.wait(5)
+  monday = daily.get()
+  assert monday is not None
+
+  # The previous day is served while the next one loads.
+  release.clear()
+  day[0] = datetime.date(2024, 5, 7)
+  assert daily.get() is monday
+  assert daily.get() is monday
+  release.set()
+  daily.wait(5)
+  assert daily.get() is not monday
+  assert days == [datetime.date(2024, 5, 6), datetime.date(2024, 5, 7)]
+
+
+def test_daily_timetable_retries_failed_loads(tmp_path):
+  calls = []
+
+  def failing_load(directory, service_date):
+    calls.append(service_date)
+    raise OSError("missing feed")
+
+  daily = gtfs.DailyTimetable(str(tmp_path), load=failing_load)
+  daily.wait(5)
+  assert daily.get() is None
+  daily.wait(5)
+  assert len(calls) == 2
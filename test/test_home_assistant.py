@@ -0,0 +1,140 @@
+import http.server
+import json
+import threading
+
+import pytest
+
+from ecco6 import http_client
+from ecco6.tool import home_assistant
+
+
+class FakeHomeAssistant(http.server.BaseHTTPRequestHandler):
+  """A stand-in for the Home Assistant REST API with one light."""
+  protocol_version = "HTTP/1.1"
+  states = {}
+  requests = []
+
+  def _reply(self, status, body):
+    data = json.dumps(body).encode()
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+  def do_GET(self):
+    FakeHomeAssistant.requests.append(("GET", self.path, None))
+    entity_id = self.path.rsplit("/", 1)[1]
+    if entity_id in self.states:
+      self._reply(200, self.states[entity_id])
+    else:
+      self._reply(404, {"message": "Entity not found."})
+
+  def do_POST(self):
+    data = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+    FakeHomeAssistant.requests.append(("POST", self.path, data))
+    domain, service = self.path.split("/")[-2:]
+    entity_ids = data["entity_id"]
+    if isinstance(entity_ids, str):
+      entity_ids = [entity_ids]
+    if any(entity_id not in self.states for entity_id in entity_ids):
+      self._reply(400, {"message": "Unknown entity."})
+      return
+    changed = []
+    for entity_id in entity_ids:
+      state = self.states[entity_id]
+      if service == "turn_on":
+        state["state"] = "on"
+        if "brightness_pct" in data:
+          state["attributes"]["brightness"] = round(data["brightness_pct"] * 255 / 100)
+      elif service == "turn_off":
+        state["state"] = "off"
+      changed.append(state)
+    self._reply(200, changed)
+
+  def log_message(self, *args):
+    pass
+
+
+@pytest.fixture
+def server():
+  FakeHomeAssistant.states = {
+      "light.bulb": {"entity_id": "light.bulb", "state": "off", "attributes": {}},
+      "light.lamp": {"entity_id": "light.lamp", "state": "off", "attributes": {}},
+      "scene.movie": {"entity_id": "scene.movie", "state": "scening", "attributes": {}},
+  }
+  FakeHomeAssistant.requests = []
+  httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FakeHomeAssistant)
+  thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+  thread.start()
+  yield f"http://127.0.0.1:{httpd.server_address[1]}"
+  httpd.shutdown()
+  httpd.server_close()
+
+
+def test_commands_update_the_mirror(server):
+  client = home_assistant.HomeAssistantClient(server, "token", http=http_client.HttpClient())
+  client.turn_on("light.bulb", brightness_pct=60)
+  assert FakeHomeAssistant.requests == [
+      ("POST", "/api/services/light/turn_on", {"entity_id": "light.bulb", "brightness_pct": 60})]
+
+  state = client.state("light.bulb")
+  assert state["state"] == "on"
+  assert state["attributes"]["brightness"] == 153
+  client.turn_off("light.bulb")
+  assert client.state("light.bulb")["state"] == "off"
+  assert len(FakeHomeAssistant.requests) == 2
+
+  client.activate_scene("movie")
+  assert FakeHomeAssistant.requests[-1][1:] == (
+      "/api/services/scene/turn_on", {"entity_id": "scene.movie"})
+
+
+def test_state_is_fetched_once_and_refreshed_by_polling(server):
+  client = home_assistant.HomeAssistantClient(
+      server, "token", poll_interval=0.05, http=http_client.HttpClient())
+  assert client.state("light.bulb")["state"] == "off"
+  assert client.state("light.bulb")["state"] == "off"
+  assert len(FakeHomeAssistant.requests) == 1
+
+  FakeHomeAssistant.states["light.bulb"]["state"] = "on"
+  client.start_polling()
+  for _ in range(100):
+    if client.state("light.bulb")["state"] == "on":
+      break
+    threading.Event().wait(0.01)
+  client.stop_polling()
+  assert client.state("light.bulb")["state"] == "on"
+
+
+def test_queue_merges_commands_of_one_turn(server):
+  client = home_assistant.HomeAssistantClient(server, "token", http=http_client.HttpClient())
+  queue = home_assistant.CommandQueue(client, delay=10)
+  on = queue.submit("light.bulb", "turn_on")
+  bright = queue.submit("light.bulb", "turn_on", brightness_pct=100)
+  queue.submit("light.lamp", "turn_on")
+  queue.submit("light.lamp", "turn_off")
+  queue.submit("light.lamp", "turn_on", brightness_pct=100)
+  assert FakeHomeAssistant.requests == []
+
+  assert queue.join(timeout=5) == []
+  assert FakeHomeAssistant.requests == [
+      ("POST", "/api/services/light/turn_on",
+       {"entity_id": ["light.bulb", "light.lamp"], "brightness_pct": 100})]
+  assert on.result() is bright.result()
+  assert client.state("light.bulb")["attributes"]["brightness"] == 255
+  assert len(FakeHomeAssistant.requests) == 1
+
+
+def test_queue_dispatches_after_the_delay_and_reports_errors(server):
+  client = home_assistant.HomeAssistantClient(server, "token", http=http_client.HttpClient())
+  queue = home_assistant.CommandQueue(client, delay=0.05)
+  queue.submit("light.bulb", "turn_on")
+  queue.submit("light.bulb", "turn_off").result(timeout=5)
+  assert FakeHomeAssistant.requests == [
+      ("POST", "/api/services/light/turn_off", {"entity_id": "light.bulb"})]
+
+  queue.submit("light.missing", "turn_on")
+  errors = queue.join(timeout=5)
+  assert len(errors) == 1
+  assert "400" in str(errors[0])
@@ -0,0 +1,71 @@
+import http.server
+import threading
+
+import pytest
+import requests
+
+from ecco6 import http_client
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+  protocol_version = "HTTP/1.1"
+  failures = 0
+  connections = set()
+
+  def do_GET(self):
+    Handler.connections.add(self.client_address)
+    if Handler.failures > 0:
+      Handler.failures -= 1
+      status, body = 503, b"busy"
+    else:
+      status, body = 200, b"ok"
+    self.send_response(status)
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  do_POST = do_GET
+
+  def log_message(self, *args):
+    pass
+
+
+@pytest.fixture
+def server():
+  Handler.failures = 0
+  Handler.connections = set()
+  httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+  thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+  thread.start()
+  yield f"http://127.0.0.1:{httpd.server_address[1]}"
+  httpd.shutdown()
+  httpd.server_close()
+
+
+def test_reuses_connection(server):
+  client = http_client.HttpClient()
+  for _ in range(5):
+    assert client.get(server + "/").text == "ok"
+  assert len(Handler.connections) == 1
+  host = server.split("//")[1]
+  assert client.metrics()[host]["requests"] == 5
+  client.close()
+
+
+def test_retries_idempotent_requests(server):
+  client = http_client.HttpClient(retries=2, backoff=0.01)
+  Handler.failures = 2
+  assert client.get(server + "/").status_code == 200
+  host = server.split("//")[1]
+  assert client.metrics()[host]["retries"] == 2
+
+  Handler.failures = 1
+  assert client.post(server + "/").status_code == 503
+  client.close()
+
+
+def test_raises_after_last_connection_error():
+  client = http_client.HttpClient(retries=1, backoff=0.01, timeout=0.5)
+  with pytest.raises(requests.exceptions.ConnectionError):
+    client.get("http://127.0.0.1:9/")
+  assert client.metrics()["127.0.0.1:9"]["errors"] == 2
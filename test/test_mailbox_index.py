@@ -0,0 +1,189 @@
+from test import fake_gmail
+
+from ecco6.tool import mailbox_index
+
+
+def unread_ids(index):
+  return [m["id"] for m in index.unread(limit=100)]
+
+
+def test_full_sync_indexes_the_inbox(tmp_path):
+  service = fake_gmail.Gmail([
+      fake_gmail.message(0), fake_gmail.message(1, labels=("INBOX",)),
+      fake_gmail.message(2, labels=("INBOX", "UNREAD", "CATEGORY_PROMOTIONS")),
+      fake_gmail.message(3, labels=("SENT",))])
+  index = mailbox_index.MailboxIndex(str(tmp_path / "mailbox.sqlite3"), clock=lambda: 42)
+  assert index.sync(service) == 3
+  assert index.history_id == "100"
+  assert index.synced_at == 42
+  assert unread_ids(index) == ["m0"]
+  assert index.unread_count() == 1
+  assert index.unread(limit=1) == [{
+      "id": "m0", "sender": "sender0@example.com", "subject": "Subject 0",
+      "snippet": "Snippet 0", "internal_date": 1700000000000}]
+
+  # The index is persisted.
+  reopened = mailbox_index.MailboxIndex(str(tmp_path / "mailbox.sqlite3"))
+  assert reopened.history_id == "100"
+  assert unread_ids(reopened) == ["m0"]
+
+
+def test_sync_applies_only_the_changes():
+  service = fake_gmail.Gmail([fake_gmail.message(i) for i in range(3)] + [
+      fake_gmail.message(3, labels=("INBOX",))])
+  index = mailbox_index.MailboxIndex(":memory:")
+  index.sync(service)
+  assert unread_ids(index) == ["m2", "m1", "m0"]
+
+  service.add(fake_gmail.message(10))
+  service.delete("m0")
+  service.modify("m1", remove=["UNREAD"])
+  service.modify("m3", add=["UNREAD"])
+  service.add(fake_gmail.message(11))
+  service.delete("m11")
+  service.round_trips = 0
+  service.formats = []
+
+  assert index.sync(service) == 5
+  assert unread_ids(index) == ["m10", "m3", "m2"]
+  assert index.history_id == str(service.history_id)
+  # One history page and one batch with the new message only.
+  assert service.round_trips == 2
+  assert service.formats == ["metadata"]
+
+  service.round_trips = 0
+  assert index.sync(service) == 0
+  assert service.round_trips == 1
+
+
+def test_label_changes_of_unindexed_messages_fetch_them(monkeypatch):
+  monkeypatch.setattr(mailbox_index, "FULL_SYNC_LIMIT", 2)
+  service = fake_gmail.Gmail([fake_gmail.message(i, labels=("INBOX",)) for i in range(3)])
+  index = mailbox_index.MailboxIndex(":memory:")
+  index.sync(service)
+  assert index.unread_count() == 0
+
+  service.modify("m2", add=["UNREAD"])
+  index.sync(service)
+  assert unread_ids(index) == ["m2"]
+
+
+def test_full_sync_indexes_old_unread_messages(monkeypatch):
+  monkeypatch.setattr(mailbox_index, "FULL_SYNC_LIMIT", 5)
+  # 8 unread messages, the newest first, behind 5 newer read ones.
+  service = fake_gmail.Gmail([fake_gmail.message(i, labels=("INBOX",)) for i in range(20, 15, -1)] + [
+      fake_gmail.message(i) for i in range(7, -1, -1)])
+  index = mailbox_index.MailboxIndex(":memory:")
+  assert index.sync(service) == 13
+  assert index.complete
+  assert index.unread_count() == 8
+  assert unread_ids(index)[:3] == ["m7", "m6", "m5"]
+
+
+def test_too_many_unread_messages_leave_the_index_incomplete(monkeypatch):
+  monkeypatch.setattr(mailbox_index, "FULL_SYNC_LIMIT", 5)
+  monkeypatch.setattr(mailbox_index, "UNREAD_SYNC_LIMIT", 6)
+  service = fake_gmail.Gmail([fake_gmail.message(i) for i in range(7, -1, -1)])
+  index = mailbox_index.MailboxIndex(":memory:")
+  index.sync(service)
+  assert not index.complete
+  assert index.unread_count() == 6
+
+
+def test_expired_history_syncs_everything_again():
+  service = fake_gmail.Gmail([fake_gmail.message(i) for i in range(2)])
+  index = mailbox_index.MailboxIndex(":memory:")
+  index.sync(service)
+  service.messages[0]["labelIds"].remove("UNREAD")
+  service.messages.append(fake_gmail.message(5))
+  service.expire_history()
+  assert index.sync(service) == 3
+  assert unread_ids(index) == ["m5", "m1"]
+
+
+def test_failed_messages_are_fetched_by_the_next_sync(monkeypatch):
+  monkeypatch.setattr(mailbox_index, "FETCH_BACKOFF", 0)
+  service = fake_gmail.Gmail([fake_gmail.message(i) for i in range(3)])
+  service.failures = {"m1": mailbox_index.FETCH_RETRIES + 1}
+  index = mailbox_index.MailboxIndex(":memory:")
+  assert index.sync(service) == 2
+  assert index.history_id is None
+  assert not index.complete
+
+  assert index.sync(service) == 3
+  assert index.history_id == "100"
+  assert index.complete
+
+  service.add(fake_gmail.message(10))
+  service.modify("m0", remove=["UNREAD"])
+  service.failures = {"m10": mailbox_index.FETCH_RETRIES + 1}
+  index.sync(service)
+  assert unread_ids(index) == ["m2", "m1"]
+  assert index.history_id == "100"
+  # The changes are applied again with the message that failed.
+  assert index.sync(service) == 2
+  assert unread_ids(index) == ["m10", "m2", "m1"]
+  assert index.history_id == str(service.history_id)
+
+
+class Credentials:
+  client_id = "client"
+  refresh_token = "token"
+
+
+def test_mailbox_sync_refreshes_in_the_background():
+  service = fake_gmail.Gmail([fake_gmail.message(0)])
+  sync = mailbox_index.MailboxSync(refresh_interval=0.05, get_gmail=lambda credentials: service)
+  try:
+    assert sync.peek(Credentials()) is None
+    index = sync.index(Credentials())
+    assert sync.peek(Credentials()) is index
+    assert unread_ids(index) == ["m0"]
+    assert sync.index(Credentials()) is index
+
+    service.add(fake_gmail.message(1))
+    for _ in range(100):
+      if index.unread_count() == 2:
+        break
+      sync._stop.wait(0.05)
+    assert unread_ids(index) == ["m1", "m0"]
+  finally:
+    sync.stop()
+
+
+def test_first_index_is_built_in_the_background():
+  service = fake_gmail.Gmail([fake_gmail.message(0)])
+  sync = mailbox_index.MailboxSync(refresh_interval=60, get_gmail=lambda credentials: service)
+  try:
+    assert sync.index(Credentials(), wait=False) is None
+    for _ in range(100):
+      index = sync.index(Credentials(), wait=False)
+      if index is not None:
+        break
+      sync._stop.wait(0.05)
+    assert unread_ids(index) == ["m0"]
+  finally:
+    sync.stop()
+
+
+def test_mailbox_sync_drops_signed_out_and_idle_users():
+  service = fake_gmail.Gmail([fake_gmail.message(0)])
+  sync = mailbox_index.MailboxSync(refresh_interval=0.05, get_gmail=lambda credentials: service)
+  try:
+    index = sync.index(Credentials())
+    sync.discard(Credentials())
+    assert sync.peek(Credentials()) is None
+    assert sync.index(Credentials()) is not index
+
+    sync.idle_timeout = 0.1
+    for _ in range(100):
+      if not sync._stores:
+        break
+      sync._stop.wait(0.05)
+    assert sync.peek(Credentials()) is None
+    # No more syncs once the store is dropped.
+    round_trips = service.round_trips
+    sync._stop.wait(0.2)
+    assert service.round_trips == round_trips
+  finally:
+    sync.stop()
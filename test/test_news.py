@@ -0,0 +1,36 @@
+from ecco6.tool import news
+
+
+class FakeFetch:
+  def __init__(self):
+    self.calls = 0
+    self.fail = False
+
+  def __call__(self):
+    self.calls += 1
+    if self.fail:
+      raise ConnectionError("offline")
+    return [{"title": f"Headline {self.calls}"}]
+
+
+def test_serves_cached_headlines_and_keeps_them_on_failure():
+  fetch = FakeFetch()
+  now = [1000.0]
+  prefetcher = news.HeadlinePrefetcher(fetch, clock=lambda: now[0])
+
+  assert prefetcher.get() == ([{"title": "Headline 1"}], 0.0)
+  now[0] += 60
+  assert prefetcher.get() == ([{"title": "Headline 1"}], 60.0)
+  assert fetch.calls == 1
+
+  fetch.fail = True
+  assert not prefetcher.refresh()
+  now[0] += 3600
+  assert prefetcher.get() == ([{"title": "Headline 1"}], 3660.0)
+
+
+def test_returns_none_without_any_headlines():
+  fetch = FakeFetch()
+  fetch.fail = True
+  prefetcher = news.HeadlinePrefetcher(fetch)
+  assert prefetcher.get() == (None, 0.0)
@@ -0,0 +1,22 @@
+import numpy as np
+
+from ecco6.tool import spatial_index
+
+
+def test_haversine():
+  # Stockholm Central to Odenplan is roughly 1.6 km.
+  distance = spatial_index.haversine(
+      59.330140, 18.058155, np.array([59.330140, 59.342956]), np.array([18.058155, 18.049704]))
+  assert distance[0] == 0
+  assert 1400 < distance[1] < 1600
+
+
+def test_nearby_matches_brute_force():
+  rng = np.random.default_rng(0)
+  lats = rng.uniform(59.2, 59.5, 5000)
+  lons = rng.uniform(17.8, 18.3, 5000)
+  index = spatial_index.GridIndex(lats, lons)
+  for lat, lon, radius in [(59.33, 18.06, 500), (59.4, 18.0, 2500), (59.21, 17.81, 800)]:
+    distances = spatial_index.haversine(lat, lon, lats, lons)
+    expected = [row for row in np.argsort(distances) if distances[row] <= radius][:5]
+    assert [row for row, _ in index.nearby(lat, lon, radius, 5)] == expected
@@ -0,0 +1,51 @@
+from ecco6.tool import station_index
+
+STOPS_CSV = """\
+stop_id,stop_name,stop_lat,stop_lon,location_type
+740000001,Stockholm Central,59.330140,18.058155,
+740000004,Alvesta ,56.898781,14.556319,
+740015832,Slussen,59.319500,18.072100,
+740099999,Slussen,58.259316,11.759694,
+"""
+
+
+def test_lookup_exact_name():
+  index = station_index.StationIndex.from_csv(STOPS_CSV)
+  assert len(index) == 4
+  assert index.lookup("Stockholm Central") == (59.33014, 18.058155, 740000001)
+
+
+def test_lookup_normalizes_case_and_whitespace():
+  index = station_index.StationIndex.from_csv(STOPS_CSV)
+  assert index.lookup("  stockholm   CENTRAL ") == (59.33014, 18.058155, 740000001)
+  assert index.lookup("alvesta") == (56.898781, 14.556319, 740000004)
+
+
+def test_lookup_keeps_first_occurrence():
+  index = station_index.StationIndex.from_csv(STOPS_CSV)
+  assert index.lookup("slussen")[2] == 740015832
+
+
+def test_find_falls_back_to_fuzzy_match():
+  index = station_index.StationIndex.from_csv(STOPS_CSV)
+  assert index.find("Stockholm Centrl")[2] == 740000001
+  assert index.find("Kiruna") is None
+
+
+def test_get_station_index_is_built_once():
+  index = station_index.get_station_index()
+  assert index is station_index.get_station_index()
+  assert index.lookup("Stockholm Central")[2] == 740000001
+
+
+def test_nearby_respects_radius_and_max_results():
+  index = station_index.StationIndex.from_csv(STOPS_CSV)
+  nearby = index.nearby(59.3302, 18.0582, max_results=1, radius=1000)
+  assert len(nearby) == 1
+  assert nearby[0][0] == "Stockholm Central"
+  assert nearby[0][2] == 740000001
+  assert nearby[0][1] < 10
+
+  nearby = index.nearby(59.3302, 18.0582, max_results=3, radius=5000)
+  assert [stop_id for _, _, stop_id in nearby] == [740000001, 740015832]
+  assert index.nearby(0.0, 0.0) == []
@@ -0,0 +1,51 @@
+import csv
+import io
+import os
+import subprocess
+import sys
+
+from ecco6.tool import stop_table
+
+STOPS_CSV = """\
+stop_id,stop_name,stop_lat,stop_lon,location_type
+740000001,Stockholm Centralstation,59.330140,18.058155,
+740000004,Alvesta station,56.898781,14.556319,
+740021013,Odenplan T-bana,59.342956,18.049704,
+"""
+
+
+def test_build_and_read_table(tmp_path):
+  path = tmp_path / "stops.bin"
+  path.write_bytes(stop_table.build(csv.DictReader(io.StringIO(STOPS_CSV))))
+
+  table = stop_table.StopTable.open(str(path))
+  assert len(table) == 3
+  assert table.names() == ["Stockholm Central", "Alvesta ", "Odenplan T-bana"]
+  assert table.name(2) == "Odenplan T-bana"
+  assert table.stop_id.tolist() == [740000001, 740000004, 740021013]
+  assert abs(table.lat[0] - 59.330140) < 1e-5
+  assert abs(table.lon[2] - 18.049704) < 1e-5
+
+
+def test_bundled_table_matches_csv():
+  table = stop_table.get_stop_table()
+  with open(stop_table.STOPS_CSV, encoding="utf-8", newline="") as f:
+    rows = list(csv.DictReader(f))
+  assert len(table) == len(rows)
+  assert table.name(len(rows) - 1) == stop_table.clean_stop_name(rows[-1]['stop_name'])
+
+
+def test_installed_package_opens_the_table(tmp_path):
+  root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+  subprocess.run(
+      [sys.executable, "setup.py", "-q", "build", "--build-base", str(tmp_path / "build"),
+       "--build-lib", str(tmp_path / "lib")],
+      cwd=root, check=True, capture_output=True)
+  result = subprocess.run(
+      [sys.executable, "-c",
+       "from ecco6.tool import stop_table; print(stop_table.STOPS_BIN); print(len(stop_table.get_stop_table()))"],
+      cwd=str(tmp_path), env=dict(os.environ, PYTHONPATH=str(tmp_path / "lib")),
+      check=True, capture_output=True, text=True)
+  path, rows = result.stdout.split()
+  assert path.startswith(str(tmp_path / "lib"))
+  assert int(rows) > 0
@@ -0,0 +1,39 @@
+from ecco6.tool import trigram_index
+
+NAMES = [
+    "odenslanda",
+    "odenplan t-bana",
+    "t-centralen t-bana",
+    "tekniska högskolan t-bana",
+    "slussen",
+    "solna",
+    "solna strand t-bana",
+]
+
+
+def test_fold_strips_diacritics_and_punctuation():
+  assert trigram_index.fold("T-Centralen") == "t centralen"
+  assert trigram_index.fold(" Tekniska  Högskolan ") == "tekniska hogskolan"
+
+
+def test_search_ranks_best_match_first():
+  index = trigram_index.TrigramIndex(NAMES, strip_suffixes=["t-bana", "station"])
+  assert index.search("odenplan")[0][0] == "odenplan t-bana"
+  assert index.search("tekniska hogskolan")[0][0] == "tekniska högskolan t-bana"
+  assert index.search("sluss en")[0][0] == "slussen"
+  assert index.search("solna station")[0] == ("solna", 1.0)
+
+
+def test_search_returns_top_k_above_cutoff():
+  index = trigram_index.TrigramIndex(NAMES)
+  matches = index.search("solna", k=3, cutoff=0.3)
+  assert len(matches) == 3
+  assert matches[0] == ("solna", 1.0)
+  assert all(score >= 0.3 for _, score in matches)
+  assert index.search("solna", k=3, cutoff=0.99) == [("solna", 1.0)]
+
+
+def test_search_without_match():
+  index = trigram_index.TrigramIndex(NAMES)
+  assert index.search("xyz") == []
+  assert index.search("") == []